@@ -18,12 +18,20 @@ Code common to Connection and Channel objects.
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 
+from collections import deque
+
 from serialization import AMQPWriter
 
 __all__ =  [
             'AbstractChannel',
+            'MethodQueue',
            ]
 
+#
+# channel.close is always accepted, whatever a waiter asked for.
+#
+_CHANNEL_CLOSE = (20, 40)
+
 
 class AbstractChannel(object):
     """
@@ -38,7 +46,7 @@ class AbstractChannel(object):
         self.connection = connection
         self.channel_id = channel_id
         connection.channels[channel_id] = self
-        self.method_queue = [] # Higher level queue for methods
+        self.method_queue = MethodQueue() # Higher level queue for methods
         self.auto_decode = False
 
 
@@ -112,3 +120,90 @@ class AbstractChannel(object):
     # supply their own versions of _METHOD_MAP
     #
     _METHOD_MAP = {}
+
+
+class MethodQueue(object):
+    """
+    Methods received for a channel while nobody was waiting for
+    them, kept in arrival order as (method_sig, args, content) tuples.
+
+    A count of the queued methods for each method signature is kept
+    alongside, so a waiter can tell whether anything it accepts is
+    pending without scanning the queue.
+
+    """
+    def __init__(self):
+        self._methods = deque()
+        self._counts = {}
+
+
+    def __len__(self):
+        return len(self._methods)
+
+
+    def __iter__(self):
+        return iter(self._methods)
+
+
+    def append(self, method):
+        """
+        Queue a (method_sig, args, content) tuple.
+
+        """
+        self._methods.append(method)
+        method_sig = method[0]
+        self._counts[method_sig] = self._counts.get(method_sig, 0) + 1
+
+
+    def pop_matching(self, allowed_methods=None):
+        """
+        Remove and return the first queued method with a signature in
+        allowed_methods (any method if allowed_methods is None, and
+        channel.close always), or None if there is no such method.
+
+        """
+        methods = self._methods
+        if not methods:
+            return None
+
+        method_sig = methods[0][0]
+        if (allowed_methods is None) \
+        or (method_sig in allowed_methods) \
+        or (method_sig == _CHANNEL_CLOSE):
+            method = methods.popleft()
+        else:
+            counts = self._counts
+            if _CHANNEL_CLOSE not in counts:
+                for method_sig in allowed_methods:
+                    if method_sig in counts:
+                        break
+                else:
+                    return None
+            for i, method in enumerate(methods):
+                method_sig = method[0]
+                if (method_sig in allowed_methods) \
+                or (method_sig == _CHANNEL_CLOSE):
+                    del methods[i]
+                    break
+            else:
+                return None
+
+        self._forget(method[0])
+        return method
+
+
+    def remove(self, method):
+        """
+        Remove a queued method, as list.remove does.
+
+        """
+        self._methods.remove(method)
+        self._forget(method[0])
+
+
+    def _forget(self, method_sig):
+        count = self._counts[method_sig] - 1
+        if count:
+            self._counts[method_sig] = count
+        else:
+            del self._counts[method_sig]
@@ -180,15 +180,10 @@ class Connection(AbstractChannel):
         #
         # Check the channel's deferred methods
         #
-        method_queue = self.channels[channel_id].method_queue
-
-        for queued_method in method_queue:
-            method_sig = queued_method[0]
-            if (allowed_methods is None) \
-            or (method_sig in allowed_methods) \
-            or (method_sig == (20, 40)):
-                method_queue.remove(queued_method)
-                return queued_method
+        queued_method = \
+            self.channels[channel_id].method_queue.pop_matching(allowed_methods)
+        if queued_method is not None:
+            return queued_method
 
         #
         # Nothing queued, need to wait for a method from the peer
@@ -18,8 +18,8 @@ Convert between frames and higher-level AMQP methods
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 
-from Queue import Empty, Queue
-from struct import pack, unpack
+from collections import deque
+from struct import Struct, pack
 
 try:
     from collections import defaultdict
@@ -45,12 +45,15 @@ except:
 
 from basic_message import Message
 from exceptions import *
-from serialization import AMQPReader
+from serialization import AMQPBufferReader
 
 __all__ =  [
             'MethodReader',
            ]
 
+_method_sig = Struct('>HH')
+_content_header = Struct('>HHQ')
+
 #
 # MethodReader needs to know which methods are supposed
 # to be followed by content headers and bodies.
@@ -78,8 +81,8 @@ class _PartialMessage(object):
 
 
     def add_header(self, payload):
-        class_id, weight, self.body_size = unpack('>HHQ', payload[:12])
-        self.msg._load_properties(payload[12:])
+        class_id, weight, self.body_size = _content_header.unpack_from(payload)
+        self.msg._load_properties(payload, 12)
         self.complete = (self.body_size == 0)
 
 
@@ -106,10 +109,13 @@ class MethodReader(object):
     In the case of unexpected frames, a tuple made up of
     (channel, AMQPChannelException) is placed in the queue.
 
+    The queue is a plain deque, a connection is only ever read from
+    one thread at a time so it needs no locking.
+
     """
     def __init__(self, source):
         self.source = source
-        self.queue = Queue()
+        self.queue = deque()
         self.running = False
         self.partial_messages = {}
         # For each channel, which type is expected next
@@ -122,18 +128,18 @@ class MethodReader(object):
         been assembled it is placed in the internal queue.
 
         """
-        while self.queue.empty():
+        while not self.queue:
             try:
                 frame_type, channel, payload = self.source.read_frame()
             except Exception, e:
                 #
                 # Connection was closed?  Framing Error?
                 #
-                self.queue.put(e)
+                self.queue.append(e)
                 break
 
             if self.expected_types[channel] != frame_type:
-                self.queue.put((
+                self.queue.append((
                     channel,
                     Exception('Received frame type %s while expecting type: %s' %
                         (frame_type, self.expected_types[channel])
@@ -152,8 +158,8 @@ class MethodReader(object):
         Process Method frames
 
         """
-        method_sig = unpack('>HH', payload[:4])
-        args = AMQPReader(payload[4:])
+        method_sig = _method_sig.unpack_from(payload)
+        args = AMQPBufferReader(payload, 4)
 
         if method_sig in _CONTENT_METHODS:
             #
@@ -162,7 +168,7 @@ class MethodReader(object):
             self.partial_messages[channel] = _PartialMessage(method_sig, args)
             self.expected_types[channel] = 2
         else:
-            self.queue.put((channel, method_sig, args, None))
+            self.queue.append((channel, method_sig, args, None))
 
 
     def _process_content_header(self, channel, payload):
@@ -177,7 +183,7 @@ class MethodReader(object):
             #
             # a bodyless message, we're done
             #
-            self.queue.put((channel, partial.method_sig, partial.args, partial.msg))
+            self.queue.append((channel, partial.method_sig, partial.args, partial.msg))
             del self.partial_messages[channel]
             self.expected_types[channel] = 1
         else:
@@ -199,7 +205,7 @@ class MethodReader(object):
             # Stick the message in the queue and go back to
             # waiting for method frames
             #
-            self.queue.put((channel, partial.method_sig, partial.args, partial.msg))
+            self.queue.append((channel, partial.method_sig, partial.args, partial.msg))
             del self.partial_messages[channel]
             self.expected_types[channel] = 1
 
@@ -210,7 +216,7 @@ class MethodReader(object):
 
         """
         self._next_method()
-        m = self.queue.get()
+        m = self.queue.popleft()
         if isinstance(m, Exception):
             raise m
         return m
@@ -228,17 +234,29 @@ class MethodWriter(object):
 
 
     def write_method(self, channel, method_sig, args, content=None):
-        payload = pack('>HH', method_sig[0], method_sig[1]) + args
+        """
+        Write out a method, with its content header and body frames
+        if any, using a single write to the peer.
 
-        self.dest.write_frame(1, channel, payload)
+        """
+        payload = pack('>HH', method_sig[0], method_sig[1]) + args
+        frames = [(1, channel, payload)]
 
         if content:
             body = content.body
-            payload = pack('>HHQ', method_sig[0], 0, len(body)) + \
+            body_size = len(body)
+            payload = pack('>HHQ', method_sig[0], 0, body_size) + \
                 content._serialize_properties()
-
-            self.dest.write_frame(2, channel, payload)
-
-            while body:
-                payload, body = body[:self.frame_max - 8], body[self.frame_max -8:]
-                self.dest.write_frame(3, channel, payload)
+            frames.append((2, channel, payload))
+
+            chunk_size = self.frame_max - 8
+            if not body_size:
+                pass
+            elif body_size <= chunk_size:
+                frames.append((3, channel, body))
+            else:
+                for offset in xrange(0, body_size, chunk_size):
+                    frames.append((3, channel,
+                                   body[offset:offset + chunk_size]))
+
+        self.dest.write_frames(frames)
@@ -23,7 +23,7 @@ Convert between bytestreams and higher-level AMQP types.
 import string
 from datetime import datetime
 from decimal import Decimal
-from struct import pack, unpack
+from struct import Struct, pack, unpack
 from time import mktime
 
 try:
@@ -34,6 +34,16 @@ except:
 
 DUMP_CHARS = string.letters + string.digits + string.punctuation
 
+#
+# Precompiled structs for the fixed-size AMQP types.
+#
+_octet = Struct('B')
+_short = Struct('>H')
+_long = Struct('>I')
+_longlong = Struct('>Q')
+_signed_long = Struct('>i')
+_timestamp = Struct('>q')
+
 def _hexdump(s):
     """
     Present just for debugging help.
@@ -200,6 +210,283 @@ class AMQPReader(object):
         return datetime.fromtimestamp(self.read_longlong())
 
 
+class AMQPBufferReader(AMQPReader):
+    """
+    Read higher-level AMQP types from a plain string, starting at
+    an offset.
+
+    Values are decoded in place with offset arithmetic and precompiled
+    structs, instead of copying the string into a StringIO and
+    reading it back a few bytes at a time.  Used for the argument
+    lists of methods received from the peer.
+
+    """
+    def __init__(self, source, offset=0):
+        self.buf = source
+        self.offset = offset
+        self.bitcount = self.bits = 0
+
+
+    def close(self):
+        pass
+
+
+    def read(self, n):
+        """
+        Read n bytes.
+
+        """
+        self.bitcount = self.bits = 0
+        offset = self.offset
+        self.offset = offset + n
+        return self.buf[offset:offset + n]
+
+
+    def read_bit(self):
+        """
+        Read a single boolean value.
+
+        """
+        if not self.bitcount:
+            self.bits = ord(self.buf[self.offset])
+            self.offset += 1
+            self.bitcount = 8
+        result = (self.bits & 1) == 1
+        self.bits >>= 1
+        self.bitcount -= 1
+        return result
+
+
+    def read_octet(self):
+        """
+        Read one byte, return as an integer
+
+        """
+        self.bitcount = self.bits = 0
+        offset = self.offset
+        self.offset = offset + 1
+        return _octet.unpack_from(self.buf, offset)[0]
+
+
+    def read_short(self):
+        """
+        Read an unsigned 16-bit integer
+
+        """
+        self.bitcount = self.bits = 0
+        offset = self.offset
+        self.offset = offset + 2
+        return _short.unpack_from(self.buf, offset)[0]
+
+
+    def read_long(self):
+        """
+        Read an unsigned 32-bit integer
+
+        """
+        self.bitcount = self.bits = 0
+        offset = self.offset
+        self.offset = offset + 4
+        return _long.unpack_from(self.buf, offset)[0]
+
+
+    def read_longlong(self):
+        """
+        Read an unsigned 64-bit integer
+
+        """
+        self.bitcount = self.bits = 0
+        offset = self.offset
+        self.offset = offset + 8
+        return _longlong.unpack_from(self.buf, offset)[0]
+
+
+    def read_shortstr(self):
+        """
+        Read a utf-8 encoded string that's stored in up to
+        255 bytes.  Return it decoded as a Python unicode object.
+
+        """
+        self.bitcount = self.bits = 0
+        val, self.offset = _decode_shortstr(self.buf, self.offset)
+        return val
+
+
+    def read_longstr(self):
+        """
+        Read a string that's up to 2**32 bytes, the encoding
+        isn't specified in the AMQP spec, so just return it as
+        a plain Python string.
+
+        """
+        self.bitcount = self.bits = 0
+        val, self.offset = _decode_longstr(self.buf, self.offset)
+        return val
+
+
+    def read_table(self):
+        """
+        Read an AMQP table, and return as a Python dictionary.
+
+        """
+        self.bitcount = self.bits = 0
+        val, self.offset = _decode_table(self.buf, self.offset)
+        return val
+
+
+#
+# Decoders used by AMQPBufferReader and the property codec.  Each takes
+# the buffer and the offset to start at, and returns the decoded value
+# together with the offset just past it.
+#
+
+def _decode_octet(buf, offset):
+    return _octet.unpack_from(buf, offset)[0], offset + 1
+
+
+def _decode_shortstr(buf, offset):
+    end = offset + 1 + _octet.unpack_from(buf, offset)[0]
+    return buf[offset + 1:end].decode('utf-8'), end
+
+
+def _decode_longstr(buf, offset):
+    end = offset + 4 + _long.unpack_from(buf, offset)[0]
+    return buf[offset + 4:end], end
+
+
+def _decode_timestamp(buf, offset):
+    return (datetime.fromtimestamp(_longlong.unpack_from(buf, offset)[0]),
+            offset + 8)
+
+
+def _decode_table(buf, offset):
+    end = offset + 4 + _long.unpack_from(buf, offset)[0]
+    offset += 4
+    result = {}
+    while offset < end:
+        name, offset = _decode_shortstr(buf, offset)
+        ftype = buf[offset]
+        offset += 1
+        if ftype == 'S':
+            val, offset = _decode_longstr(buf, offset)
+        elif ftype == 'I':
+            val = _signed_long.unpack_from(buf, offset)[0]
+            offset += 4
+        elif ftype == 'D':
+            d = _octet.unpack_from(buf, offset)[0]
+            n = _signed_long.unpack_from(buf, offset + 1)[0]
+            offset += 5
+            val = Decimal(n) / Decimal(10 ** d)
+        elif ftype == 'T':
+            val, offset = _decode_timestamp(buf, offset)
+        elif ftype == 'F':
+            val, offset = _decode_table(buf, offset) # recurse
+        result[name] = val
+    return result, end
+
+
+#
+# Encoders used by the property codec, each returns the encoded value
+# as a string.
+#
+
+def _encode_octet(n):
+    if (n < 0) or (n > 255):
+        raise ValueError('Octet out of range 0..255')
+    return _octet.pack(n)
+
+
+def _encode_shortstr(s):
+    if isinstance(s, unicode):
+        s = s.encode('utf-8')
+    if len(s) > 255:
+        raise ValueError('String too long')
+    return _octet.pack(len(s)) + s
+
+
+def _encode_longstr(s):
+    if isinstance(s, unicode):
+        s = s.encode('utf-8')
+    return _long.pack(len(s)) + s
+
+
+def _encode_timestamp(v):
+    return _timestamp.pack(long(mktime(v.timetuple())))
+
+
+def _encode_table(d):
+    parts = []
+    for k, v in d.items():
+        parts.append(_encode_shortstr(k))
+        if isinstance(v, basestring):
+            parts.append('S')
+            parts.append(_encode_longstr(v))
+        elif isinstance(v, (int, long)):
+            parts.append('I')
+            parts.append(_signed_long.pack(v))
+        elif isinstance(v, Decimal):
+            sign, digits, exponent = v.as_tuple()
+            v = 0
+            for d in digits:
+                v = (v * 10) + d
+            if sign:
+                v = -v
+            parts.append('D')
+            parts.append(_encode_octet(-exponent))
+            parts.append(_signed_long.pack(v))
+        elif isinstance(v, datetime):
+            parts.append('T')
+            parts.append(_encode_timestamp(v))
+        elif isinstance(v, dict):
+            parts.append('F')
+            parts.append(_encode_table(v))
+    table_data = ''.join(parts)
+    return _long.pack(len(table_data)) + table_data
+
+
+_PROPERTY_DECODERS = {
+    'octet': _decode_octet,
+    'shortstr': _decode_shortstr,
+    'longstr': _decode_longstr,
+    'table': _decode_table,
+    'timestamp': _decode_timestamp,
+}
+
+_PROPERTY_ENCODERS = {
+    'octet': _encode_octet,
+    'shortstr': _encode_shortstr,
+    'longstr': _encode_longstr,
+    'table': _encode_table,
+    'timestamp': _encode_timestamp,
+}
+
+
+def _reader_decoder(proptype):
+    """
+    Fallback decoder for property types without a fast decoder,
+    going through the matching AMQPBufferReader.read_* method.
+
+    """
+    def decode(buf, offset):
+        r = AMQPBufferReader(buf, offset)
+        val = getattr(r, 'read_' + proptype)()
+        return val, r.offset
+    return decode
+
+
+def _writer_encoder(proptype):
+    """
+    Fallback encoder for property types without a fast encoder,
+    going through the matching AMQPWriter.write_* method.
+
+    """
+    def encode(val):
+        w = AMQPWriter()
+        getattr(w, 'write_' + proptype)(val)
+        return w.getvalue()
+    return encode
+
+
 class AMQPWriter(object):
     """
     Convert higher-level AMQP types to bytestreams.
@@ -224,7 +511,7 @@ class AMQPWriter(object):
     def _flushbits(self):
         if self.bits:
             for b in self.bits:
-                self.out.write(pack('B', b))
+                self.out.write(_octet.pack(b))
             self.bits = []
             self.bitcount = 0
 
@@ -289,7 +576,7 @@ class AMQPWriter(object):
         if (n < 0) or (n > 255):
             raise ValueError('Octet out of range 0..255')
         self._flushbits()
-        self.out.write(pack('B', n))
+        self.out.write(_octet.pack(n))
 
 
     def write_short(self, n):
@@ -300,7 +587,7 @@ class AMQPWriter(object):
         if (n < 0) or (n > 65535):
             raise ValueError('Octet out of range 0..65535')
         self._flushbits()
-        self.out.write(pack('>H', n))
+        self.out.write(_short.pack(n))
 
 
     def write_long(self, n):
@@ -311,7 +598,7 @@ class AMQPWriter(object):
         if (n < 0) or (n >= (2**32)):
             raise ValueError('Octet out of range 0..2**31-1')
         self._flushbits()
-        self.out.write(pack('>I', n))
+        self.out.write(_long.pack(n))
 
 
     def write_longlong(self, n):
@@ -322,7 +609,7 @@ class AMQPWriter(object):
         if (n < 0) or (n >= (2**64)):
             raise ValueError('Octet out of range 0..2**64-1')
         self._flushbits()
-        self.out.write(pack('>Q', n))
+        self.out.write(_longlong.pack(n))
 
 
     def write_shortstr(self, s):
@@ -371,7 +658,7 @@ class AMQPWriter(object):
                 table_data.write_longstr(v)
             elif isinstance(v, (int, long)):
                 table_data.write('I')
-                table_data.write(pack('>i', v))
+                table_data.write(_signed_long.pack(v))
             elif isinstance(v, Decimal):
                 table_data.write('D')
                 sign, digits, exponent = v.as_tuple()
@@ -381,7 +668,7 @@ class AMQPWriter(object):
                 if sign:
                     v = -v
                 table_data.write_octet(-exponent)
-                table_data.write(pack('>i', v))
+                table_data.write(_signed_long.pack(v))
             elif isinstance(v, datetime):
                 table_data.write('T')
                 table_data.write_timestamp(v)
@@ -400,7 +687,7 @@ class AMQPWriter(object):
         representing seconds since the Unix epoch.
 
         """
-        self.out.write(pack('>q', long(mktime(v.timetuple()))))
+        self.out.write(_timestamp.pack(long(mktime(v.timetuple()))))
 
 
 class GenericContent(object):
@@ -462,35 +749,67 @@ class GenericContent(object):
         return not self.__eq__(other)
 
 
-    def _load_properties(self, raw_bytes):
+    def _property_codec(self):
+        """
+        Return the (decoders, encoders) for this class's PROPERTIES,
+        as lists of (name, function) pairs in property order.
+
+        Built on first use and cached per class.  Property types with
+        no fast decoder or encoder fall back to the AMQPBufferReader and
+        AMQPWriter methods for that type; a 'bit' property has no
+        encoder since it is carried entirely in the property flags.
+
+        """
+        cls = self.__class__
+        codec = _property_codecs.get(cls)
+        if codec is None:
+            decoders = []
+            encoders = []
+            for key, proptype in cls.PROPERTIES:
+                decode = _PROPERTY_DECODERS.get(proptype)
+                if decode is None:
+                    decode = _reader_decoder(proptype)
+                decoders.append((key, decode))
+
+                encode = _PROPERTY_ENCODERS.get(proptype)
+                if encode is None and proptype != 'bit':
+                    encode = _writer_encoder(proptype)
+                encoders.append((key, encode))
+            codec = _property_codecs[cls] = (decoders, encoders)
+        return codec
+
+
+    def _load_properties(self, raw_bytes, offset=0):
         """
         Given the raw bytes containing the property-flags and property-list
         from a content-frame-header, parse and insert into a dictionary
         stored in this object as an attribute named 'properties'.
 
-        """
-        r = AMQPReader(raw_bytes)
+        Decoding starts at the given offset into raw_bytes.
 
+        """
         #
         # Read 16-bit shorts until we get one with a low bit set to zero
         #
         flags = []
         while True:
-            flag_bits = r.read_short()
+            flag_bits = _short.unpack_from(raw_bytes, offset)[0]
+            offset += 2
             flags.append(flag_bits)
             if flag_bits & 1 == 0:
                 break
+        flags.reverse()
 
         shift = 0
         d = {}
-        for key, proptype in self.PROPERTIES:
+        for key, decode in self._property_codec()[0]:
             if shift == 0:
                 if not flags:
                     break
-                flag_bits, flags = flags[0], flags[1:]
+                flag_bits = flags.pop()
                 shift = 15
             if flag_bits & (1 << shift):
-                d[key] = getattr(r, 'read_' + proptype)()
+                d[key], offset = decode(raw_bytes, offset)
             shift -= 1
 
         self.properties = d
@@ -506,9 +825,10 @@ class GenericContent(object):
         shift = 15
         flag_bits = 0
         flags = []
-        raw_bytes = AMQPWriter()
-        for key, proptype in self.PROPERTIES:
-            val = self.properties.get(key, None)
+        raw_bytes = []
+        properties = self.properties
+        for key, encode in self._property_codec()[1]:
+            val = properties.get(key, None)
             if val is not None:
                 if shift == 0:
                     flags.append(flag_bits)
@@ -516,15 +836,17 @@ class GenericContent(object):
                     shift = 15
 
                 flag_bits |= (1 << shift)
-                if proptype != 'bit':
-                    getattr(raw_bytes, 'write_' + proptype)(val)
+                if encode is not None:
+                    raw_bytes.append(encode(val))
 
             shift -= 1
 
         flags.append(flag_bits)
-        result = AMQPWriter()
-        for flag_bits in flags:
-            result.write_short(flag_bits)
-        result.write(raw_bytes.getvalue())
+        return pack('>%dH' % len(flags), *flags) + ''.join(raw_bytes)
+
 
-        return result.getvalue()
+#
+# (decoders, encoders) for each GenericContent subclass,
+# see GenericContent._property_codec()
+#
+_property_codecs = {}
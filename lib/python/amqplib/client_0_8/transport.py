@@ -31,10 +31,24 @@ try:
 except:
     HAVE_PY26_SSL = False
 
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
+
+#
+# memoryview is needed to recv directly into the read buffer,
+# it's only available in Python 2.7+
+#
+try:
+    memoryview
+    HAVE_MEMORYVIEW = True
+except NameError:
+    HAVE_MEMORYVIEW = False
 
 AMQP_PORT = 5672
 
+# Initial size of the TCPTransport read buffer, large enough to
+# hold a frame of the default frame_max size.
+READ_BUFFER_SIZE = 131072 + 8
+
 # Yes, Advanced Message Queuing Protocol Protocol is redundant
 AMQP_PROTOCOL_HEADER = 'AMQP\x01\x01\x09\x01'
 
@@ -44,6 +58,8 @@ class _AbstractTransport(object):
     Common superclass for TCP and SSL transports
 
     """
+    _write_buffer = None
+
     def __init__(self, host, connect_timeout):
         if ':' in host:
             host, port = host.split(':', 1)
@@ -117,12 +133,55 @@ class _AbstractTransport(object):
 
     def write_frame(self, frame_type, channel, payload):
         """
-        Write out an AMQP frame.
+        Write out an AMQP frame, or add it to the write buffer
+        if the transport is corked.
 
         """
         size = len(payload)
-        self._write(pack('>BHI%dsB' % size,
-            frame_type, channel, size, payload, 0xce))
+        frame = pack('>BHI%dsB' % size,
+            frame_type, channel, size, payload, 0xce)
+        if self._write_buffer is not None:
+            self._write_buffer.append(frame)
+        else:
+            self._write(frame)
+
+
+    def write_frames(self, frames):
+        """
+        Write out several AMQP frames, given as a list of
+        (frame_type, channel, payload) tuples, with a single write,
+        or add them to the write buffer if the transport is corked.
+
+        """
+        parts = []
+        for frame_type, channel, payload in frames:
+            parts.append(pack('>BHI', frame_type, channel, len(payload)))
+            parts.append(payload)
+            parts.append('\xce')
+        data = ''.join(parts)
+        if self._write_buffer is not None:
+            self._write_buffer.append(data)
+        else:
+            self._write(data)
+
+
+    def cork(self):
+        """
+        Start buffering outgoing frames, until uncork() is called.
+
+        """
+        if self._write_buffer is None:
+            self._write_buffer = []
+
+
+    def uncork(self):
+        """
+        Write out all buffered frames in one go, and stop buffering.
+
+        """
+        frames, self._write_buffer = self._write_buffer, None
+        if frames:
+            self._write(''.join(frames))
 
 
 class SSLTransport(_AbstractTransport):
@@ -186,9 +245,18 @@ class TCPTransport(_AbstractTransport):
         Setup to _write() directly to the socket, and
         do our own buffered reads.
 
+        If memoryview is available, the socket is read directly into a
+        preallocated buffer, and frames are parsed from the buffer
+        in place.
+
         """
         self._write = self.sock.sendall
         self._read_buffer = ''
+        if HAVE_MEMORYVIEW:
+            self._rbuf = bytearray(READ_BUFFER_SIZE)
+            self._rpos = self._wpos = 0
+            self._read = self._read_into
+            self.read_frame = self._read_frame_into
 
 
     def _read(self, n):
@@ -208,6 +276,81 @@ class TCPTransport(_AbstractTransport):
         return result
 
 
+    def _fill(self, n):
+        """
+        Make sure at least n unread bytes are in the read buffer,
+        reading from the socket if needed.
+
+        The unread bytes are only moved to the front of the buffer
+        when there's no room left at the end of it, and the buffer
+        only grows if n is larger than the buffer.
+
+        """
+        available = self._wpos - self._rpos
+        if available >= n:
+            return
+
+        buf = self._rbuf
+        if self._rpos + n > len(buf):
+            if n > len(buf):
+                buf = bytearray(max(n, len(buf) * 2))
+            buf[:available] = self._rbuf[self._rpos:self._wpos]
+            self._rbuf = buf
+            self._rpos, self._wpos = 0, available
+
+        view = memoryview(buf)
+        recv_into = self.sock.recv_into
+        while self._wpos - self._rpos < n:
+            received = recv_into(view[self._wpos:])
+            if not received:
+                raise IOError('Socket closed')
+            self._wpos += received
+
+
+    def _consume(self, n):
+        """
+        Mark n bytes of the read buffer as read.
+
+        """
+        self._rpos += n
+        if self._rpos == self._wpos:
+            self._rpos = self._wpos = 0
+
+
+    def _read_into(self, n):
+        """
+        Read exactly n bytes from the socket, using the read buffer.
+
+        """
+        self._fill(n)
+        start = self._rpos
+        result = memoryview(self._rbuf)[start:start + n].tobytes()
+        self._consume(n)
+        return result
+
+
+    def _read_frame_into(self):
+        """
+        Read an AMQP frame, parsed directly from the read buffer.
+
+        Nothing is consumed until the whole frame has been received,
+        so a socket timeout doesn't leave a partial frame behind.
+
+        """
+        self._fill(7)
+        frame_type, channel, size = unpack_from('>BHI', self._rbuf,
+                                                self._rpos)
+        self._fill(size + 8)
+        start = self._rpos + 7
+        end = start + size
+        ch = self._rbuf[end]
+        if ch != 0xce:
+            raise Exception('Framing Error, received 0x%02x while expecting 0xce' % ch)
+        payload = memoryview(self._rbuf)[start:end].tobytes()
+        self._consume(size + 8)
+        return frame_type, channel, payload
+
+
 def create_transport(host, connect_timeout, ssl=False):
     """
     Given a few parameters from the Connection constructor,
@@ -0,0 +1,116 @@
+"""
+Test queueing methods received out of order in MethodQueue.
+
+"""
+import unittest
+
+from amqplib.client_0_8.abstract_channel import MethodQueue
+from amqplib.client_0_8.connection import Connection
+
+OPEN_OK = (20, 11)
+CLOSE = (20, 40)
+QOS_OK = (60, 11)
+CONSUME_OK = (60, 21)
+DELIVER = (60, 60)
+
+
+def method(method_sig, n=0):
+    return (method_sig, 'args%d' % n, None)
+
+
+class TestMethodQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = MethodQueue()
+
+    def test_empty(self):
+        self.assertEqual(self.queue.pop_matching(), None)
+        self.assertEqual(self.queue.pop_matching([DELIVER]), None)
+
+    def test_any_method(self):
+        self.queue.append(method(DELIVER, 1))
+        self.queue.append(method(QOS_OK, 2))
+        self.assertEqual(self.queue.pop_matching(), method(DELIVER, 1))
+        self.assertEqual(self.queue.pop_matching(None), method(QOS_OK, 2))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_out_of_order(self):
+        self.queue.append(method(DELIVER, 1))
+        self.queue.append(method(CONSUME_OK, 2))
+        self.queue.append(method(DELIVER, 3))
+        self.queue.append(method(QOS_OK, 4))
+
+        self.assertEqual(self.queue.pop_matching([QOS_OK]), method(QOS_OK, 4))
+        self.assertEqual(self.queue.pop_matching([CONSUME_OK, QOS_OK]),
+                         method(CONSUME_OK, 2))
+        self.assertEqual(self.queue.pop_matching([CONSUME_OK]), None)
+        # the methods nobody asked for are kept, in order,
+        # for a later wait.
+        self.assertEqual(list(self.queue),
+                         [method(DELIVER, 1), method(DELIVER, 3)])
+        self.assertEqual(self.queue.pop_matching([DELIVER]),
+                         method(DELIVER, 1))
+        self.assertEqual(self.queue.pop_matching([DELIVER]),
+                         method(DELIVER, 3))
+        self.assertEqual(self.queue._counts, {})
+
+    def test_close_always_matches(self):
+        self.queue.append(method(DELIVER))
+        self.queue.append(method(CLOSE))
+        self.assertEqual(self.queue.pop_matching([QOS_OK]), method(CLOSE))
+        self.assertEqual(list(self.queue), [method(DELIVER)])
+
+    def test_remove(self):
+        self.queue.append(method(DELIVER, 1))
+        self.queue.append(method(DELIVER, 2))
+        self.queue.remove(method(DELIVER, 1))
+        self.assertEqual(self.queue._counts, {DELIVER: 1})
+        self.queue.remove(method(DELIVER, 2))
+        self.assertEqual(self.queue._counts, {})
+        self.assertRaises(ValueError, self.queue.remove, method(DELIVER, 2))
+
+
+class MockChannel(object):
+
+    def __init__(self):
+        self.method_queue = MethodQueue()
+
+
+class MockMethodReader(object):
+
+    def __init__(self, methods):
+        self.methods = list(methods)
+
+    def read_method(self):
+        return self.methods.pop(0)
+
+
+class TestWaitMethod(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection.__new__(Connection)
+        self.connection.channels = {1: MockChannel(), 2: MockChannel()}
+
+    def test_keeps_other_methods_for_later(self):
+        self.connection.method_reader = MockMethodReader([
+            (1, DELIVER, 'args1', None),
+            (2, OPEN_OK, 'args2', None),
+            (1, QOS_OK, 'args3', None),
+            ])
+        wait = self.connection._wait_method
+        self.assertEqual(wait(1, [QOS_OK]), (QOS_OK, 'args3', None))
+        self.assertEqual(wait(2, [OPEN_OK]), (OPEN_OK, 'args2', None))
+        self.assertEqual(wait(1, None), (DELIVER, 'args1', None))
+        self.assertEqual(self.connection.method_reader.methods, [])
+
+
+def main():
+    suite = unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(TestMethodQueue),
+        unittest.TestLoader().loadTestsFromTestCase(TestWaitMethod),
+        ])
+    unittest.TextTestRunner().run(suite)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Test splitting methods into AMQP frames in MethodWriter.
+
+"""
+import unittest
+from struct import pack
+
+from amqplib.client_0_8.basic_message import Message
+from amqplib.client_0_8.method_framing import MethodWriter
+
+FRAME_MAX = 64
+CHUNK_SIZE = FRAME_MAX - 8
+
+
+class MockTransport(object):
+
+    def __init__(self):
+        self.writes = []
+
+    def write_frames(self, frames):
+        self.writes.append(frames)
+
+
+class TestMethodWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.dest = MockTransport()
+        self.writer = MethodWriter(self.dest, FRAME_MAX)
+
+    def write(self, body):
+        msg = Message(body, content_type='text/plain')
+        self.writer.write_method(1, (60, 40), 'args', msg)
+        self.assertEqual(len(self.dest.writes), 1)
+        frames = self.dest.writes.pop()
+        self.assertEqual(frames[0], (1, 1, pack('>HH', 60, 40) + 'args'))
+        self.assertEqual(frames[1], (2, 1, pack('>HHQ', 60, 0, len(body)) +
+                                     msg._serialize_properties()))
+        for frame_type, channel, payload in frames[2:]:
+            self.assertEqual((frame_type, channel), (3, 1))
+            self.assert_(len(payload) + 8 <= FRAME_MAX)
+        self.assertEqual(''.join([f[2] for f in frames[2:]]), body)
+        return [len(f[2]) for f in frames[2:]]
+
+    def test_method_without_content(self):
+        self.writer.write_method(2, (20, 10), '')
+        self.assertEqual(self.dest.writes, [[(1, 2, pack('>HH', 20, 10))]])
+
+    def test_empty_body(self):
+        self.assertEqual(self.write(''), [])
+
+    def test_frame_max_boundary(self):
+        body = ''.join([chr(i % 256) for i in xrange(4 * CHUNK_SIZE + 1)])
+        for size, chunks in [
+                (1, [1]),
+                (CHUNK_SIZE - 1, [CHUNK_SIZE - 1]),
+                (CHUNK_SIZE, [CHUNK_SIZE]),
+                (CHUNK_SIZE + 1, [CHUNK_SIZE, 1]),
+                (2 * CHUNK_SIZE, [CHUNK_SIZE, CHUNK_SIZE]),
+                (4 * CHUNK_SIZE + 1, [CHUNK_SIZE] * 4 + [1])]:
+            self.assertEqual(self.write(body[:size]), chunks)
+
+
+def main():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestMethodWriter)
+    unittest.TextTestRunner().run(suite)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Test reading and writing AMQP frames in TCPTransport, without a network.
+
+"""
+import socket
+import unittest
+from struct import pack
+
+from amqplib.client_0_8 import transport
+from amqplib.client_0_8.transport import TCPTransport
+
+
+def frame(frame_type, channel, payload):
+    return pack('>BHI', frame_type, channel, len(payload)) + payload + '\xce'
+
+
+class MockSocket(object):
+    """
+    Socket receiving data in chunks of the given sizes (the last size
+    is repeated), raising socket.timeout at every None in data.
+
+    """
+    def __init__(self, data, chunk_sizes=(65536, )):
+        self.data = list(data)
+        self.chunk_sizes = list(chunk_sizes)
+        self.sent = []
+
+    def _next_chunk(self, n):
+        if not self.data:
+            return ''
+        if self.data[0] is None:
+            self.data.pop(0)
+            raise socket.timeout()
+        size = self.chunk_sizes[0]
+        if len(self.chunk_sizes) > 1:
+            self.chunk_sizes.pop(0)
+        chunk = self.data[0][:min(n, size)]
+        self.data[0] = self.data[0][len(chunk):]
+        if not self.data[0]:
+            self.data.pop(0)
+        return chunk
+
+    def recv(self, n):
+        return self._next_chunk(n)
+
+    def recv_into(self, view):
+        chunk = self._next_chunk(len(view))
+        view[:len(chunk)] = chunk
+        return len(chunk)
+
+    def sendall(self, s):
+        self.sent.append(s)
+
+    def close(self):
+        pass
+
+
+def create_transport(sock, use_memoryview=True):
+    have_memoryview = transport.HAVE_MEMORYVIEW
+    transport.HAVE_MEMORYVIEW = have_memoryview and use_memoryview
+    try:
+        t = TCPTransport.__new__(TCPTransport)
+        t.sock = sock
+        t._setup_transport()
+    finally:
+        transport.HAVE_MEMORYVIEW = have_memoryview
+    return t
+
+
+FRAMES = [
+    (1, 0, ''),
+    (1, 1, 'x'),
+    (2, 1, ''.join([chr(i % 256) for i in xrange(300)])),
+    (3, 65535, '\xce' * 5000),
+    ]
+
+
+class TestReadFrame(unittest.TestCase):
+
+    def check_frames(self, use_memoryview):
+        data = ''.join([frame(*f) for f in FRAMES])
+        for chunk_size in (1, 3, 7, 8, 100, 4096, 65536):
+            t = create_transport(MockSocket([data], [chunk_size]),
+                                 use_memoryview)
+            for f in FRAMES:
+                self.assertEqual(t.read_frame(), f)
+            self.assertRaises(IOError, t.read_frame)
+
+    def test_split_across_reads(self):
+        self.check_frames(True)
+
+    def test_split_across_reads_without_buffer(self):
+        self.check_frames(False)
+
+    def test_framing_error(self):
+        for use_memoryview in True, False:
+            t = create_transport(MockSocket([frame(1, 1, 'abc')[:-1] + 'x']),
+                                 use_memoryview)
+            self.assertRaises(Exception, t.read_frame)
+
+
+class TestReadBuffer(unittest.TestCase):
+
+    def setUp(self):
+        if not transport.HAVE_MEMORYVIEW:
+            return
+        self.sock = MockSocket([])
+        self.t = create_transport(self.sock)
+        self.t._rbuf = bytearray(64)
+
+    def test_compacts_at_end_of_buffer(self):
+        if not transport.HAVE_MEMORYVIEW:
+            return
+        frames = [(1, 1, str(i) * 20) for i in xrange(4)]   # 28 bytes each
+        self.sock.data = [''.join([frame(*f) for f in frames])]
+        self.assertEqual(self.t.read_frame(), frames[0])
+        self.assertEqual(self.t.read_frame(), frames[1])
+        # the third frame doesn't fit after the unread bytes,
+        # so they are moved to the front instead of growing the buffer.
+        self.assertEqual(self.t.read_frame(), frames[2])
+        self.assertEqual(len(self.t._rbuf), 64)
+        self.assertEqual(self.t.read_frame(), frames[3])
+        self.assertEqual((self.t._rpos, self.t._wpos), (0, 0))
+
+    def test_frame_filling_buffer(self):
+        if not transport.HAVE_MEMORYVIEW:
+            return
+        frames = [(1, 1, 'a' * 56), (1, 2, 'b' * 56)]       # 64 bytes each
+        self.sock.data = [''.join([frame(*f) for f in frames])]
+        self.assertEqual(self.t.read_frame(), frames[0])
+        self.assertEqual((self.t._rpos, self.t._wpos), (0, 0))
+        self.assertEqual(self.t.read_frame(), frames[1])
+        self.assertEqual(len(self.t._rbuf), 64)
+
+    def test_grows_for_large_frame(self):
+        if not transport.HAVE_MEMORYVIEW:
+            return
+        frames = [(1, 1, 'a' * 10), (3, 1, 'b' * 200), (1, 1, 'c')]
+        self.sock.data = [''.join([frame(*f) for f in frames])]
+        self.sock.chunk_sizes = [30]
+        for f in frames:
+            self.assertEqual(self.t.read_frame(), f)
+        self.assertEqual(len(self.t._rbuf), 208)
+
+    def test_timeout_leaves_partial_frame(self):
+        if not transport.HAVE_MEMORYVIEW:
+            return
+        data = frame(3, 1, 'x' * 40)
+        self.sock.data = [data[:5], None, data[5:30], None, data[30:]]
+        self.assertRaises(socket.timeout, self.t.read_frame)
+        self.assertRaises(socket.timeout, self.t.read_frame)
+        self.assertEqual(self.t.read_frame(), (3, 1, 'x' * 40))
+
+    def test_read(self):
+        if not transport.HAVE_MEMORYVIEW:
+            return
+        self.sock.data = ['abc', 'defgh']
+        self.sock.chunk_sizes = [2]
+        self.assertEqual(self.t._read(4), 'abcd')
+        self.assertEqual(self.t._read(4), 'efgh')
+        self.assertRaises(IOError, self.t._read, 1)
+
+
+class TestWriteFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.sock = MockSocket([])
+        self.t = create_transport(self.sock)
+
+    def test_write_frame(self):
+        self.t.write_frame(1, 2, 'abc')
+        self.assertEqual(self.sock.sent, [frame(1, 2, 'abc')])
+
+    def test_several_frames_in_one_write(self):
+        self.t.write_frames(FRAMES)
+        self.assertEqual(self.sock.sent,
+                         [''.join([frame(*f) for f in FRAMES])])
+
+    def test_frames_read_back(self):
+        self.t.write_frames(FRAMES)
+        t = create_transport(MockSocket(self.sock.sent, [7]))
+        for f in FRAMES:
+            self.assertEqual(t.read_frame(), f)
+
+    def test_cork(self):
+        self.t.cork()
+        self.t.write_frame(1, 1, 'a')
+        self.t.cork()
+        self.t.write_frames(FRAMES)
+        self.assertEqual(self.sock.sent, [])
+        self.t.uncork()
+        self.assertEqual(self.sock.sent,
+            [frame(1, 1, 'a') + ''.join([frame(*f) for f in FRAMES])])
+        self.t.write_frame(1, 1, 'b')
+        self.assertEqual(self.sock.sent[1:], [frame(1, 1, 'b')])
+
+    def test_uncork_nothing_written(self):
+        self.t.cork()
+        self.t.uncork()
+        self.t.uncork()
+        self.assertEqual(self.sock.sent, [])
+
+
+def main():
+    suite = unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(TestReadFrame),
+        unittest.TestLoader().loadTestsFromTestCase(TestReadBuffer),
+        unittest.TestLoader().loadTestsFromTestCase(TestWriteFrames),
+        ])
+    unittest.TextTestRunner().run(suite)
+
+
+if __name__ == '__main__':
+    main()
@@ -164,6 +164,18 @@ class BaseBackend(object):
         """Publish a message."""
         pass
 
+    def publish_many(self, messages, channels=1):
+        """Publish many messages.
+
+        :param messages: List of dictionaries with the keyword arguments
+            for :meth:`publish`.
+        :keyword channels: Number of channels to distribute the messages
+            over, if supported by the backend.
+
+        """
+        for message in messages:
+            self.publish(**message)
+
     def close(self):
         """Close the backend."""
         pass
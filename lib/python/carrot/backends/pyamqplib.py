@@ -26,7 +26,7 @@ class Connection(amqp.Connection):
         """Wait for an event on a channel."""
         chanmap = dict((chan.channel_id, chan) for chan in channels)
         chanid, method_sig, args, content = self._wait_multiple(
-                chanmap.keys(), allowed_methods, timeout=timeout)
+                chanmap, allowed_methods, timeout=timeout)
 
         channel = chanmap[chanid]
 
@@ -62,14 +62,10 @@ class Connection(amqp.Connection):
     def _wait_multiple(self, channel_ids, allowed_methods, timeout=None):
         for channel_id in channel_ids:
             method_queue = self.channels[channel_id].method_queue
-            for queued_method in method_queue:
-                method_sig = queued_method[0]
-                if (allowed_methods is None) \
-                or (method_sig in allowed_methods) \
-                or (method_sig == (20, 40)):
-                    method_queue.remove(queued_method)
-                    method_sig, args, content = queued_method
-                    return channel_id, method_sig, args, content
+            queued_method = method_queue.pop_matching(allowed_methods)
+            if queued_method is not None:
+                method_sig, args, content = queued_method
+                return channel_id, method_sig, args, content
 
         # Nothing queued, need to wait for a method from the peer
         while True:
@@ -334,6 +330,42 @@ class Backend(BaseBackend):
         if mandatory or immediate:
             self.close()
 
+    def publish_many(self, messages, channels=1, flush_every=1000):
+        """Publish many messages.
+
+        The frames of up to ``flush_every`` messages are buffered and
+        written to the socket at once, and the messages are distributed
+        round-robin over ``channels`` channels.
+
+        """
+        pubchannels = [self.channel] + [self.connection.get_channel()
+                                            for i in xrange(channels - 1)]
+        transport = self.channel.connection.transport
+        close_after = False
+        transport.cork()
+        try:
+            for i, options in enumerate(messages):
+                message = options["message"]
+                if options.get("headers"):
+                    message.properties["headers"] = options["headers"]
+                mandatory = options.get("mandatory")
+                immediate = options.get("immediate")
+                close_after = close_after or mandatory or immediate
+                channel = pubchannels[i % len(pubchannels)]
+                channel.basic_publish(message, exchange=options["exchange"],
+                                      routing_key=options["routing_key"],
+                                      mandatory=mandatory,
+                                      immediate=immediate)
+                if not (i + 1) % flush_every:
+                    transport.uncork()
+                    transport.cork()
+        finally:
+            transport.uncork()
+            for channel in pubchannels[1:]:
+                channel.close()
+        if close_after:
+            self.close()
+
     def qos(self, prefetch_size, prefetch_count, apply_global=False):
         """Request specific Quality of Service."""
         self.channel.basic_qos(prefetch_size, prefetch_count,
@@ -744,22 +744,51 @@ class Publisher(object):
         :keyword serializer: Override the default :attr:`serializer`.
 
         """
+        self.backend.publish(**self._prepare_send(message_data,
+                                            routing_key=routing_key,
+                                            delivery_mode=delivery_mode,
+                                            mandatory=mandatory,
+                                            immediate=immediate,
+                                            priority=priority,
+                                            content_type=content_type,
+                                            content_encoding=content_encoding,
+                                            serializer=serializer))
+
+    def send_many(self, messages, channels=1):
+        """Send many messages at once.
+
+        All of the messages are serialized before any of them are sent,
+        and backends supporting it will write them to the broker in bulk.
+
+        :param messages: List of ``(message_data, options)`` tuples,
+            where ``options`` is a dictionary with the keyword arguments
+            supported by :meth:`send`.
+
+        :keyword channels: Number of channels to distribute the messages
+            over, if supported by the backend.
+
+        """
+        self.backend.publish_many([self._prepare_send(message_data, **options)
+                                        for message_data, options in messages],
+                                  channels=channels)
+
+    def _prepare_send(self, message_data, routing_key=None,
+            delivery_mode=None, mandatory=False, immediate=False, priority=0,
+            content_type=None, content_encoding=None, serializer=None):
         headers = None
         routing_key = routing_key or self.routing_key
 
         if self.exchange_type == "headers":
             headers, routing_key = routing_key, ""
 
-
         message = self.create_message(message_data, priority=priority,
                                       delivery_mode=delivery_mode,
                                       content_type=content_type,
                                       content_encoding=content_encoding,
                                       serializer=serializer)
-        self.backend.publish(message,
-                             exchange=self.exchange, routing_key=routing_key,
-                             mandatory=mandatory, immediate=immediate,
-                             headers=headers)
+        return dict(message=message, exchange=self.exchange,
+                    routing_key=routing_key, mandatory=mandatory,
+                    immediate=immediate, headers=headers)
 
     def close(self):
         """Close connection to queue."""
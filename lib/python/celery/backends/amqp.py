@@ -1,17 +1,21 @@
 """celery.backends.amqp"""
+import os
+import select
 import socket
 import time
+import threading
 
 from datetime import timedelta
 
-from carrot.messaging import Consumer, Publisher
+from carrot.messaging import Consumer, ConsumerSet, Publisher
 
 from celery import conf
 from celery import states
 from celery.backends.base import BaseDictBackend
 from celery.exceptions import TimeoutError
 from celery.messaging import establish_connection
-from celery.utils import timeutils
+from celery.utils import timeutils, gen_unique_id
+from celery.utils.compat import OrderedDict
 
 
 class ResultPublisher(Publisher):
@@ -44,6 +48,281 @@ class ResultConsumer(Consumer):
                 queue=routing_key, routing_key=routing_key, **kwargs)
 
 
+class ReplyPublisher(Publisher):
+    exchange = conf.RESULT_EXCHANGE
+    exchange_type = conf.RESULT_EXCHANGE_TYPE
+    delivery_mode = conf.RESULT_PERSISTENT and 2 or 1
+    serializer = conf.RESULT_SERIALIZER
+    durable = conf.RESULT_PERSISTENT
+    auto_delete = True
+
+
+class ReplyConsumer(Consumer):
+    exchange = conf.RESULT_EXCHANGE
+    exchange_type = conf.RESULT_EXCHANGE_TYPE
+    durable = conf.RESULT_PERSISTENT
+    exclusive = True
+    no_ack = True
+
+    def __init__(self, connection, queue, **kwargs):
+        super(ReplyConsumer, self).__init__(connection,
+                queue=queue, routing_key=queue, **kwargs)
+
+
+class ReplyDemultiplexer(object):
+    """Receives the results sent to the reply queue of a process, and
+    hands them out to the threads waiting for them.
+
+    :param backend: The :class:`AMQPBackend` to cache the results in.
+    :param connection: The connection to consume from.
+    :keyword pending_limit: Maximum number of pending replies not
+        waited for.  Defaults to the ``CELERY_MAX_CACHED_RESULTS``
+        setting.
+
+    The reply queue is declared once, and results are told apart by
+    the task id they carry.  One waiting thread at a time receives from
+    the connection, while the others wait for it to collect their
+    results.
+
+    Replies are kept in :attr:`pending` until they are taken, and only
+    then moved to the result cache of the backend, so a result being
+    waited for is never evicted by other replies before it is read.
+    When more than ``pending_limit`` replies are pending, the oldest
+    replies nobody is waiting for are dropped, states of unready tasks
+    first.  This keeps the results of tasks that are never waited for
+    from piling up, but a result that arrives before its waiter calls
+    :meth:`wait` may be lost if that many other replies arrive too.
+
+    .. attribute:: queue
+
+        Name of the reply queue.
+
+    .. attribute:: reply_to
+
+        Where to send results to, as passed in task messages.
+
+    .. attribute:: pending
+
+        Mapping of task ids to the latest reply received for tasks
+        whose result has not been taken yet.
+
+    """
+    poll_timeout = 0.01
+
+    def __init__(self, backend, connection, pending_limit=None):
+        self.backend = backend
+        self.connection = connection
+        self.pending_limit = pending_limit or conf.MAX_CACHED_RESULTS
+        self.pid = os.getpid()
+        self.queue = "celeryreply.%s" % (gen_unique_id().replace("-", ""), )
+        self.consumer = self.create_consumer()
+        self.reply_to = {"exchange": self.consumer.exchange,
+                         "routing_key": self.queue}
+        self.pending = OrderedDict()
+        self.mutex = threading.Condition(threading.Lock())
+        self._receiving = False
+        self._waiters = {}
+
+    def create_consumer(self):
+        """Declare the reply queue and start consuming from it."""
+        consumer = ReplyConsumer(self.connection, self.queue,
+                                 exchange=self.backend.exchange,
+                                 exchange_type=self.backend.exchange_type,
+                                 durable=self.backend.persistent)
+        consumer.register_callback(self._on_reply)
+        consumer.consume()
+        return consumer
+
+    def _on_reply(self, message_data, message):
+        self.mutex.acquire()
+        try:
+            task_id = message_data["task_id"]
+            # Move to the end, so the oldest replies are dropped first.
+            self.pending.pop(task_id, None)
+            self.pending[task_id] = message_data
+            if len(self.pending) > self.pending_limit:
+                self._drop_pending()
+        finally:
+            self.mutex.release()
+
+    def _drop_pending(self):
+        pending = self.pending
+        excess = len(pending) - self.pending_limit
+        unready = self.backend.UNREADY_STATES
+        for ready in (False, True):
+            for task_id, meta in pending.items():
+                if excess <= 0:
+                    return
+                if task_id not in self._waiters and \
+                        ready != (meta["status"] in unready):
+                    del pending[task_id]
+                    excess -= 1
+
+    def _receive(self, timeout):
+        """Receive results for up to ``timeout`` seconds, with
+        :attr:`mutex` held.  Returns :const:`False` if there were
+        none."""
+        if self._receiving:
+            self.mutex.wait(timeout)
+            return True
+        self._receiving = True
+        self.mutex.release()
+        try:
+            try:
+                self.connection.drain_events(timeout=timeout)
+            except socket.timeout:
+                return False
+            return True
+        finally:
+            self.mutex.acquire()
+            self._receiving = False
+            self.mutex.notifyAll()
+
+    def _ready(self, task_id):
+        meta = self._take(task_id)
+        if meta and meta["status"] in self.backend.READY_STATES:
+            return meta
+
+    def _take(self, task_id):
+        # Ready results are moved to the cache of the backend when
+        # taken, and unready states are left pending.
+        meta = self.pending.get(task_id)
+        if meta is None:
+            return self.backend._cache.get(task_id)
+        if meta["status"] in self.backend.READY_STATES:
+            self.backend._cache[task_id] = self.pending.pop(task_id)
+        return meta
+
+    def take(self, task_id):
+        """Get the latest state received for a task, or :const:`None`
+        if nothing has been received.
+
+        If the task is ready, the result is no longer pending.
+
+        """
+        self.mutex.acquire()
+        try:
+            return self._take(task_id)
+        finally:
+            self.mutex.release()
+
+    def wait(self, task_id, timeout=None):
+        """Wait for the result of a task.
+
+        :raises socket.timeout: if the result doesn't arrive within
+            ``timeout`` seconds.
+
+        """
+        time_start = time.time()
+        self.mutex.acquire()
+        self._add_waiters([task_id])
+        try:
+            while True:
+                meta = self._ready(task_id)
+                if meta is not None:
+                    return meta
+                remaining = None
+                if timeout is not None:
+                    remaining = time_start + timeout - time.time()
+                    if remaining <= 0:
+                        raise socket.timeout()
+                self._receive(remaining)
+        finally:
+            self._remove_waiters([task_id])
+            self.mutex.release()
+
+    def _add_waiters(self, task_ids):
+        waiters = self._waiters
+        for task_id in task_ids:
+            waiters[task_id] = waiters.get(task_id, 0) + 1
+
+    def _remove_waiters(self, task_ids):
+        waiters = self._waiters
+        for task_id in task_ids:
+            waiters[task_id] -= 1
+            if not waiters[task_id]:
+                del(waiters[task_id])
+
+    def wait_many(self, task_ids, timeout=None):
+        """Wait for the results of several tasks, yielding
+        ``(task_id, meta)`` tuples as they arrive."""
+        pending = set(task_ids)
+        time_start = time.time()
+        self.mutex.acquire()
+        self._add_waiters(pending)
+        self.mutex.release()
+        try:
+            while pending:
+                self.mutex.acquire()
+                try:
+                    ready = [(task_id, self._ready(task_id))
+                                for task_id in pending]
+                    ready = [(task_id, meta) for task_id, meta in ready
+                                                if meta is not None]
+                    if not ready:
+                        remaining = None
+                        if timeout is not None:
+                            remaining = time_start + timeout - time.time()
+                            if remaining <= 0:
+                                raise socket.timeout()
+                        self._receive(remaining)
+                finally:
+                    self.mutex.release()
+                for task_id, meta in ready:
+                    pending.discard(task_id)
+                    self.mutex.acquire()
+                    try:
+                        self._remove_waiters([task_id])
+                    finally:
+                        self.mutex.release()
+                    yield task_id, meta
+        finally:
+            self.mutex.acquire()
+            try:
+                self._remove_waiters(pending)
+            finally:
+                self.mutex.release()
+
+    def collect(self):
+        """Receive the results that have already arrived, without
+        waiting for more."""
+        self.mutex.acquire()
+        try:
+            while not self._receiving and self._has_input() and \
+                    self._receive(self.poll_timeout):
+                pass
+        finally:
+            self.mutex.release()
+
+    def _has_input(self):
+        """Returns :const:`False` if there is nothing to receive on
+        the connection, :const:`True` if there may be."""
+        conn = getattr(self.connection, "connection", None)
+        transport = getattr(conn, "transport", None)
+        sock = getattr(transport, "sock", None)
+        if sock is None:
+            # Don't know how to tell, wait for ``poll_timeout``.
+            return True
+        # Frames may have been read from the socket already.
+        if getattr(transport, "_read_buffer", None) or \
+                getattr(transport, "_wpos", 0) > getattr(transport, "_rpos", 0):
+            return True
+        reader = getattr(conn, "method_reader", None)
+        if reader is not None and reader.queue:
+            return True
+        for channel in conn.channels.values():
+            if len(channel.method_queue):
+                return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (select.error, socket.error, ValueError):
+            return True
+        return bool(readable)
+
+    def close(self):
+        self.consumer.close()
+
+
 class AMQPBackend(BaseDictBackend):
     """AMQP backend. Publish results by sending messages to the broker
     using the task id as routing key.
@@ -52,13 +331,24 @@ class AMQPBackend(BaseDictBackend):
     After the result has been read, the result is deleted. (however, it's
     still cached locally by the backend instance).
 
+    If ``reply_queue`` is set, or the ``CELERY_RESULT_REPLY_QUEUE``
+    setting is enabled, every process declares a single exclusive reply
+    queue, and asks for the results of the tasks it sends to be
+    published there, instead of in a queue for every task.  Results
+    are then only available to the process that sent the task.
+    ``celeryd`` and ``celerybeat`` (and the pool processes) disable the
+    setting, as they don't wait for the results of the tasks they send.
+
     """
+    accepts_reply_to = True
 
     _connection = None
+    _replies = None
+    _reply_publisher = None
 
     def __init__(self, connection=None, exchange=None, exchange_type=None,
             persistent=None, serializer=None, auto_delete=None,
-            expires=None, **kwargs):
+            expires=None, reply_queue=None, **kwargs):
         self._connection = connection
         self.exchange = exchange
         self.exchange_type = exchange_type
@@ -72,8 +362,55 @@ class AMQPBackend(BaseDictBackend):
             self.expires = timeutils.timedelta_seconds(self.expires)
         if self.expires is not None:
             self.expires = int(self.expires)
+        self._reply_queue = reply_queue
+        self._replies_mutex = threading.Lock()
         super(AMQPBackend, self).__init__(**kwargs)
 
+    @property
+    def reply_queue(self):
+        """Are results sent to a reply queue?  Defaults to the
+        ``CELERY_RESULT_REPLY_QUEUE`` setting, which is disabled by
+        celeryd and celerybeat as they don't wait for results."""
+        if self._reply_queue is None:
+            return conf.RESULT_REPLY_QUEUE
+        return self._reply_queue
+
+    @property
+    def replies(self):
+        """The :class:`ReplyDemultiplexer` of the current process."""
+        replies = self._replies
+        if replies is None or replies.pid != os.getpid():
+            self._replies_mutex.acquire()
+            try:
+                replies = self._replies
+                if replies is None or replies.pid != os.getpid():
+                    # Forked child processes need a queue (and
+                    # connection) of their own.
+                    replies = self._replies = ReplyDemultiplexer(self,
+                                                establish_connection())
+            finally:
+                self._replies_mutex.release()
+        return replies
+
+    @property
+    def reply_to(self):
+        if self.reply_queue:
+            return self.replies.reply_to
+
+    def _send_reply(self, meta, reply_to):
+        # The publisher is kept, so the exchange is only declared once.
+        publisher = self._reply_publisher
+        if publisher is None or publisher.exchange != reply_to["exchange"]:
+            publisher = self._reply_publisher = ReplyPublisher(
+                                    self.connection,
+                                    exchange=reply_to["exchange"],
+                                    exchange_type=self.exchange_type,
+                                    delivery_mode=self.persistent and 2 or 1,
+                                    serializer=self.serializer,
+                                    durable=self.persistent,
+                                    auto_delete=self.auto_delete)
+        publisher.send(meta, routing_key=reply_to["routing_key"])
+
     def _create_publisher(self, task_id, connection):
         delivery_mode = self.persistent and 2 or 1
 
@@ -87,16 +424,23 @@ class AMQPBackend(BaseDictBackend):
                                serializer=self.serializer,
                                auto_delete=self.auto_delete)
 
-    def _create_consumer(self, task_id, connection):
+    def _create_consumer(self, task_id, connection, **kwargs):
         return ResultConsumer(connection, task_id,
                               exchange=self.exchange,
                               exchange_type=self.exchange_type,
                               durable=self.persistent,
                               auto_delete=self.auto_delete,
-                              expires=self.expires)
+                              expires=self.expires,
+                              **kwargs)
+
+    def store_result(self, task_id, result, status, traceback=None,
+            reply_to=None):
+        """Send task return value and status.
+
+        If ``reply_to`` is set, the result is sent to the reply queue
+        of the client instead of to the queue of the task.
 
-    def store_result(self, task_id, result, status, traceback=None):
-        """Send task return value and status."""
+        """
         result = self.encode_result(result, status)
 
         meta = {"task_id": task_id,
@@ -104,6 +448,10 @@ class AMQPBackend(BaseDictBackend):
                 "status": status,
                 "traceback": traceback}
 
+        if reply_to:
+            self._send_reply(meta, reply_to)
+            return result
+
         publisher = self._create_publisher(task_id, self.connection)
         try:
             publisher.send(meta)
@@ -113,14 +461,29 @@ class AMQPBackend(BaseDictBackend):
         return result
 
     def get_task_meta(self, task_id, cache=True):
+        if self.reply_queue:
+            return self.get_task_meta_many([task_id])[task_id]
         return self.poll(task_id)
 
+    def get_task_meta_many(self, task_ids, cache=True):
+        if self.reply_queue:
+            replies = self.replies
+            replies.collect()
+            return dict((task_id, replies.take(task_id) or
+                                    {"status": states.PENDING,
+                                     "result": None})
+                            for task_id in task_ids)
+        return dict((task_id, self.poll(task_id)) for task_id in task_ids)
+
     def wait_for(self, task_id, timeout=None, cache=True):
         if task_id in self._cache:
             meta = self._cache[task_id]
         else:
             try:
-                meta = self.consume(task_id, timeout=timeout)
+                if self.reply_queue:
+                    meta = self.replies.wait(task_id, timeout=timeout)
+                else:
+                    meta = self.consume(task_id, timeout=timeout)
             except socket.timeout:
                 raise TimeoutError("The operation timed out.")
 
@@ -173,7 +536,75 @@ class AMQPBackend(BaseDictBackend):
         self._cache[task_id] = results[0]
         return results[0]
 
+    def get_many(self, task_ids, timeout=None, **kwargs):
+        """Wait for several tasks, yielding ``(task_id, meta)`` tuples
+        as the results arrive.
+
+        Instead of polling, this consumes from the result queues of
+        all the pending tasks at once, using a single channel.
+
+        """
+        pending = set()
+        for task_id in task_ids:
+            meta = self._cache.get(task_id)
+            if meta and meta["status"] in self.READY_STATES:
+                yield task_id, meta
+            else:
+                pending.add(task_id)
+        if not pending:
+            return
+
+        if self.reply_queue:
+            try:
+                for task_id, meta in self.replies.wait_many(pending,
+                                                            timeout):
+                    yield task_id, meta
+            except socket.timeout:
+                raise TimeoutError("The operation timed out.")
+            return
+
+        results = []
+
+        def callback(message_data, message):
+            results.append(message_data)
+
+        wait = self.connection.drain_events
+        consumers = ConsumerSet(self.connection)
+        for task_id in pending:
+            consumers.add_consumer(self._create_consumer(task_id,
+                                        self.connection,
+                                        backend=consumers.backend))
+        consumers.register_callback(callback)
+
+        consumers.consume()
+        try:
+            time_start = time.time()
+            while pending:
+                remaining = None
+                if timeout is not None:
+                    remaining = time_start + timeout - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError("The operation timed out.")
+                try:
+                    wait(timeout=remaining)
+                except socket.timeout:
+                    raise TimeoutError("The operation timed out.")
+                while results:
+                    meta = results.pop(0)
+                    task_id = meta["task_id"]
+                    self._cache[task_id] = meta
+                    if task_id in pending and \
+                            meta["status"] in self.READY_STATES:
+                        pending.discard(task_id)
+                        yield task_id, meta
+        finally:
+            consumers.close()
+
     def close(self):
+        if self._replies is not None:
+            self._replies.close()
+            self._replies.connection.close()
+            self._replies = None
         if self._connection is not None:
             self._connection.close()
 
@@ -18,6 +18,14 @@ class BaseBackend(object):
 
     TimeoutError = TimeoutError
 
+    #: Where task results should be sent to, as a dictionary with
+    #: ``exchange`` and ``routing_key`` keys, or :const:`None` if
+    #: the backend doesn't use a reply queue.
+    reply_to = None
+
+    #: Set if :meth:`store_result` accepts the ``reply_to`` argument.
+    accepts_reply_to = False
+
     def __init__(self, *args, **kwargs):
         pass
 
@@ -32,28 +40,32 @@ class BaseBackend(object):
         raise NotImplementedError(
                 "store_result is not supported by this backend.")
 
-    def mark_as_started(self, task_id):
+    def mark_as_started(self, task_id, **kwargs):
         """Mark a task as started"""
-        return self.store_result(task_id, None, status=states.STARTED)
+        return self.store_result(task_id, None, status=states.STARTED,
+                                 **kwargs)
 
-    def mark_as_done(self, task_id, result):
+    def mark_as_done(self, task_id, result, **kwargs):
         """Mark task as successfully executed."""
-        return self.store_result(task_id, result, status=states.SUCCESS)
+        return self.store_result(task_id, result, status=states.SUCCESS,
+                                 **kwargs)
 
-    def mark_as_failure(self, task_id, exc, traceback=None):
+    def mark_as_failure(self, task_id, exc, traceback=None, **kwargs):
         """Mark task as executed with failure. Stores the execption."""
         return self.store_result(task_id, exc, status=states.FAILURE,
-                                 traceback=traceback)
+                                 traceback=traceback, **kwargs)
 
-    def mark_as_retry(self, task_id, exc, traceback=None):
+    def mark_as_retry(self, task_id, exc, traceback=None, **kwargs):
         """Mark task as being retries. Stores the current
         exception (if any)."""
         return self.store_result(task_id, exc, status=states.RETRY,
-                                 traceback=traceback)
+                                 traceback=traceback, **kwargs)
 
-    def mark_as_revoked(self, task_id):
+    def mark_as_revoked(self, task_id, **kwargs):
+        """Mark task as revoked."""
         return self.store_result(task_id, TaskRevokedError(),
-                                 status=states.REVOKED, traceback=None)
+                                 status=states.REVOKED, traceback=None,
+                                 **kwargs)
 
     def prepare_exception(self, exc):
         """Prepare exception for serialization."""
@@ -67,7 +79,8 @@ class BaseBackend(object):
         """Prepare value for storage."""
         return result
 
-    def wait_for(self, task_id, timeout=None):
+    def wait_for(self, task_id, timeout=None, interval=0.1,
+            max_interval=1.0, backoff=2):
         """Wait for task and return its result.
 
         If the task raises an exception, this exception
@@ -77,10 +90,12 @@ class BaseBackend(object):
         :class:`celery.exceptions.TimeoutError` exception if the operation
         takes longer than ``timeout`` seconds.
 
-        """
+        The status is polled every ``interval`` seconds, multiplying
+        the interval by ``backoff`` after every try until it reaches
+        ``max_interval``.
 
-        sleep_inbetween = 0.5
-        time_elapsed = 0.0
+        """
+        time_start = time.time()
 
         while True:
             status = self.get_status(task_id)
@@ -88,11 +103,58 @@ class BaseBackend(object):
                 return self.get_result(task_id)
             elif status in states.PROPAGATE_STATES:
                 raise self.get_result(task_id)
+            if timeout:
+                remaining = time_start + timeout - time.time()
+                if remaining <= 0:
+                    raise TimeoutError("The operation timed out.")
+                interval = min(interval, remaining)
             # avoid hammering the CPU checking status.
-            time.sleep(sleep_inbetween)
-            time_elapsed += sleep_inbetween
-            if timeout and time_elapsed >= timeout:
-                raise TimeoutError("The operation timed out.")
+            time.sleep(interval)
+            interval = min(interval * backoff, max_interval)
+
+    def get_many(self, task_ids, timeout=None, interval=0.1,
+            max_interval=2.0, backoff=2):
+        """Wait for several tasks, yielding ``(task_id, meta)`` tuples
+        for the tasks as they become ready.
+
+        The state of all the pending tasks is fetched using a single
+        call to :meth:`get_task_meta_many` every round, sleeping
+        ``interval`` seconds between rounds.  The interval is multiplied
+        by ``backoff`` after every round until it reaches
+        ``max_interval``.
+
+        :raises celery.exceptions.TimeoutError: if ``timeout`` is not
+            ``None`` and the tasks are not ready within ``timeout``
+            seconds.
+
+        """
+        pending = set(task_ids)
+        time_start = time.time()
+
+        while pending:
+            metas = self.get_task_meta_many(pending)
+            for task_id, meta in metas.items():
+                if meta["status"] in self.READY_STATES:
+                    pending.discard(task_id)
+                    yield task_id, meta
+            if not pending:
+                break
+            if timeout is not None:
+                remaining = time_start + timeout - time.time()
+                if remaining <= 0:
+                    raise TimeoutError("The operation timed out.")
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(interval * backoff, max_interval)
+
+    def get_task_meta_many(self, task_ids):
+        """Get the metadata for several tasks at once.
+
+        :returns: dictionary mapping task ids to task metadata.
+
+        """
+        raise NotImplementedError(
+                "get_task_meta_many is not supported by this backend.")
 
     def cleanup(self):
         """Backend cleanup. Is run by
@@ -172,10 +234,42 @@ class BaseDictBackend(BaseBackend):
             return self._cache[task_id]
 
         meta = self._get_task_meta_for(task_id)
-        if cache and meta.get("status") == states.SUCCESS:
+        if cache and meta.get("status") in self.READY_STATES:
             self._cache[task_id] = meta
         return meta
 
+    def get_task_meta_many(self, task_ids, cache=True):
+        """Get the metadata for several tasks at once.
+
+        Tasks already known to be ready are served from the local cache,
+        the rest are fetched using :meth:`_get_task_meta_many`.
+
+        """
+        metas = {}
+        missing = []
+        for task_id in task_ids:
+            if cache and task_id in self._cache:
+                metas[task_id] = self._cache[task_id]
+            else:
+                missing.append(task_id)
+
+        if missing:
+            for task_id, meta in self._get_task_meta_many(missing).items():
+                if cache and meta.get("status") in self.READY_STATES:
+                    self._cache[task_id] = meta
+                metas[task_id] = meta
+        return metas
+
+    def _get_task_meta_many(self, task_ids):
+        """Get task metadata for several tasks by id.
+
+        Backends able to fetch several tasks in one round-trip
+        should override this.
+
+        """
+        return dict((task_id, self._get_task_meta_for(task_id))
+                        for task_id in task_ids)
+
     def reload_task_result(self, task_id):
         self._cache[task_id] = self.get_task_meta(task_id, cache=False)
 
@@ -229,13 +323,27 @@ class KeyValueStoreBackend(BaseDictBackend):
         self.set(self.get_key_for_taskset(taskset_id), pickle.dumps(meta))
         return result
 
-    def _get_task_meta_for(self, task_id):
-        """Get task metadata for a task by id."""
-        meta = self.get(self.get_key_for_task(task_id))
+    def mget(self, keys):
+        """Get the values for several keys at once, returns a list
+        of values in the same order as ``keys``."""
+        return [self.get(key) for key in keys]
+
+    def _decode_task_meta(self, meta):
         if not meta:
             return {"status": states.PENDING, "result": None}
         return pickle.loads(str(meta))
 
+    def _get_task_meta_for(self, task_id):
+        """Get task metadata for a task by id."""
+        return self._decode_task_meta(self.get(self.get_key_for_task(task_id)))
+
+    def _get_task_meta_many(self, task_ids):
+        """Get task metadata for several tasks by id, using a
+        single :meth:`mget`."""
+        values = self.mget(map(self.get_key_for_task, task_ids))
+        return dict((task_id, self._decode_task_meta(value))
+                        for task_id, value in zip(task_ids, values))
+
     def _restore_taskset(self, taskset_id):
         """Get task metadata for a task by id."""
         meta = self.get(self.get_key_for_taskset(taskset_id))
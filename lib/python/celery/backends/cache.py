@@ -38,6 +38,10 @@ class DummyClient(object):
     def set(self, key, value, *args, **kwargs):
         self.cache[key] = value
 
+    def get_multi(self, keys):
+        cache = self.cache
+        return dict((key, cache[key]) for key in keys if key in cache)
+
 
 backends = {"memcache": get_best_memcache,
             "memcached": get_best_memcache,
@@ -67,6 +71,10 @@ class CacheBackend(KeyValueStoreBackend):
     def get(self, key):
         return self.client.get(key)
 
+    def mget(self, keys):
+        values = self.client.get_multi(keys)
+        return [values.get(key) for key in keys]
+
     def set(self, key, value):
         return self.client.set(key, value, self.expires)
 
@@ -1,18 +1,92 @@
+import os
+import threading
+import traceback
+
 from datetime import datetime
 
+import sqlalchemy as sa
+
+from multiprocessing.util import Finalize
 
 from celery import conf
+from celery import log
+from celery import states
 from celery.backends.base import BaseDictBackend
 from celery.db.models import Task, TaskSet
 from celery.db.session import ResultSession
 from celery.exceptions import ImproperlyConfigured
 
 
+class ResultFlusher(threading.Thread):
+    """Thread flushing the results buffered by a write-behind
+    :class:`DatabaseBackend` at an interval, or when woken up by
+    :meth:`wakeup`.
+
+    :param backend: The backend to flush.
+    :keyword interval: Time in seconds between flushes.
+    :keyword logger: Logger used to report flush errors.
+
+    """
+
+    def __init__(self, backend, interval=1.0, logger=None):
+        super(ResultFlusher, self).__init__()
+        self.backend = backend
+        self.interval = interval
+        self.logger = logger or log.get_default_logger()
+        self._shutdown = threading.Event()
+        self._wakeup = threading.Event()
+        self.setDaemon(True)
+
+    def run(self):
+        while not self._shutdown.isSet():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def wakeup(self):
+        """Flush now, instead of at the end of the interval."""
+        self._wakeup.set()
+
+    def flush(self):
+        """Flush the backend, logging any error."""
+        try:
+            self.backend.flush()
+        except Exception, exc:
+            # The results are buffered again by flush(),
+            # so they will be retried on the next run.
+            self.logger.error("Could not flush results: %r\n%s" % (
+                                exc, traceback.format_exc()))
+
+    def stop(self):
+        """Gracefully shutdown the thread."""
+        self._shutdown.set()
+        self._wakeup.set()
+
+
 class DatabaseBackend(BaseDictBackend):
-    """The database result backend."""
+    """The database result backend.
+
+    :keyword write_behind: If enabled results are not written to the
+        database right away, but buffered and written in batches
+        by :meth:`flush`.  The buffer is flushed by a background thread
+        every ``flush_interval`` seconds, when it contains ``flush_size``
+        results, and at process exit.  If the buffer can't be flushed
+        (e.g. the database is down) and it holds ``buffer_limit``
+        results, new results are written to the database right away.
+        Default is the ``CELERY_RESULT_DB_WRITE_BEHIND`` setting.
+
+    """
+
+    # Maximum number of task ids to look up in a single query
+    # (SQLite does not allow more than 999 parameters).
+    max_query_ids = 500
+
+    _flusher = None
+    _flusher_pid = None
 
     def __init__(self, dburi=None, result_expires=None,
-            engine_options=None, **kwargs):
+            engine_options=None, write_behind=None, flush_interval=None,
+            flush_size=None, buffer_limit=None, **kwargs):
         self.result_expires = result_expires or conf.TASK_RESULT_EXPIRES
         self.dburi = dburi or conf.RESULT_DBURI
         self.engine_options = dict(engine_options or {},
@@ -21,6 +95,14 @@ class DatabaseBackend(BaseDictBackend):
             raise ImproperlyConfigured(
                     "Missing connection string! Do you have "
                     "CELERY_RESULT_DBURI set to a real value?")
+        self.write_behind = write_behind
+        if self.write_behind is None:
+            self.write_behind = conf.RESULT_DB_WRITE_BEHIND
+        self.flush_interval = flush_interval or conf.RESULT_DB_FLUSH_INTERVAL
+        self.flush_size = flush_size or conf.RESULT_DB_FLUSH_SIZE
+        self.buffer_limit = buffer_limit or conf.RESULT_DB_BUFFER_LIMIT
+        self._buffer = {}
+        self._buffer_mutex = threading.Lock()
 
         super(DatabaseBackend, self).__init__(**kwargs)
 
@@ -29,6 +111,11 @@ class DatabaseBackend(BaseDictBackend):
 
     def _store_result(self, task_id, result, status, traceback=None):
         """Store return value and status of an executed task."""
+        if self.write_behind:
+            return self._buffer_result(task_id, result, status, traceback)
+        return self._write_result(task_id, result, status, traceback)
+
+    def _write_result(self, task_id, result, status, traceback=None):
         session = self.ResultSession()
         try:
             task = session.query(Task).filter(Task.task_id == task_id).first()
@@ -44,20 +131,165 @@ class DatabaseBackend(BaseDictBackend):
             session.close()
         return result
 
+    def _buffer_result(self, task_id, result, status, traceback=None):
+        self._start_flusher()
+        self._buffer_mutex.acquire()
+        try:
+            buffer = self._buffer
+            overflow = task_id not in buffer and \
+                        len(buffer) >= self.buffer_limit
+            if not overflow:
+                buffer[task_id] = {"task_id": task_id,
+                                   "status": status,
+                                   "result": result,
+                                   "traceback": traceback}
+            full = len(buffer) >= self.flush_size
+        finally:
+            self._buffer_mutex.release()
+        if full:
+            # Flushed by the flusher thread, so errors are logged
+            # instead of raised in the task.
+            self._flusher.wakeup()
+        if overflow:
+            # The buffer can't be flushed, write it ourselves.
+            return self._write_result(task_id, result, status, traceback)
+        return result
+
+    def _start_flusher(self):
+        """Start the flusher thread, if it's not already running in
+        this process (threads does not survive a fork)."""
+        if self._flusher_pid == os.getpid():
+            return
+        if self._flusher_pid is not None:
+            # We have been forked, the buffered results belongs
+            # to the parent.
+            self._buffer = {}
+            self._buffer_mutex = threading.Lock()
+        self._flusher_pid = os.getpid()
+        self._flusher = ResultFlusher(self, interval=self.flush_interval)
+        self._flusher.start()
+        Finalize(self, self._stop_flusher, exitpriority=5)
+
+    def _stop_flusher(self):
+        """Stop the flusher thread and flush any remaining results."""
+        if self._flusher is not None:
+            self._flusher.stop()
+            self._flusher.join(self.flush_interval)
+            # Errors are logged by the flusher, raising them at
+            # exit would only print a bare traceback.
+            self._flusher.flush()
+
+    def flush(self):
+        """Write all buffered results to the database.
+
+        Existing tasks are updated and new tasks inserted using one
+        multi-row statement each, in a single transaction.
+
+        """
+        self._buffer_mutex.acquire()
+        try:
+            buffer, self._buffer = self._buffer, {}
+        finally:
+            self._buffer_mutex.release()
+        if not buffer:
+            return
+
+        try:
+            self._write_many(buffer)
+        except Exception:
+            # Keep the results for the next flush,
+            # unless they have been replaced by newer ones.
+            self._buffer_mutex.acquire()
+            try:
+                buffer.update(self._buffer)
+                self._buffer = buffer
+            finally:
+                self._buffer_mutex.release()
+            raise
+
+    def _write_many(self, metas):
+        table = Task.__table__
+        task_ids = metas.keys()
+        session = self.ResultSession()
+        try:
+            existing = set()
+            for i in xrange(0, len(task_ids), self.max_query_ids):
+                chunk = task_ids[i:i + self.max_query_ids]
+                existing.update(row[0] for row in session.execute(
+                        sa.select([table.c.task_id],
+                                  table.c.task_id.in_(chunk))))
+            updates = [dict(metas[task_id], b_task_id=task_id)
+                            for task_id in existing]
+            inserts = [meta for task_id, meta in metas.items()
+                            if task_id not in existing]
+            if updates:
+                session.execute(table.update().where(
+                            table.c.task_id == sa.bindparam("b_task_id")),
+                        updates)
+            if inserts:
+                session.execute(table.insert(), inserts)
+            session.commit()
+        finally:
+            session.close()
+
+    def _get_buffered(self, task_id):
+        if self._buffer:
+            self._buffer_mutex.acquire()
+            try:
+                meta = self._buffer.get(task_id)
+                if meta is not None:
+                    return dict(meta)
+            finally:
+                self._buffer_mutex.release()
+
     def _get_task_meta_for(self, task_id):
-        """Get task metadata for a task by id."""
+        """Get task metadata for a task by id.
+
+        Unknown tasks are reported as pending, without creating
+        a row for them.
+
+        """
+        meta = self._get_buffered(task_id)
+        if meta is not None:
+            return meta
+
         session = self.ResultSession()
         try:
             task = session.query(Task).filter(Task.task_id == task_id).first()
-            if not task:
-                task = Task(task_id)
-                session.add(task)
-                session.flush()
-                session.commit()
-            return task.to_dict()
+            if task:
+                return task.to_dict()
+            return {"task_id": task_id,
+                    "status": states.PENDING,
+                    "result": None,
+                    "traceback": None}
         finally:
             session.close()
 
+    def _get_task_meta_many(self, task_ids):
+        """Get task metadata for several tasks by id, using a single
+        ``IN`` query for every :attr:`max_query_ids` ids."""
+        metas = dict((task_id, {"task_id": task_id,
+                                "status": states.PENDING,
+                                "result": None,
+                                "traceback": None})
+                        for task_id in task_ids)
+        task_ids = list(task_ids)
+        session = self.ResultSession()
+        try:
+            for i in xrange(0, len(task_ids), self.max_query_ids):
+                chunk = task_ids[i:i + self.max_query_ids]
+                for task in session.query(Task).filter(
+                        Task.task_id.in_(chunk)):
+                    metas[task.task_id] = task.to_dict()
+        finally:
+            session.close()
+
+        for task_id in task_ids:
+            meta = self._get_buffered(task_id)
+            if meta is not None:
+                metas[task_id] = meta
+        return metas
+
     def _save_taskset(self, taskset_id, result):
         """Store the result of an executed taskset."""
         session = self.ResultSession()
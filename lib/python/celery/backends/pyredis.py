@@ -105,3 +105,6 @@ class RedisBackend(KeyValueStoreBackend):
 
     def set(self, key, value):
         self.open().set(key, value)
+
+    def mget(self, keys):
+        return self.open().mget(keys)
@@ -3,20 +3,35 @@
 Periodic Task Scheduler
 
 """
+import os
+import mmap
 import time
+import errno
+import heapq
 import shelve
+import whichdb
 import threading
 import multiprocessing
-from datetime import datetime
-from UserDict import UserDict
+from datetime import datetime, timedelta
+from UserDict import UserDict, DictMixin
 
 from celery import log
 from celery import conf
 from celery import registry as _registry
 from celery import platform
-from celery.messaging import establish_connection
+from celery.messaging import broker_pool
+from celery.task.base import PeriodicTask
+from celery.task.schedules import schedule, crontab
 from celery.utils.info import humanize_seconds
 
+# is_due implementations that report the exact time until the next run.
+EXACT_IS_DUE = (schedule.is_due.im_func, crontab.is_due.im_func)
+
+# First line of a schedule file written by PersistentSchedule.
+SCHEDULE_MAGIC = "celerybeat-schedule 1\n"
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
 
 class SchedulingError(Exception):
     """An error occured while scheduling a task."""
@@ -60,6 +75,193 @@ class ScheduleEntry(object):
         return task.is_due(self.last_run_at)
 
 
+def _write(fd, data):
+    written = 0
+    while written < len(data):
+        written += os.write(fd, buffer(data, written))
+
+
+class PersistentSchedule(DictMixin):
+    """Schedule stored in an append-only log file.
+
+    :param filename: Path of the schedule file.
+    :keyword entry_cls: The :class:`ScheduleEntry` class to create
+        entries with.
+    :keyword logger: The logger to use.
+
+    Storing an entry appends a small ``(total_run_count, last_run_at,
+    name)`` record to the log, instead of rewriting the schedule.
+    When the log has grown to :attr:`compact_factor` times the number
+    of entries, it's compacted by writing a new log with one record per
+    entry.  :meth:`sync` flushes the log to disk.
+
+    The log is memory-mapped when the schedule is opened, and records
+    are only turned into entries when they are accessed.  A record
+    left incomplete by a crash is discarded.
+
+    A schedule file written by :mod:`shelve` is converted the first
+    time it is opened.
+
+    .. attribute:: version
+
+        Incremented every time an entry is added or removed, so the
+        scheduler can tell when the set of entries has changed without
+        comparing the keys.
+
+    """
+    compact_factor = 4
+    compact_min = 1000
+
+    def __init__(self, filename, entry_cls=ScheduleEntry, logger=None):
+        self.filename = filename
+        self.entry_cls = entry_cls
+        self.logger = logger or log.get_default_logger()
+        self._records = {}
+        self._log_size = 0
+        self.version = 0
+        self._fd = None
+        self._open()
+
+    def _open(self):
+        try:
+            fh = open(self.filename, "rb")
+        except IOError, exc:
+            if exc.errno != errno.ENOENT:
+                raise
+            return self._convert()
+        try:
+            valid = self._load(fh)
+        finally:
+            fh.close()
+        if valid is None:
+            return self._convert()
+        self._fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND)
+        if valid < os.fstat(self._fd).st_size:
+            os.ftruncate(self._fd, valid)
+
+    def _load(self, fh):
+        """Read the records of the log.  Returns the size of the valid
+        part of the log, or :const:`None` if the file isn't a log."""
+        size = os.fstat(fh.fileno()).st_size
+        if size < len(SCHEDULE_MAGIC):
+            return None
+        data = mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            if data.read(len(SCHEDULE_MAGIC)) != SCHEDULE_MAGIC:
+                return None
+            records = self._records
+            readline = data.readline
+            valid = data.tell()
+            while 1:
+                line = readline()
+                if not line.endswith("\n"):
+                    break   # end of file, or torn by a crash.
+                fields = line[:-1].split(" ", 3)
+                if len(fields) != 4:
+                    break
+                if fields[0] == "-1":
+                    records.pop(fields[3], None)
+                else:
+                    records[fields[3]] = line
+                self._log_size += 1
+                valid = data.tell()
+            return valid
+        finally:
+            data.close()
+
+    def _convert(self):
+        if whichdb.whichdb(self.filename):
+            try:
+                old = shelve.open(self.filename, flag="r")
+                try:
+                    for name, entry in old.items():
+                        self._records[name] = self._format(name, entry)
+                finally:
+                    old.close()
+            except Exception, exc:
+                self.logger.warning(
+                    "Schedule: Cannot convert %s: %s" % (self.filename, exc))
+                self._records.clear()
+        self._compact()
+
+    def _format(self, name, entry=None):
+        if isinstance(name, unicode):
+            name = name.encode("utf-8")
+        if entry is None:
+            return "-1 0 0 %s\n" % (name, )
+        last = entry.last_run_at
+        usecs = (((last.hour * 60 + last.minute) * 60 + last.second)
+                    * 1000000 + last.microsecond)
+        return "%d %d %d %s\n" % (entry.total_run_count, last.toordinal(),
+                                   usecs, name)
+
+    def _parse(self, name, line):
+        count, ordinal, usecs, _ = line.split(" ", 3)
+        last_run_at = datetime.fromordinal(int(ordinal)) + \
+                        timedelta(microseconds=int(usecs))
+        return self.entry_cls(name, last_run_at, int(count))
+
+    def _append(self, line):
+        _write(self._fd, line)
+        self._log_size += 1
+        if self._log_size > max(self.compact_min,
+                                len(self._records) * self.compact_factor):
+            self._compact()
+
+    def _compact(self):
+        """Replace the log with one that has a single record
+        per entry."""
+        tmpname = "%s.%d.tmp" % (self.filename, os.getpid())
+        fd = os.open(tmpname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0666)
+        try:
+            _write(fd, SCHEDULE_MAGIC + "".join(self._records.values()))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.rename(tmpname, self.filename)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND)
+        self._log_size = len(self._records)
+
+    def __getitem__(self, name):
+        return self._parse(name, self._records[name])
+
+    def __setitem__(self, name, entry):
+        if name not in self._records:
+            self.version += 1
+        line = self._records[name] = self._format(name, entry)
+        self._append(line)
+
+    def __delitem__(self, name):
+        del(self._records[name])
+        self.version += 1
+        self._append(self._format(name))
+
+    def __contains__(self, name):
+        return name in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def keys(self):
+        return self._records.keys()
+
+    def sync(self):
+        """Flush the log to disk."""
+        if self._fd is not None:
+            _fdatasync(self._fd)
+
+    def close(self):
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+
 class Scheduler(UserDict):
     """Scheduler for periodic tasks.
 
@@ -84,6 +286,23 @@ class Scheduler(UserDict):
 
         Maximum time to sleep between re-checking the schedule.
 
+    Entries are kept in a heap ordered by the time they should be
+    checked next, and a tick only looks at the entries that are due.
+    Entries using a :class:`~celery.task.schedules.schedule` or
+    :class:`~celery.task.schedules.crontab` are not checked again until
+    their next run, while tasks overriding ``is_due`` are checked at
+    least every :attr:`max_interval` seconds.
+
+    The broker connection used to send tasks is kept open between
+    ticks, see :meth:`close`.  The schedule is synced after every tick
+    that sent tasks, see :meth:`sync`.
+
+    Entries added through the scheduler are put on the heap right away.
+    Entries added to the schedule directly are found by comparing the
+    names in the schedule with the names on the heap, but only when the
+    schedule's ``version`` attribute has changed, or for schedules
+    without one, when its size has changed.
+
     """
 
     def __init__(self, registry=None, schedule=None, logger=None,
@@ -94,35 +313,114 @@ class Scheduler(UserDict):
             self.data = {}
         self.logger = logger or log.get_default_logger()
         self.max_interval = max_interval or conf.CELERYBEAT_MAX_LOOP_INTERVAL
+        self._heap = []         # (time to check next, name)
+        self._scheduled = set()
+        self._schedule_version = None
+        self._connection = None
 
         self.cleanup()
         self.schedule_registry()
 
     def tick(self):
         """Run a tick, that is one iteration of the scheduler.
-        Executes all due tasks."""
+        Executes all due tasks, and returns the number of seconds
+        until the next entry is due."""
         debug = self.logger.debug
         error = self.logger.error
+        heap = self._heap
+        self._populate()
+
+        now = time.time()
+        names = []
+        while heap and heap[0][0] <= now:
+            names.append(heapq.heappop(heap)[1])
+
+        remaining_times = [self.max_interval]
+        updated = False
+        for name in names:
+            try:
+                entry = self.schedule[name]
+            except KeyError:
+                self._scheduled.discard(name)
+                continue
+            is_due, next_time_to_run = self.is_due(entry)
+            if is_due:
+                debug("Scheduler: Sending due task %s" % entry.name)
+                try:
+                    result = self.apply_async(entry,
+                                        connection=self._get_connection())
+                except SchedulingError, exc:
+                    error("Scheduler: %s" % exc)
+                    self.close()
+                else:
+                    debug("%s sent. id->%s" % (entry.name, result.task_id))
+                updated = True
+            interval = next_time_to_run or self.max_interval
+            if not self._is_exact(entry):
+                interval = min(interval, self.max_interval)
+            heapq.heappush(heap, (now + interval, name))
+            remaining_times.append(interval)
+
+        if updated:
+            self.sync()
 
-        remaining_times = []
-        connection = establish_connection()
+        if heap and heap[0][1] not in names:
+            remaining_times.append(max(heap[0][0] - now, 0))
+        return min(remaining_times)
+
+    def _populate(self):
+        """Add entries added to the schedule directly to the heap.
+
+        Entries removed from the schedule are dropped when their
+        slot in the heap comes up, so compare names, not counts.
+
+        """
+        version = getattr(self.schedule, "version", None)
+        if version is None:
+            version = len(self.schedule)
+        if version == self._schedule_version:
+            return
+        self._schedule_version = version
+        for name in set(self.schedule.keys()) - self._scheduled:
+            self._add_to_heap(name)
+
+    def _add_to_heap(self, name):
+        if name not in self._scheduled:
+            self._scheduled.add(name)
+            heapq.heappush(self._heap, (0, name))
+
+    def _is_exact(self, entry):
+        """Does the task of ``entry`` report the exact time until its
+        next run?"""
+        task = self.get_task(entry.name)
         try:
-            for entry in self.schedule.values():
-                is_due, next_time_to_run = self.is_due(entry)
-                if is_due:
-                    debug("Scheduler: Sending due task %s" % entry.name)
-                    try:
-                        result = self.apply_async(entry, connection=connection)
-                    except SchedulingError, exc:
-                        error("Scheduler: %s" % exc)
-                    else:
-                        debug("%s sent. id->%s" % (entry.name, result.task_id))
-                if next_time_to_run:
-                    remaining_times.append(next_time_to_run)
-        finally:
-            connection.close()
+            return (task.__class__.is_due.im_func is \
+                        PeriodicTask.is_due.im_func and
+                    task.run_every.__class__.is_due.im_func in EXACT_IS_DUE)
+        except AttributeError:
+            return False
+
+    def _get_connection(self):
+        connection = self._connection
+        if connection is not None and \
+                not broker_pool.health_check(connection):
+            self.close()
+            connection = None
+        if connection is None:
+            connection = self._connection = broker_pool.acquire()
+        return connection
 
-        return min(remaining_times + [self.max_interval])
+    def sync(self):
+        """Flush the schedule to disk, if it supports that."""
+        sync = getattr(self.schedule, "sync", None)
+        if sync is not None:
+            sync()
+
+    def close(self):
+        """Close the broker connection kept open between ticks."""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            broker_pool.discard(connection)
 
     def get_task(self, name):
         return self.registry[name]
@@ -152,6 +450,11 @@ class Scheduler(UserDict):
                 self.logger.debug("Scheduler: "
                     "Added periodic task %s to schedule" % name)
             self.schedule.setdefault(name, ScheduleEntry(task.name))
+            self._add_to_heap(name)
+
+    def __setitem__(self, name, entry):
+        self.schedule[name] = entry
+        self._add_to_heap(name)
 
     def cleanup(self):
         for task_name, entry in self.schedule.items():
@@ -166,7 +469,8 @@ class Scheduler(UserDict):
 class ClockService(object):
     scheduler_cls = Scheduler
     registry = _registry.tasks
-    open_schedule = lambda self, filename: shelve.open(filename)
+    open_schedule = lambda self, filename: PersistentSchedule(filename,
+                                                    logger=self.logger)
 
     def __init__(self, logger=None,
             max_interval=conf.CELERYBEAT_MAX_LOOP_INTERVAL,
@@ -208,6 +512,8 @@ class ClockService(object):
             self.sync()
 
     def sync(self):
+        if self._scheduler is not None:
+            self._scheduler.close()
         if self._schedule is not None and not self._in_sync:
             self.logger.debug("ClockService: Syncing schedule to disk...")
             self._schedule.sync()
@@ -72,6 +72,9 @@ class Beat(object):
         print("celerybeat %s is starting." % celery.__version__)
         self.init_loader()
         print(self.startup_info())
+        # Tasks sent from here are not waited for, so don't declare
+        # a reply queue that is never read.
+        conf.RESULT_REPLY_QUEUE = False
         self.set_process_title()
         print("celerybeat has started.")
         self.start_scheduler()
@@ -203,6 +203,9 @@ class Worker(object):
     def run(self):
         self.init_loader()
         self.init_queues()
+        # Tasks sent from here are not waited for, so don't declare
+        # a reply queue that is never read.
+        conf.RESULT_REPLY_QUEUE = False
         self.redirect_stdouts_to_logger()
         print("celery@%s v%s is starting." % (self.hostname,
                                               celery.__version__))
@@ -434,7 +434,7 @@ class CursesMonitor(object):
 
     @property
     def tasks(self):
-        return self.state.tasks_by_timestamp()[:self.limit]
+        return self.state.tasks_by_timestamp(limit=self.limit)
 
     @property
     def workers(self):
@@ -26,12 +26,29 @@ class TaskPool(object):
 
         The logger used for debugging.
 
+    .. attribute:: batch_size
+
+        If set, tasks are sent to the pool processes, and acknowledgements
+        and results returned, in batches of up to this many tasks.
+
+    .. attribute:: max_latency
+
+        Maximum number of seconds a pool process holds back an
+        acknowledgement or result in batch mode.
+
+    .. attribute:: shared_threshold
+
+        If set, task and result messages that are at least this many
+        bytes when pickled are passed through shared memory instead of
+        the pipes to the pool processes.
+
     """
     Pool = Pool
 
     def __init__(self, limit, logger=None, initializer=None,
             maxtasksperchild=None, timeout=None, soft_timeout=None,
-            putlocks=True):
+            putlocks=True, batch_size=None, max_latency=None,
+            shared_threshold=None):
         self.limit = limit
         self.logger = logger or log.get_default_logger()
         self.initializer = initializer
@@ -39,6 +56,9 @@ class TaskPool(object):
         self.timeout = timeout
         self.soft_timeout = soft_timeout
         self.putlocks = putlocks
+        self.batch_size = batch_size
+        self.max_latency = max_latency or 0.01
+        self.shared_threshold = shared_threshold
         self._pool = None
 
     def start(self):
@@ -51,7 +71,10 @@ class TaskPool(object):
                                initializer=self.initializer,
                                timeout=self.timeout,
                                soft_timeout=self.soft_timeout,
-                               maxtasksperchild=self.maxtasksperchild)
+                               maxtasksperchild=self.maxtasksperchild,
+                               batch_size=self.batch_size,
+                               max_latency=self.max_latency,
+                               shared_threshold=self.shared_threshold)
 
     def stop(self):
         """Gracefully stop the pool."""
@@ -115,4 +138,5 @@ class TaskPool(object):
                 "processes": [p.pid for p in self._pool._pool],
                 "max-tasks-per-child": self.maxtasksperchild,
                 "put-guarded-by-semaphore": self.putlocks,
+                "batch-size": self.batch_size,
                 "timeouts": (self.soft_timeout, self.timeout)}
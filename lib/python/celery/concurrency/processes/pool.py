@@ -13,7 +13,11 @@ __all__ = ['Pool']
 #
 
 import os
+import mmap
+import heapq
 import errno
+import shutil
+import tempfile
 import threading
 import Queue
 import itertools
@@ -25,6 +29,8 @@ from multiprocessing import Process, cpu_count, TimeoutError
 from multiprocessing.util import Finalize, debug
 
 from celery.exceptions import SoftTimeLimitExceeded, TimeLimitExceeded
+from celery.exceptions import WorkerLostError
+from celery.serialization import pickle
 
 #
 # Constants representing the state of a pool
@@ -46,11 +52,149 @@ job_counter = itertools.count()
 def mapstar(args):
     return map(*args)
 
+
+# Starts messages referring to a shared memory segment,
+# 0xff is not a pickle opcode.
+SHARED_MARKER = "\xffshared\n"
+
+
+def load_shared(path):
+    """Load an object stored in a shared memory segment by
+    :func:`dumps_message`, and remove the segment."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.unlink(path)
+        segment = mmap.mmap(fd, os.fstat(fd).st_size,
+                            access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+    try:
+        return pickle.load(segment)
+    finally:
+        segment.close()
+
+
+def dumps_message(obj, threshold, directory):
+    """Pickle a message sent between the pool and its worker processes.
+
+    If the pickled message is at least ``threshold`` bytes it is
+    written to a new file in ``directory``, and the message returned
+    only holds the path of the file and the ids of the tasks in the
+    message.  The message is pickled only once either way.
+
+    """
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    if len(data) < threshold:
+        return data
+    fd, path = tempfile.mkstemp(dir=directory)
+    try:
+        written = 0
+        while written < len(data):
+            written += os.write(fd, buffer(data, written))
+    finally:
+        os.close(fd)
+    is_list = obj.__class__ is list
+    keys = [(item[0], item[1]) for item in is_list and obj or [obj]]
+    return SHARED_MARKER + pickle.dumps((path, keys, is_list),
+                                        pickle.HIGHEST_PROTOCOL)
+
+
+def loads_message(data, on_lost):
+    """Unpickle a message pickled by :func:`dumps_message`.
+
+    If the shared memory segment of the message can't be read,
+    ``on_lost`` is called with the ids of the tasks in the message and
+    the exception, and returns the items to use instead.
+
+    """
+    if not data.startswith(SHARED_MARKER):
+        return pickle.loads(data)
+    path, keys, is_list = pickle.loads(data[len(SHARED_MARKER):])
+    try:
+        return load_shared(path)
+    except (OSError, IOError), exc:
+        lost = on_lost(keys, exc)
+        if is_list:
+            return lost
+        return lost[0]
+
+
+def raise_lost(exc):
+    raise exc
+
+
+def lost_tasks(keys, exc):
+    """Tasks failing with ``exc`` in place of tasks that were lost."""
+    return [(job, i, raise_lost, (exc, ), {}) for job, i in keys]
+
+
+def lost_results(keys, exc):
+    """Failed results in place of results that were lost."""
+    return [(job, i, (False, exc)) for job, i in keys]
+
+
+def shared_put(send_bytes, threshold, directory, lock=None):
+    """Make a function sending messages with :func:`dumps_message`."""
+
+    def put(obj):
+        data = dumps_message(obj, threshold, directory)
+        if lock is not None:
+            lock.acquire()
+        try:
+            send_bytes(data)
+        finally:
+            if lock is not None:
+                lock.release()
+    return put
+
+
+def shared_get(recv_bytes, on_lost, lock=None):
+    """Make a function receiving messages with :func:`loads_message`."""
+
+    def get():
+        if lock is not None:
+            lock.acquire()
+        try:
+            data = recv_bytes()
+        finally:
+            if lock is not None:
+                lock.release()
+        return loads_message(data, on_lost)
+    return get
+
+
+def shared_payload_dir():
+    """Create the directory used to store the shared memory segments
+    of a pool.  A memory backed file system is used if available."""
+    parent = None
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        parent = "/dev/shm"
+    return tempfile.mkdtemp(prefix="celery-pool-", dir=parent)
+
 #
 # Code run by worker processes
 #
 
 
+def set_worker_lost(cache, job, i):
+    """Fail task ``i`` of ``job`` with
+    :exc:`~celery.exceptions.WorkerLostError`.
+
+    The result may have been received just before the process was lost,
+    and be set by the result handler at the same time, so jobs that are
+    ready, or no longer in the cache, are left alone.
+
+    """
+    result = cache.get(job)
+    if result is None or result._ready:
+        return
+    try:
+        result._set(i, (False, WorkerLostError(
+            "Worker exited prematurely.")))
+    except KeyError:
+        pass
+
+
 class MaybeEncodingError(Exception):
     """Wraps unpickleable object."""
 
@@ -72,7 +216,7 @@ def soft_timeout_sighandler(signum, frame):
 
 
 def worker(inqueue, outqueue, ackqueue, initializer=None, initargs=(),
-        maxtasks=None):
+        maxtasks=None, shared_threshold=None, shared_dir=None):
     assert maxtasks is None or (type(maxtasks) == int and maxtasks > 0)
     pid = os.getpid()
     put = outqueue.put
@@ -81,6 +225,11 @@ def worker(inqueue, outqueue, ackqueue, initializer=None, initargs=(),
     if hasattr(inqueue, '_writer'):
         inqueue._writer.close()
         outqueue._reader.close()
+    if shared_threshold:
+        get = shared_get(inqueue._reader.recv_bytes, lost_tasks,
+                         inqueue._rlock)
+        put = shared_put(outqueue._writer.send_bytes, shared_threshold,
+                         shared_dir, outqueue._wlock)
 
     if initializer is not None:
         initializer(*initargs)
@@ -116,6 +265,182 @@ def worker(inqueue, outqueue, ackqueue, initializer=None, initargs=(),
     debug('worker exiting after %d tasks' % completed)
 
 
+class BatchBuffer(object):
+    """Messages sent by a worker process in batch mode, buffered
+    to be sent as a single list.
+
+    :param put: Function used to send a list of messages.
+    :keyword wakeup: :class:`threading.Condition` notified when a
+        message is added to the empty buffer.
+
+    """
+
+    def __init__(self, put, wakeup=None):
+        self.put = put
+        self.wakeup = wakeup
+        self.items = []
+        self.first_added = None
+        self.mutex = threading.Lock()
+
+    def append(self, item):
+        self.mutex.acquire()
+        try:
+            was_empty = not self.items
+            if was_empty:
+                self.first_added = time.time()
+            self.items.append(item)
+        finally:
+            self.mutex.release()
+        if was_empty and self.wakeup is not None:
+            self.wakeup.acquire()
+            try:
+                self.wakeup.notify()
+            finally:
+                self.wakeup.release()
+
+    def flush(self, added_before=None):
+        """Send the buffered messages.
+
+        :keyword added_before: Only send if the oldest message was
+            added before this time.
+
+        """
+        self.mutex.acquire()
+        try:
+            # Sent while holding the lock, so the worker loop and the
+            # flusher thread don't interleave writes to the pipe.
+            if self.items and (added_before is None or
+                               self.first_added <= added_before):
+                items, self.items = self.items, []
+                self.put(items)
+        finally:
+            self.mutex.release()
+
+
+class BatchFlusher(threading.Thread):
+    """Thread in a worker process in batch mode, flushing the buffers
+    when their oldest message has been waiting for ``max_latency``
+    seconds, so acknowledgements and results are not held back while
+    the worker is busy running a long task.
+
+    The thread sleeps on ``wakeup`` while the buffers are empty, and is
+    woken up by the buffers when a message is added.
+
+    """
+
+    def __init__(self, buffers, max_latency, wakeup):
+        threading.Thread.__init__(self)
+        self.buffers = buffers
+        self.max_latency = max_latency
+        self.wakeup = wakeup
+        self.daemon = True
+
+    def _wait(self):
+        """Wait until the oldest buffered message is due, and return
+        the time it must have been added before to be flushed."""
+        max_latency = self.max_latency
+        wakeup = self.wakeup
+        wakeup.acquire()
+        try:
+            while 1:
+                pending = [buffer.first_added for buffer in self.buffers
+                                if buffer.items]
+                if not pending:
+                    wakeup.wait()
+                    continue
+                now = time.time()
+                remaining = min(pending) + max_latency - now
+                if remaining > 0:
+                    wakeup.wait(remaining)
+                    continue
+                return now - max_latency
+        finally:
+            wakeup.release()
+
+    def run(self):
+        while 1:
+            added_before = self._wait()
+            for buffer in self.buffers:
+                buffer.flush(added_before)
+
+
+def batch_worker(inqueue, outqueue, ackqueue, initializer=None, initargs=(),
+        maxtasks=None, max_latency=0.01, shared_threshold=None,
+        shared_dir=None):
+    """Worker process main loop used by a pool in batch mode.
+
+    Tasks are received in batches, as lists of tasks.  Acknowledgements
+    and results are buffered and sent as lists when the batch has been
+    processed, and at the latest ``max_latency`` seconds after they were
+    buffered.  Each task is still acknowledged with the time it actually
+    started.
+
+    The worker process exits after the first batch that makes it reach
+    ``maxtasks``.
+
+    """
+    assert maxtasks is None or (type(maxtasks) == int and maxtasks > 0)
+    pid = os.getpid()
+    get = inqueue.get
+    put = outqueue.put
+    if hasattr(inqueue, '_writer'):
+        inqueue._writer.close()
+        outqueue._reader.close()
+    if shared_threshold:
+        get = shared_get(inqueue._reader.recv_bytes, lost_tasks,
+                         inqueue._rlock)
+        put = shared_put(outqueue._writer.send_bytes, shared_threshold,
+                         shared_dir, outqueue._wlock)
+
+    if initializer is not None:
+        initializer(*initargs)
+
+    if SIG_SOFT_TIMEOUT is not None:
+        signal.signal(SIG_SOFT_TIMEOUT, soft_timeout_sighandler)
+
+    def put_results(results):
+        try:
+            put(results)
+        except Exception:
+            # Find the result(s) that couldn't be sent.
+            for job, i, result in results:
+                try:
+                    put([(job, i, result)])
+                except Exception, exc:
+                    wrapped = MaybeEncodingError(exc, result[1])
+                    put([(job, i, (False, wrapped))])
+
+    wakeup = threading.Condition(threading.Lock())
+    acks = BatchBuffer(ackqueue.put, wakeup)
+    results = BatchBuffer(put_results, wakeup)
+    BatchFlusher((acks, results), max_latency, wakeup).start()
+
+    completed = 0
+    while maxtasks is None or (maxtasks and completed < maxtasks):
+        try:
+            batch = get()
+        except (EOFError, IOError):
+            debug('worker got EOFError or IOError -- exiting')
+            break
+
+        if batch is None:
+            debug('worker got sentinel -- exiting')
+            break
+
+        for job, i, func, args, kwds in batch:
+            acks.append((job, i, time.time(), pid))
+            try:
+                result = (True, func(*args, **kwds))
+            except Exception, e:
+                result = (False, e)
+            results.append((job, i, result))
+            completed += 1
+
+        acks.flush()
+        results.flush()
+    debug('worker exiting after %d tasks' % completed)
+
+
 #
 # Class representing a process pool
 #
@@ -199,19 +524,218 @@ class TaskHandler(PoolThread):
         debug('task handler exiting')
 
 
+class BatchTaskHandler(TaskHandler):
+    """Sends the tasks to the worker processes in batches.
+
+    All tasks waiting in the task queue are sent at once, divided into
+    batches of at most ``batch_size`` tasks, but also spread evenly over
+    the worker processes, so tasks are never put in the same batch while
+    there are processes left to run them.
+
+    If ``batches`` is set, the tasks in each batch are registered with
+    this :class:`BatchRecord`.
+
+    """
+
+    def __init__(self, taskqueue, put, outqueue, pool, batch_size,
+            batches=None):
+        self.batch_size = batch_size
+        self.batches = batches
+        super(BatchTaskHandler, self).__init__(taskqueue, put,
+                                               outqueue, pool)
+
+    def run(self):
+        get = self.taskqueue.get
+        get_nowait = self.taskqueue.get_nowait
+        outqueue = self.outqueue
+        put = self.put
+        pool = self.pool
+        batch_size = self.batch_size
+        batches = self.batches
+        finished = False
+
+        while not finished:
+            tasks = []
+            set_lengths = []
+            limit = batch_size * max(len(pool), 1)
+            item = get()
+            while 1:
+                if item is None:
+                    debug('task handler got sentinel')
+                    finished = True
+                    break
+                taskseq, set_length = item
+                start = len(tasks)
+                tasks.extend(taskseq)
+                if set_length:
+                    set_lengths.append((set_length, len(tasks) - start))
+                if len(tasks) >= limit:
+                    break
+                try:
+                    item = get_nowait()
+                except Queue.Empty:
+                    break
+
+            if self._state:
+                debug('task handler found thread._state != RUN')
+                break
+
+            size = min(batch_size,
+                       -(-len(tasks) // max(len(pool), 1))) or 1
+            try:
+                for offset in xrange(0, len(tasks), size):
+                    batch = tasks[offset:offset + size]
+                    if batches is not None:
+                        batches.add(batch)
+                    put(batch)
+            except IOError:
+                debug('could not put task on queue')
+                break
+
+            for set_length, length in set_lengths:
+                debug('doing set_length()')
+                set_length(length)
+
+        try:
+            # tell result handler to finish when cache is empty
+            debug('task handler sending sentinel to result handler')
+            outqueue.put(None)
+
+            # tell workers there is no more work
+            debug('task handler sending sentinel to workers')
+            for p in pool:
+                put(None)
+        except IOError:
+            debug('task handler got IOError when sending sentinels')
+
+        debug('task handler exiting')
+
+
+class BatchRecord(object):
+    """Records the batch each task was sent in, until the task
+    has completed.
+
+    Used to find the tasks lost when a worker process exits or is
+    terminated: the tasks in the same batch as the task that exceeded
+    the hard time limit, or the tasks in the batches started by the
+    process.
+
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self._tasks = {}    # (job, i) -> (batch, task)
+        self._started = {}  # (job, i) -> pid
+
+    def add(self, batch):
+        record = {}
+        self.mutex.acquire()
+        try:
+            for task in batch:
+                key = task[0], task[1]
+                record[key] = task
+                self._tasks[key] = (record, task)
+        finally:
+            self.mutex.release()
+
+    def started(self, job, i, pid=None):
+        self.mutex.acquire()
+        try:
+            if (job, i) in self._tasks:
+                self._started[(job, i)] = pid
+        finally:
+            self.mutex.release()
+
+    def completed(self, job, i):
+        self.mutex.acquire()
+        try:
+            try:
+                record, _ = self._tasks.pop((job, i))
+            except KeyError:
+                return
+            record.pop((job, i), None)
+            self._started.pop((job, i), None)
+        finally:
+            self.mutex.release()
+
+    def _forget(self, record, started, not_started):
+        for key, task in record.items():
+            del self._tasks[key]
+            if key in self._started:
+                del self._started[key]
+                started.append(task)
+            else:
+                not_started.append(task)
+        record.clear()
+
+    def lost(self, job, i):
+        """Forget the tasks in the same batch as ``(job, i)``,
+        which have not completed.
+
+        Returns a tuple of two lists: the tasks that were started,
+        and the tasks that were not started yet.
+
+        """
+        self.mutex.acquire()
+        try:
+            try:
+                record, _ = self._tasks[(job, i)]
+            except KeyError:
+                return [], []
+            started, not_started = [], []
+            self._forget(record, started, not_started)
+            return started, not_started
+        finally:
+            self.mutex.release()
+
+    def process_lost(self, pid):
+        """Forget the batches with tasks started by the process with
+        id ``pid``, which have not completed.
+
+        Returns a tuple of two lists, like :meth:`lost`.
+
+        """
+        self.mutex.acquire()
+        try:
+            started, not_started = [], []
+            for key, started_by in self._started.items():
+                if started_by == pid and key in self._tasks:
+                    record, _ = self._tasks[key]
+                    self._forget(record, started, not_started)
+            return started, not_started
+        finally:
+            self.mutex.release()
+
+
 class AckHandler(PoolThread):
 
-    def __init__(self, ackqueue, get, cache):
+    def __init__(self, ackqueue, get, cache, batches=None,
+            timeout_handler=None):
         self.ackqueue = ackqueue
         self.get = get
         self.cache = cache
+        self.batches = batches
+        self.timeout_handler = timeout_handler
 
         super(AckHandler, self).__init__()
 
+    def on_ack(self, job, i, time_accepted, pid):
+        if self.batches is not None:
+            self.batches.started(job, i, pid)
+        try:
+            result = self.cache[job]
+            result._ack(i, time_accepted, pid)
+        except (KeyError, AttributeError):
+            # Object gone, or doesn't support _ack (e.g. IMapIterator)
+            return
+        if self.timeout_handler is not None and not result._ready:
+            self.timeout_handler.add(job, time_accepted)
+
     def run(self):
         debug('ack handler starting')
         get = self.get
         cache = self.cache
+        on_ack = self.on_ack
 
         while 1:
             try:
@@ -229,12 +753,11 @@ class AckHandler(PoolThread):
                 debug('ack handler got sentinel')
                 break
 
-            job, i, time_accepted, pid = task
-            try:
-                cache[job]._ack(i, time_accepted, pid)
-            except (KeyError, AttributeError), exc:
-                # Object gone, or doesn't support _ack (e.g. IMapIterator)
-                pass
+            if task.__class__ is list:
+                for ack in task:
+                    on_ack(*ack)
+            else:
+                on_ack(*task)
 
         while cache and self._state != TERMINATE:
             try:
@@ -248,118 +771,228 @@ class AckHandler(PoolThread):
                 debug('result handler ignoring extra sentinel')
                 continue
 
-            job, i, time_accepted, pid = task
-            try:
-                cache[job]._ack(i, time_accepted, pid)
-            except KeyError:
-                pass
+            if task.__class__ is list:
+                for ack in task:
+                    on_ack(*ack)
+            else:
+                on_ack(*task)
 
         debug('ack handler exiting: len(cache)=%s, thread._state=%s',
                 len(cache), self._state)
 
 
 class TimeoutHandler(PoolThread):
-
-    def __init__(self, processes, cache, t_soft, t_hard):
+    """Enforces the soft and hard time limits of jobs.
+
+    The deadlines of accepted jobs are kept in a heap, and the thread
+    sleeps until the earliest deadline, or until a job with an earlier
+    deadline is added with :meth:`add`.
+
+    Deadlines of jobs that completed in time are not removed right away,
+    but skipped when they are reached, or thrown out when the heap has
+    grown much larger than the job cache.
+
+    :param processes: List of pool processes.
+    :param cache: The job cache.
+    :param t_soft: Soft time limit in seconds.
+    :param t_hard: Hard time limit in seconds.
+    :keyword batches: :class:`BatchRecord` used if the pool is in batch
+        mode.
+    :keyword putqueue: Function used to send lost tasks again.
+    :keyword pids: Mapping of process ids to pool processes.  Created
+        from ``processes`` if not set.
+
+    """
+    SOFT, HARD = 0, 1
+
+    def __init__(self, processes, cache, t_soft, t_hard, batches=None,
+            putqueue=None, pids=None):
         self.processes = processes
         self.cache = cache
         self.t_soft = t_soft
         self.t_hard = t_hard
+        self.batches = batches
+        self.putqueue = putqueue
+        if pids is None:
+            pids = dict((process.pid, process) for process in processes)
+        self.pids = pids
+        self.deadlines = []
+        self.mutex = threading.Condition(threading.Lock())
         super(TimeoutHandler, self).__init__()
 
-    def run(self):
-        processes = self.processes
+    def add(self, job, time_accepted):
+        """Schedule the time limits of the job with id ``job``,
+        accepted at ``time_accepted``."""
+        entries = []
+        if self.t_soft:
+            entries.append((time_accepted + self.t_soft, self.SOFT,
+                            job, time_accepted))
+        if self.t_hard:
+            entries.append((time_accepted + self.t_hard, self.HARD,
+                            job, time_accepted))
+
+        self.mutex.acquire()
+        try:
+            deadlines = self.deadlines
+            if len(deadlines) > 4 * len(self.cache) + 64:
+                self._compact()
+                deadlines = self.deadlines
+            earliest = deadlines and deadlines[0] or None
+            for entry in entries:
+                heapq.heappush(deadlines, entry)
+            if earliest is None or deadlines[0] < earliest:
+                self.mutex.notify()
+        finally:
+            self.mutex.release()
+
+    def _compact(self):
         cache = self.cache
-        t_hard, t_soft = self.t_hard, self.t_soft
-        dirty = set()
+        self.deadlines = [entry for entry in self.deadlines
+                                if entry[2] in cache]
+        heapq.heapify(self.deadlines)
+
+    def _pop_expired(self, now):
+        """Pop the next deadline if it has been reached.
 
-        def _process_by_pid(pid):
-            for index, process in enumerate(processes):
-                if process.pid == pid:
-                    return process, index
+        Returns a tuple of ``(remaining, entry)``, where ``entry`` is
+        :const:`None` if no deadline has been reached, and ``remaining``
+        is the time left until the next deadline, or :const:`None` if
+        there are no deadlines.
+
+        """
+        deadlines = self.deadlines
+        if not deadlines:
             return None, None
+        if now < deadlines[0][0]:
+            return deadlines[0][0] - now, None
+        return None, heapq.heappop(deadlines)
 
-        def _pop_by_pid(pid):
-            process, index = _process_by_pid(pid)
-            if not process:
-                return
-            p = processes.pop(index)
-            assert p is process
-            return process
-
-        def _timed_out(start, timeout):
-            if not start or not timeout:
-                return False
-            if time.time() >= start + timeout:
-                return True
-
-        def _on_soft_timeout(job, i):
-            debug('soft time limit exceeded for %i' % i)
-            process, _index = _process_by_pid(job._accept_pid)
-            if not process:
-                return
+    def terminate(self):
+        super(TimeoutHandler, self).terminate()
+        self._wakeup()
 
-            # Run timeout callback
-            if job._timeout_callback is not None:
-                job._timeout_callback(soft=True)
+    def close(self):
+        super(TimeoutHandler, self).close()
+        self._wakeup()
 
-            try:
-                os.kill(job._accept_pid, SIG_SOFT_TIMEOUT)
-            except OSError, exc:
-                if exc.errno == errno.ESRCH:
-                    pass
-                else:
-                    raise
-
-            dirty.add(i)
-
-        def _on_hard_timeout(job, i):
-            debug('hard time limit exceeded for %i', i)
-            # Remove from _pool
-            process = _pop_by_pid(job._accept_pid)
-            # Remove from cache and set return value to an exception
-            job._set(i, (False, TimeLimitExceeded()))
-            # Run timeout callback
-            if job._timeout_callback is not None:
-                job._timeout_callback(soft=False)
-            if not process:
-                return
-            # Terminate the process
-            process.terminate()
+    def _wakeup(self):
+        self.mutex.acquire()
+        try:
+            self.mutex.notify()
+        finally:
+            self.mutex.release()
+
+    def on_process_lost(self, job):
+        """Handle the other tasks in the batch of a job whose worker
+        process was terminated: tasks that were not started yet are
+        sent again, and tasks that were started are failed with
+        :exc:`~celery.exceptions.WorkerLostError`."""
+        started, not_started = self.batches.lost(job._job, None)
+        for task in started:
+            other_job, i = task[0], task[1]
+            if other_job != job._job:
+                set_worker_lost(self.cache, other_job, i)
+        if not_started:
+            debug('sending %d lost tasks again' % len(not_started))
+            self.putqueue((not_started, None))
+
+    def on_soft_timeout(self, job):
+        debug('soft time limit exceeded for %i' % job._job)
+        if self.pids.get(job._accept_pid) is None:
+            return
+
+        # Run timeout callback
+        if job._timeout_callback is not None:
+            job._timeout_callback(soft=True)
 
-        # Inner-loop
-        while self._state == RUN:
+        try:
+            os.kill(job._accept_pid, SIG_SOFT_TIMEOUT)
+        except OSError, exc:
+            if exc.errno == errno.ESRCH:
+                pass
+            else:
+                raise
 
-            # Remove dirty items not in cache anymore
-            if dirty:
-                dirty = set(k for k in dirty if k in cache)
+    def on_hard_timeout(self, job):
+        debug('hard time limit exceeded for %i', job._job)
+        # Remove from _pool
+        process = self.pids.pop(job._accept_pid, None)
+        if process is not None:
+            try:
+                self.processes.remove(process)
+            except ValueError:
+                pass
+        # Remove from cache and set return value to an exception
+        job._set(job._job, (False, TimeLimitExceeded()))
+        # Run timeout callback
+        if job._timeout_callback is not None:
+            job._timeout_callback(soft=False)
+        if not process:
+            return
+        # Terminate the process
+        process.terminate()
+        if self.batches is not None:
+            self.on_process_lost(job)
 
-            for i, job in cache.items():
-                ack_time = job._time_accepted
-                if _timed_out(ack_time, t_hard):
-                    _on_hard_timeout(job, i)
-                elif i not in dirty and _timed_out(ack_time, t_soft):
-                    _on_soft_timeout(job, i)
+    def run(self):
+        cache = self.cache
+        mutex = self.mutex
+        pop_expired = self._pop_expired
+        nowfun = time.time
 
-            time.sleep(0.5) # Don't waste CPU cycles.
+        while self._state == RUN:
+            mutex.acquire()
+            try:
+                remaining, entry = pop_expired(nowfun())
+                if entry is None:
+                    # terminate() may have changed the state before we
+                    # got the mutex, and its wakeup would be lost.
+                    if self._state == RUN:
+                        # Woken up early by add() or terminate().
+                        mutex.wait(remaining)
+                    continue
+            finally:
+                mutex.release()
+
+            _deadline, kind, i, time_accepted = entry
+            job = cache.get(i)
+            if job is None or job._ready or \
+                    job._time_accepted != time_accepted:
+                # Completed in time, or sent again after its process
+                # was lost.
+                continue
+            if kind == self.HARD:
+                self.on_hard_timeout(job)
+            else:
+                self.on_soft_timeout(job)
 
         debug('timeout handler exiting')
 
 
 class ResultHandler(PoolThread):
 
-    def __init__(self, outqueue, get, cache, putlock):
+    def __init__(self, outqueue, get, cache, putlock, batches=None):
         self.outqueue = outqueue
         self.get = get
         self.cache = cache
         self.putlock = putlock
+        self.batches = batches
         super(ResultHandler, self).__init__()
 
+    def on_result(self, job, i, obj):
+        if self.batches is not None:
+            self.batches.completed(job, i)
+        try:
+            self.cache[job]._set(i, obj)
+        except KeyError:
+            pass
+
     def run(self):
         get = self.get
         outqueue = self.outqueue
         cache = self.cache
         putlock = self.putlock
+        on_result = self.on_result
 
         debug('result handler starting')
         while 1:
@@ -385,11 +1018,16 @@ class ResultHandler(PoolThread):
                 debug('result handler got sentinel')
                 break
 
-            job, i, obj = task
-            try:
-                cache[job]._set(i, obj)
-            except KeyError:
-                pass
+            if task.__class__ is list:
+                for n, result in enumerate(task):
+                    if n and putlock is not None:
+                        try:
+                            putlock.release()
+                        except ValueError:
+                            pass
+                    on_result(*result)
+            else:
+                on_result(*task)
 
         if putlock is not None:
             try:
@@ -408,11 +1046,12 @@ class ResultHandler(PoolThread):
             if task is None:
                 debug('result handler ignoring extra sentinel')
                 continue
-            job, i, obj = task
-            try:
-                cache[job]._set(i, obj)
-            except KeyError:
-                pass
+
+            if task.__class__ is list:
+                for result in task:
+                    on_result(*result)
+            else:
+                on_result(*task)
 
         if hasattr(outqueue, '_reader'):
             debug('ensuring that outqueue is not full')
@@ -434,26 +1073,52 @@ class ResultHandler(PoolThread):
 class Pool(object):
     '''
     Class which supports an async version of the `apply()` builtin
+
+    If `batch_size` is set, tasks are sent to the worker processes in
+    batches of up to `batch_size` tasks, and the worker processes send
+    acknowledgements and results back in batches, holding them back for
+    at most `max_latency` seconds.  This cuts the cost of IPC for short
+    tasks, but a task may have to wait for the tasks before it in the
+    same batch.  Iterables passed to `imap()` are consumed at once.
+
+    If `shared_threshold` is set, task and result messages that take up
+    at least `shared_threshold` bytes when pickled are passed through
+    shared memory instead of the pipes, see `dumps_message()`.
     '''
     Process = Process
     Supervisor = Supervisor
     TaskHandler = TaskHandler
+    BatchTaskHandler = BatchTaskHandler
     AckHandler = AckHandler
     TimeoutHandler = TimeoutHandler
     ResultHandler = ResultHandler
     SoftTimeLimitExceeded = SoftTimeLimitExceeded
 
     def __init__(self, processes=None, initializer=None, initargs=(),
-            maxtasksperchild=None, timeout=None, soft_timeout=None):
+            maxtasksperchild=None, timeout=None, soft_timeout=None,
+            batch_size=None, max_latency=0.01, shared_threshold=None):
         self._setup_queues()
         self._taskqueue = Queue.Queue()
         self._cache = {}
         self._state = RUN
         self.timeout = timeout
         self.soft_timeout = soft_timeout
+        self.batch_size = batch_size
+        self.max_latency = max_latency
         self._maxtasksperchild = maxtasksperchild
         self._initializer = initializer
         self._initargs = initargs
+        self._batches = None
+        if batch_size:
+            self._batches = BatchRecord()
+        self.shared_threshold = shared_threshold
+        self._shared_dir = None
+        if shared_threshold:
+            self._shared_dir = shared_payload_dir()
+            self._quick_put = shared_put(self._inqueue._writer.send_bytes,
+                                         shared_threshold, self._shared_dir)
+            self._quick_get = shared_get(self._outqueue._reader.recv_bytes,
+                                         lost_results)
 
         if self.soft_timeout and SIG_SOFT_TIMEOUT is None:
             raise NotImplementedError("Soft timeouts not supported: "
@@ -470,36 +1135,47 @@ class Pool(object):
             raise TypeError('initializer must be a callable')
 
         self._pool = []
+        self._pids = {}
         for i in range(processes):
             self._create_worker_process()
 
         self._worker_handler = self.Supervisor(self)
         self._worker_handler.start()
 
-        self._putlock = threading.BoundedSemaphore(self._processes)
-
-        self._task_handler = self.TaskHandler(self._taskqueue, self._quick_put,
-                                         self._outqueue, self._pool)
+        if self.batch_size:
+            self._putlock = threading.BoundedSemaphore(
+                                    self._processes * self.batch_size)
+            self._task_handler = self.BatchTaskHandler(self._taskqueue,
+                                    self._quick_put, self._outqueue,
+                                    self._pool, self.batch_size,
+                                    self._batches)
+        else:
+            self._putlock = threading.BoundedSemaphore(self._processes)
+            self._task_handler = self.TaskHandler(self._taskqueue,
+                                    self._quick_put, self._outqueue,
+                                    self._pool)
         self._task_handler.start()
 
-        # Thread processing acknowledgements from the ackqueue.
-        self._ack_handler = self.AckHandler(self._ackqueue,
-                self._quick_get_ack, self._cache)
-        self._ack_handler.start()
-
         # Thread killing timedout jobs.
         if self.timeout or self.soft_timeout:
             self._timeout_handler = self.TimeoutHandler(
                     self._pool, self._cache,
-                    self.soft_timeout, self.timeout)
+                    self.soft_timeout, self.timeout,
+                    self._batches, self._taskqueue.put, self._pids)
             self._timeout_handler.start()
         else:
             self._timeout_handler = None
 
+        # Thread processing acknowledgements from the ackqueue.
+        self._ack_handler = self.AckHandler(self._ackqueue,
+                self._quick_get_ack, self._cache, self._batches,
+                self._timeout_handler)
+        self._ack_handler.start()
+
         # Thread processing results in the outqueue.
         self._result_handler = self.ResultHandler(self._outqueue,
                                         self._quick_get, self._cache,
-                                        self._putlock)
+                                        self._putlock, self._batches)
         self._result_handler.start()
 
         self._terminate = Finalize(
@@ -508,21 +1184,32 @@ class Pool(object):
                   self._ackqueue, self._pool, self._ack_handler,
                   self._worker_handler, self._task_handler,
                   self._result_handler, self._cache,
-                  self._timeout_handler),
+                  self._timeout_handler, self._shared_dir),
             exitpriority=15,
             )
 
     def _create_worker_process(self):
-        w = self.Process(
-            target=worker,
-            args=(self._inqueue, self._outqueue, self._ackqueue,
-                    self._initializer, self._initargs,
-                    self._maxtasksperchild),
-            )
+        if self.batch_size:
+            w = self.Process(
+                target=batch_worker,
+                args=(self._inqueue, self._outqueue, self._ackqueue,
+                        self._initializer, self._initargs,
+                        self._maxtasksperchild, self.max_latency,
+                        self.shared_threshold, self._shared_dir),
+                )
+        else:
+            w = self.Process(
+                target=worker,
+                args=(self._inqueue, self._outqueue, self._ackqueue,
+                        self._initializer, self._initargs,
+                        self._maxtasksperchild,
+                        self.shared_threshold, self._shared_dir),
+                )
         self._pool.append(w)
         w.name = w.name.replace('Process', 'PoolWorker')
         w.daemon = True
         w.start()
+        self._pids[w.pid] = w
         return w
 
     def _join_exited_workers(self):
@@ -542,8 +1229,24 @@ class Pool(object):
                         pass
                 worker.join()
                 del self._pool[i]
+                if self._pids.get(worker.pid) is worker:
+                    self._pids.pop(worker.pid, None)
+                if worker.exitcode and self._batches is not None:
+                    self._on_process_lost(worker.pid)
         return len(self._pool) < self._processes
 
+    def _on_process_lost(self, pid):
+        """Handle the batches of a worker process that exited with an
+        error: tasks that were started are failed with
+        :exc:`~celery.exceptions.WorkerLostError`, and the other tasks
+        are sent again."""
+        started, not_started = self._batches.process_lost(pid)
+        for task in started:
+            set_worker_lost(self._cache, task[0], task[1])
+        if not_started:
+            debug('sending %d lost tasks again' % len(not_started))
+            self._taskqueue.put((not_started, None))
+
     def _repopulate_pool(self):
         """Bring the number of pool processes up to the specified number,
         for use after reaping workers which have exited.
@@ -701,21 +1404,31 @@ class Pool(object):
         self._result_handler.join()
         for p in self._pool:
             p.join()
+        self._remove_shared_dir(self._shared_dir)
         debug('after join()')
 
+    @staticmethod
+    def _remove_shared_dir(shared_dir):
+        # Removes shared memory segments that were never received,
+        # e.g. arguments of tasks that were still in the pipe.
+        if shared_dir is not None:
+            debug('removing shared memory segments')
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
     @staticmethod
     def _help_stuff_finish(inqueue, task_handler, size):
         # task_handler may be blocked trying to put items on inqueue
         debug('removing tasks from inqueue until task handler finished')
         inqueue._rlock.acquire()
         while task_handler.is_alive() and inqueue._reader.poll():
-            inqueue._reader.recv()
+            inqueue._reader.recv_bytes()
             time.sleep(0)
 
     @classmethod
     def _terminate_pool(cls, taskqueue, inqueue, outqueue, ackqueue, pool,
                         ack_handler, worker_handler, task_handler,
-                        result_handler, cache, timeout_handler):
+                        result_handler, cache, timeout_handler,
+                        shared_dir=None):
 
         # this is guaranteed to only be called once
         debug('finalizing pool')
@@ -766,6 +1479,8 @@ class Pool(object):
                     # worker has not yet exited
                     debug('cleaning up worker %d' % p.pid)
                     p.join()
+
+        cls._remove_shared_dir(shared_dir)
 DynamicPool = Pool
 
 #
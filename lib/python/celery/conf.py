@@ -44,14 +44,24 @@ _DEFAULTS = {
     "BROKER_CONNECTION_TIMEOUT": 4,
     "BROKER_CONNECTION_RETRY": True,
     "BROKER_CONNECTION_MAX_RETRIES": 100,
+    "BROKER_POOL_LIMIT": 10,
+    "BROKER_POOL_EXPIRES": 60,
     "CELERY_ACKS_LATE": False,
     "CELERYD_POOL_PUTLOCKS": True,
+    "CELERYD_POOL_BATCH_SIZE": None, # disabled
+    "CELERYD_POOL_MAX_LATENCY": 0.01,
+    "CELERYD_POOL_SHARED_THRESHOLD": None, # disabled
     "CELERYD_POOL": "celery.concurrency.processes.TaskPool",
     "CELERYD_MEDIATOR": "celery.worker.controllers.Mediator",
     "CELERYD_ETA_SCHEDULER": "celery.worker.controllers.ScheduleController",
     "CELERYD_LISTENER": "celery.worker.listener.CarrotListener",
+    "CELERYD_TASK_BUCKET": "celery.worker.buckets.TaskBucket",
     "CELERYD_CONCURRENCY": 0, # defaults to cpu count
     "CELERYD_PREFETCH_MULTIPLIER": 4,
+    "CELERYD_PREFETCH_ADAPTIVE": False,
+    "CELERYD_PREFETCH_INTERVAL": 1.0,
+    "CELERYD_PREFETCH_BUFFER_TIME": 1.0,
+    "CELERYD_PREFETCH_MAX": None, # no limit
     "CELERYD_LOG_FORMAT": DEFAULT_PROCESS_LOG_FMT,
     "CELERYD_TASK_LOG_FORMAT": DEFAULT_TASK_LOG_FMT,
     "CELERYD_LOG_COLOR": False,
@@ -74,11 +84,19 @@ _DEFAULTS = {
     "CELERY_EVENT_EXCHANGE_TYPE": "direct",
     "CELERY_EVENT_ROUTING_KEY": "celeryevent",
     "CELERY_EVENT_SERIALIZER": "json",
+    "CELERY_EVENT_BATCH_SIZE": 0, # disabled
+    "CELERY_EVENT_MAX_LATENCY": 1.0,
+    "CELERY_EVENT_BUFFER_SIZE": 10000,
     "CELERY_RESULT_EXCHANGE": "celeryresults",
     "CELERY_RESULT_EXCHANGE_TYPE": "direct",
     "CELERY_RESULT_SERIALIZER": "pickle",
     "CELERY_RESULT_PERSISTENT": False,
+    "CELERY_RESULT_REPLY_QUEUE": False,
     "CELERY_MAX_CACHED_RESULTS": 5000,
+    "CELERY_RESULT_DB_WRITE_BEHIND": False,
+    "CELERY_RESULT_DB_FLUSH_INTERVAL": 1.0,
+    "CELERY_RESULT_DB_FLUSH_SIZE": 100,
+    "CELERY_RESULT_DB_BUFFER_LIMIT": 10000,
     "CELERY_TRACK_STARTED": False,
 
     # Default e-mail settings.
@@ -133,6 +151,10 @@ if isinstance(TASK_RESULT_EXPIRES, int):
 # <--- SQLAlchemy                                  <-   --   --- - ----- -- #
 RESULT_DBURI = _get("CELERY_RESULT_DBURI")
 RESULT_ENGINE_OPTIONS = _get("CELERY_RESULT_ENGINE_OPTIONS")
+RESULT_DB_WRITE_BEHIND = _get("CELERY_RESULT_DB_WRITE_BEHIND")
+RESULT_DB_FLUSH_INTERVAL = _get("CELERY_RESULT_DB_FLUSH_INTERVAL")
+RESULT_DB_FLUSH_SIZE = _get("CELERY_RESULT_DB_FLUSH_SIZE")
+RESULT_DB_BUFFER_LIMIT = _get("CELERY_RESULT_DB_BUFFER_LIMIT")
 
 
 # <--- Client                                      <-   --   --- - ----- -- #
@@ -163,10 +185,18 @@ CELERYD_LOG_LEVEL = LOG_LEVELS[CELERYD_LOG_LEVEL.upper()]
 CELERYD_STATE_DB = _get("CELERYD_STATE_DB")
 CELERYD_CONCURRENCY = _get("CELERYD_CONCURRENCY")
 CELERYD_PREFETCH_MULTIPLIER = _get("CELERYD_PREFETCH_MULTIPLIER")
+CELERYD_PREFETCH_ADAPTIVE = _get("CELERYD_PREFETCH_ADAPTIVE")
+CELERYD_PREFETCH_INTERVAL = _get("CELERYD_PREFETCH_INTERVAL")
+CELERYD_PREFETCH_BUFFER_TIME = _get("CELERYD_PREFETCH_BUFFER_TIME")
+CELERYD_PREFETCH_MAX = _get("CELERYD_PREFETCH_MAX")
 CELERYD_POOL_PUTLOCKS = _get("CELERYD_POOL_PUTLOCKS")
+CELERYD_POOL_BATCH_SIZE = _get("CELERYD_POOL_BATCH_SIZE")
+CELERYD_POOL_MAX_LATENCY = _get("CELERYD_POOL_MAX_LATENCY")
+CELERYD_POOL_SHARED_THRESHOLD = _get("CELERYD_POOL_SHARED_THRESHOLD")
 
 CELERYD_POOL = _get("CELERYD_POOL")
 CELERYD_LISTENER = _get("CELERYD_LISTENER")
+CELERYD_TASK_BUCKET = _get("CELERYD_TASK_BUCKET")
 CELERYD_MEDIATOR = _get("CELERYD_MEDIATOR")
 CELERYD_ETA_SCHEDULER = _get("CELERYD_ETA_SCHEDULER")
 CELERYD_ETA_SCHEDULER_PRECISION = _get("CELERYD_ETA_SCHEDULER_PRECISION")
@@ -195,6 +225,8 @@ BROKER_CONNECTION_RETRY = _get("BROKER_CONNECTION_RETRY",
 BROKER_CONNECTION_MAX_RETRIES = _get("BROKER_CONNECTION_MAX_RETRIES",
                             compat=["CELERY_BROKER_CONNECTION_MAX_RETRIES"])
 BROKER_BACKEND = _get("BROKER_BACKEND") or _get("CARROT_BACKEND")
+BROKER_POOL_LIMIT = _get("BROKER_POOL_LIMIT")
+BROKER_POOL_EXPIRES = _get("BROKER_POOL_EXPIRES")
 
 # <--- Message routing                             <-   --   --- - ----- -- #
 DEFAULT_QUEUE = _get("CELERY_DEFAULT_QUEUE")
@@ -221,6 +253,9 @@ EVENT_EXCHANGE = _get("CELERY_EVENT_EXCHANGE")
 EVENT_EXCHANGE_TYPE = _get("CELERY_EVENT_EXCHANGE_TYPE")
 EVENT_ROUTING_KEY = _get("CELERY_EVENT_ROUTING_KEY")
 EVENT_SERIALIZER = _get("CELERY_EVENT_SERIALIZER")
+EVENT_BATCH_SIZE = _get("CELERY_EVENT_BATCH_SIZE")
+EVENT_MAX_LATENCY = _get("CELERY_EVENT_MAX_LATENCY")
+EVENT_BUFFER_SIZE = _get("CELERY_EVENT_BUFFER_SIZE")
 
 # :--- AMQP Backend settings                        <-   --   --- - ----- -- #
 
@@ -228,6 +263,7 @@ RESULT_EXCHANGE = _get("CELERY_RESULT_EXCHANGE")
 RESULT_EXCHANGE_TYPE = _get("CELERY_RESULT_EXCHANGE_TYPE")
 RESULT_SERIALIZER = _get("CELERY_RESULT_SERIALIZER")
 RESULT_PERSISTENT = _get("CELERY_RESULT_PERSISTENT")
+RESULT_REPLY_QUEUE = _get("CELERY_RESULT_REPLY_QUEUE")
 
 # :--- Celery Beat                                  <-   --   --- - ----- -- #
 CELERYBEAT_LOG_LEVEL = _get("CELERYBEAT_LOG_LEVEL")
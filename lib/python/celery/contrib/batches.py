@@ -1,49 +1,329 @@
-from itertools import count
-from collections import deque, defaultdict
+"""
+=================
+Batches overview
+=================
 
+For tasks sent in large numbers where each task does little work,
+e.g. incrementing a counter, it can be much cheaper to process many
+of them at once.
+
+A :class:`Batches` task buffers the task requests it receives in the
+worker, and executes the buffered requests as one call in a pool
+process when :attr:`~Batches.flush_every` requests have been received,
+or when the oldest request has been waiting for
+:attr:`~Batches.flush_interval` seconds.
+
+* :meth:`~Batches.run` is called with a list of :class:`SimpleRequest`
+  objects, and can return a list with the result of every request.
+
+* The messages of the requests are acknowledged when the batch has been
+  executed, so buffered requests are redelivered if the worker goes
+  away.  Pending batches are flushed when the worker shuts down.
+
+* Results are stored and events are sent for every request, the same as
+  for regular tasks.
+
+Usage example
+-------------
+
+.. code-block:: python
+
+    from celery.contrib.batches import Batches
+
+    class CountClicks(Batches):
+        flush_every = 100
+
+        def run(self, requests):
+            clicks = defaultdict(int)
+            for request in requests:
+                clicks[request.kwargs["url"]] += 1
+            for url, count in clicks.items():
+                increment_in_db(url, n=count)
+
+    >>> CountClicks.delay(url="http://example.com")
+
+.. note::
+
+    The worker doesn't receive more than the prefetch count
+    (``CELERYD_PREFETCH_MULTIPLIER`` * concurrency) of unacknowledged
+    messages at a time, so this needs to be at least
+    :attr:`~Batches.flush_every` for batches to be flushed because
+    of their size.  Otherwise they're only flushed every
+    :attr:`~Batches.flush_interval` seconds, and a warning is issued
+    when the worker starts.
+
+"""
+import sys
+import time
+import threading
+import traceback
+import warnings
+
+from celery import conf
+from celery import signals
+from celery.datastructures import ExceptionInfo
+from celery.registry import tasks
 from celery.task.base import Task
+from celery.utils import curry
+from celery.utils.compat import defaultdict
+from celery.worker.job import execution_plan
+from celery.worker.listener import PREFETCH_COUNT_MAX
+
+
+class SimpleRequest(object):
+    """Pickleable version of a
+    :class:`~celery.worker.job.TaskRequest`, as passed to
+    :meth:`Batches.run`.
+
+    .. attribute:: id
+
+        UUID of the task.
+
+    .. attribute:: name
+
+        Name of the task.
+
+    .. attribute:: args
+
+        Positional arguments of the task.
+
+    .. attribute:: kwargs
+
+        Keyword arguments of the task.
+
+    .. attribute:: retries
+
+        Number of times the task has been retried.
+
+    .. attribute:: delivery_info
+
+        Delivery information of the task message.
+
+    .. attribute:: hostname
+
+        Host name of the worker.
+
+    """
+
+    def __init__(self, id, name, args, kwargs, retries=0,
+            delivery_info=None, hostname=None):
+        self.id = id
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.retries = retries
+        self.delivery_info = delivery_info or {}
+        self.hostname = hostname
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(request.task_id, request.task_name, request.args,
+                   request.kwargs, request.retries, request.delivery_info,
+                   request.hostname)
+
+
+def execute_batch(task_name, requests):
+    """Execute a batch of requests in a pool process.
+
+    Returns the list of results, or an
+    :class:`~celery.datastructures.ExceptionInfo` if the task raised an
+    exception.  The results, or the exception, are stored for every
+    request.
+
+    """
+    plan = execution_plan(task_name)
+    task = plan.task
+    store_opts = [{} for request in requests]
+    if plan.accepts_reply_to:
+        store_opts = [{"reply_to": request.delivery_info.get("reply_to")}
+                        for request in requests]
+    plan.loader.on_task_init(requests[0].id, task)
+    try:
+        try:
+            results = task.run(requests)
+            if results is None:
+                results = [None] * len(requests)
+            results = list(results)
+            if len(results) != len(requests):
+                raise ValueError(
+                    "Batch task %s returned %d results for %d requests" % (
+                        task_name, len(results), len(requests)))
+        except Exception, exc:
+            type_, _, tb = sys.exc_info()
+            strtb = "\n".join(traceback.format_exception(type_, exc, tb))
+            if plan.store_errors:
+                for request, opts in zip(requests, store_opts):
+                    plan.mark_as_failure(request.id, exc, strtb, **opts)
+            return ExceptionInfo((type_, plan.prepare_exception(exc), tb))
+        if not plan.ignore_result:
+            for request, result, opts in zip(requests, results, store_opts):
+                plan.mark_as_done(request.id, result, **opts)
+        return results
+    finally:
+        plan.process_cleanup()
+        plan.loader.on_process_cleanup()
 
 
 class Batches(Task):
+    """A task that is executed for a batch of requests at a time.
+
+    .. attribute:: flush_every
+
+        Maximum number of requests in a batch.
+
+    .. attribute:: flush_interval
+
+        Maximum number of seconds a request is buffered before its
+        batch is executed.  If set to :const:`None`, batches are only
+        executed when full.  The messages of buffered requests count
+        towards the worker's prefetch count, so keep this short.
+
+    """
     abstract = True
+    acks_late = True
     flush_every = 10
+    flush_interval = 1.0
 
     def __init__(self):
-        self._buffer = deque()
-        self._count = count().next
+        self._buffer = []
+        self._mutex = threading.Lock()
+        self._timer = None
+        self._pool = None
+
+    def run(self, requests):
+        """Execute a batch of requests.
+
+        :param requests: List of :class:`SimpleRequest` objects.
+
+        :returns: :const:`None`, or a list with the result of every
+            request, in the same order.
+
+        """
+        raise NotImplementedError("Batches tasks must define the run method.")
 
     def execute(self, wrapper, pool, loglevel, logfile):
-        self._buffer.append((wrapper, pool, loglevel, logfile))
+        if wrapper.revoked():
+            return
+        wrapper._set_executed_bit()
 
-        if not self._count() % self.flush_every:
-            self.flush(self._buffer)
-            self._buffer.clear()
+        batch = None
+        self._mutex.acquire()
+        try:
+            self._pool = pool
+            self._buffer.append(wrapper)
+            if len(self._buffer) >= self.flush_every:
+                batch = self._take_buffer()
+            elif self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval,
+                                              self.flush_buffer)
+                self._timer.setDaemon(True)
+                self._timer.start()
+        finally:
+            self._mutex.release()
 
-    def flush(self, tasks):
-        for wrapper, pool, loglevel, logfile in tasks:
-            wrapper.execute_using_pool(pool, loglevel, logfile)
+        if batch:
+            self.apply_batch(batch)
 
+    def _take_buffer(self):
+        batch, self._buffer = self._buffer, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
 
-class Counter(Task):
-    abstract = True
-    flush_every = 10
+    def flush_buffer(self):
+        """Execute the buffered requests now."""
+        self._mutex.acquire()
+        try:
+            batch = self._take_buffer()
+        finally:
+            self._mutex.release()
+        if batch:
+            self.apply_batch(batch)
 
-    def __init__(self):
-        self._buffer = deque()
-        self._count = count().next
+    def apply_batch(self, batch):
+        """Send a batch of :class:`~celery.worker.job.TaskRequest`
+        objects to the pool."""
+        batch = [request for request in batch if not request.revoked()]
+        if not batch:
+            return
+        time_start = time.time()
+        for request in batch:
+            request.time_start = time_start
+        requests = [SimpleRequest.from_request(request)
+                        for request in batch]
+        try:
+            return self._pool.apply_async(execute_batch,
+                        args=(self.name, requests),
+                        accept_callback=curry(self.on_batch_accepted, batch),
+                        timeout_callback=curry(self.on_batch_timeout, batch),
+                        callbacks=[curry(self.on_batch_success, batch)],
+                        errbacks=[curry(self.on_batch_failure, batch)])
+        except Exception, exc:
+            # The messages are not acknowledged, so they are
+            # redelivered.
+            self.get_logger().error(
+                    "Couldn't apply batch of %d %s tasks: %s" % (
+                        len(batch), self.name, exc))
 
-    def execute(self, wrapper, pool, loglevel, logfile):
-        self._buffer.append((wrapper.args, wrapper.kwargs))
+    def on_batch_accepted(self, batch):
+        for request in batch:
+            request.on_accepted()
+
+    def on_batch_timeout(self, batch, soft):
+        for request in batch:
+            request.on_timeout(soft)
+
+    def on_batch_success(self, batch, results):
+        for request, result in zip(batch, results):
+            request.on_success(result)
+
+    def on_batch_failure(self, batch, exc_info):
+        for request in batch:
+            request.on_failure(exc_info)
+
+
+def flush_batches(**kwargs):
+    """Execute the buffered requests of all :class:`Batches` tasks."""
+    for task in tasks.values():
+        if isinstance(task, Batches):
+            task.flush_buffer()
+signals.worker_shutdown.connect(flush_batches)
+
+
+def check_prefetch(sender, **kwargs):
+    """Warn about :class:`Batches` tasks that can't fill a batch within
+    the prefetch count of the worker."""
+    listener = getattr(sender, "listener", None)
+    if listener is None:
+        return
+    prefetch_count = listener.initial_prefetch_count
+    if listener.adaptive_prefetch:
+        prefetch_count = conf.CELERYD_PREFETCH_MAX or PREFETCH_COUNT_MAX
+    for task in tasks.values():
+        if isinstance(task, Batches) and prefetch_count < task.flush_every:
+            warnings.warn(
+                "Prefetch count %d is less than flush_every of %s (%d), "
+                "so its batches are only flushed every %s seconds. "
+                "Increase CELERYD_PREFETCH_MULTIPLIER or lower "
+                "flush_every." % (prefetch_count, task.name,
+                                  task.flush_every, task.flush_interval))
+signals.worker_init.connect(check_prefetch)
+
+
+class Counter(Batches):
+    """A :class:`Batches` task that passes the positional and keyword
+    arguments of the requests to :meth:`flush`."""
+    abstract = True
 
-        if not self._count() % self.flush_every:
-            self.flush(self._buffer)
-            self._buffer.clear()
+    def run(self, requests):
+        self.flush([(request.args, request.kwargs) for request in requests])
 
     def flush(self, buffer):
         raise NotImplementedError("Counters must implement 'flush'")
 
 
-class ClickCounter(Task):
+class ClickCounter(Counter):
     flush_every = 1000
 
     def flush(self, buffer):
@@ -3,6 +3,9 @@ from __future__ import generators
 import time
 import traceback
 
+from array import array
+from collections import deque
+from operator import itemgetter
 from UserList import UserList
 from Queue import Queue, Empty as QueueEmpty
 
@@ -187,6 +190,10 @@ class LimitedSet(object):
     but the list might become to big, so you want to limit it so it doesn't
     consume too much resources.
 
+    Members are kept in insertion order, so adding members, testing for
+    membership and expiring the oldest members are all (amortized)
+    constant time operations.
+
     :keyword maxlen: Maximum number of members before we start
         deleting expired members.
     :keyword expires: Time in seconds, before a membership expires.
@@ -197,36 +204,79 @@ class LimitedSet(object):
         self.maxlen = maxlen
         self.expires = expires
         self._data = {}
+        self._order = deque()
 
     def add(self, value):
         """Add a new member."""
-        self._expire_item()
-        self._data[value] = time.time()
+        now = time.time()
+        if self.maxlen:
+            self._expire_items(self.maxlen - 1, now)
+        self._data[value] = now
+        self._order.append((value, now))
+        if len(self._order) > 2 * len(self._data) + 100:
+            self._compact()
 
     def pop_value(self, value):
         """Remove membership by finding value."""
         self._data.pop(value, None)
 
-    def _expire_item(self):
-        """Hunt down and remove an expired item."""
-        while 1:
-            if self.maxlen and len(self) >= self.maxlen:
-                value, when = self.first
-                if not self.expires or time.time() > when + self.expires:
-                    try:
-                        self.pop_value(value)
-                    except TypeError: # pragma: no cover
-                        continue
-            break
+    def _expire_items(self, limit, now=None):
+        """Remove the oldest expired members until there are no more
+        than ``limit`` members left."""
+        data, order = self._data, self._order
+        expires = self.expires
+        now = now or time.time()
+        while order and len(data) > limit:
+            value, when = order[0]
+            if data.get(value) != when:
+                # Removed or re-added since.
+                order.popleft()
+                continue
+            if expires and now < when + expires:
+                break
+            order.popleft()
+            del data[value]
+
+    def _compact(self):
+        """Remove entries for members that have since been removed
+        or re-added."""
+        self._order = deque(self.chronologically)
 
     def __contains__(self, value):
         return value in self._data
 
     def update(self, other):
+        """Add the members of another :class:`LimitedSet`, a mapping of
+        members to the time they were added, or an iterable of new
+        members.
+
+        Members exceeding :attr:`maxlen` are expired after all of
+        them have been added.
+
+        """
+        data = self._data
         if isinstance(other, self.__class__):
-            self._data.update(other._data)
+            other = other._data
+        if hasattr(other, "items"):
+            items = [(value, when) for value, when in other.items()
+                        if data.get(value, 0) < when]
+            items.sort(key=itemgetter(1))
+        else:
+            now = time.time()
+            items = [(value, now) for value in other]
+        if not items:
+            return
+
+        order = self._order
+        if order and items[0][1] < order[-1][1]:
+            # Older than the members we have, so have to merge.
+            data.update(items)
+            self._order = deque(sorted(data.items(), key=itemgetter(1)))
         else:
-            self._data.update(other)
+            data.update(items)
+            order.extend(items)
+        if self.maxlen:
+            self._expire_items(self.maxlen)
 
     def as_dict(self):
         return self._data
@@ -235,19 +285,42 @@ class LimitedSet(object):
         return iter(self._data.keys())
 
     def __len__(self):
-        return len(self._data.keys())
+        return len(self._data)
 
     def __repr__(self):
         return "LimitedSet([%s])" % (repr(self._data.keys()))
 
+    def __reduce__(self):
+        # Members are stored in chronological order with the timestamps
+        # packed into a single string of doubles.
+        members = self.chronologically
+        timestamps = array("d", [when for _, when in members])
+        return (self.__class__, (self.maxlen, self.expires),
+                ([value for value, _ in members], timestamps.tostring()))
+
+    def __setstate__(self, state):
+        values, timestamps = state
+        when = array("d")
+        when.fromstring(timestamps)
+        self._order = deque(zip(values, when))
+        self._data = dict(self._order)
+
     @property
     def chronologically(self):
-        return sorted(self._data.items(), key=lambda (value, when): when)
+        data = self._data
+        return [(value, when) for value, when in self._order
+                    if data.get(value) == when]
 
     @property
     def first(self):
         """Get the oldest member."""
-        return self.chronologically[0]
+        data, order = self._data, self._order
+        while order:
+            value, when = order[0]
+            if data.get(value) == when:
+                return value, when
+            order.popleft()
+        raise IndexError("LimitedSet is empty")
 
 
 class LocalCache(OrderedDict):
@@ -4,6 +4,7 @@ import threading
 
 from collections import deque
 
+from celery import conf
 from celery.messaging import EventPublisher, EventConsumer
 
 
@@ -33,17 +34,38 @@ class EventDispatcher(object):
     :keyword enabled: Set to ``False`` to not actually publish any events,
         making :meth:`send` a noop operation.
 
+    :keyword batch_size: If set, events are not sent right away,
+        but buffered and sent from a background thread as messages
+        containing a list of up to ``batch_size`` events.
+        Default is the ``CELERY_EVENT_BATCH_SIZE`` setting (disabled).
+
+    :keyword max_latency: Maximum time in seconds an event is buffered
+        before it's sent, when batching is enabled.
+
+    :keyword buffer_size: Maximum number of events to buffer when
+        batching is enabled.  If the buffer is full the oldest events
+        are dropped.
+
     You need to :meth:`close` this after use.
 
     """
+    _flusher = None
 
-    def __init__(self, connection, hostname=None, enabled=True):
+    def __init__(self, connection, hostname=None, enabled=True,
+            batch_size=None, max_latency=None, buffer_size=None):
         self.connection = connection
         self.hostname = hostname or socket.gethostname()
         self.enabled = enabled
+        self.batch_size = batch_size
+        if self.batch_size is None:
+            self.batch_size = conf.EVENT_BATCH_SIZE
+        self.max_latency = max_latency or conf.EVENT_MAX_LATENCY
         self._lock = threading.Lock()
         self.publisher = None
         self._outbound_buffer = deque()
+        self._pending = deque(maxlen=buffer_size or conf.EVENT_BUFFER_SIZE)
+        self._flush_now = threading.Event()
+        self._shutdown = threading.Event()
 
         if self.enabled:
             self.enable()
@@ -51,9 +73,12 @@ class EventDispatcher(object):
     def enable(self):
         self.enabled = True
         self.publisher = EventPublisher(self.connection)
+        if self.batch_size:
+            self._start_flusher()
 
     def disable(self):
         self.enabled = False
+        self._stop_flusher()
         if self.publisher is not None:
             self.publisher.close()
             self.publisher = None
@@ -68,8 +93,14 @@ class EventDispatcher(object):
         if not self.enabled:
             return
 
-        self._lock.acquire()
         event = Event(type, hostname=self.hostname, **fields)
+        if self.batch_size:
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self._flush_now.set()
+            return
+
+        self._lock.acquire()
         try:
             try:
                 self.publisher.send(event)
@@ -78,6 +109,46 @@ class EventDispatcher(object):
         finally:
             self._lock.release()
 
+    def _flush_loop(self):
+        while not self._shutdown.isSet():
+            self._flush_now.wait(self.max_latency)
+            self._flush_now.clear()
+            self.send_pending()
+
+    def send_pending(self):
+        """Send the events buffered for batching, in messages of up
+        to :attr:`batch_size` events."""
+        pending = self._pending
+        self._lock.acquire()
+        try:
+            while pending:
+                batch = []
+                while pending and len(batch) < self.batch_size:
+                    batch.append(pending.popleft())
+                try:
+                    self.publisher.send(batch)
+                except Exception, exc:
+                    self._outbound_buffer.extend((event, exc)
+                                                    for event in batch)
+        finally:
+            self._lock.release()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._shutdown.clear()
+            self._flusher = threading.Thread(target=self._flush_loop)
+            self._flusher.setDaemon(True)
+            self._flusher.start()
+
+    def _stop_flusher(self):
+        if self._flusher is not None:
+            self._shutdown.set()
+            self._flush_now.set()
+            self._flusher.join(self.max_latency * 2)
+            self._flusher = None
+        if self._pending and self.publisher is not None:
+            self.send_pending()
+
     def flush(self):
         while self._outbound_buffer:
             event, _ = self._outbound_buffer.popleft()
@@ -86,6 +157,7 @@ class EventDispatcher(object):
     def close(self):
         """Close the event dispatcher."""
         self._lock.locked() and self._lock.release()
+        self._stop_flusher()
         self.publisher and self.publisher.close()
 
 
@@ -131,5 +203,13 @@ class EventReceiver(object):
             it.next()
 
     def _receive(self, message_data, message):
-        type = message_data.pop("type").lower()
-        self.process(type, create_event(type, message_data))
+        if isinstance(message_data, (list, tuple)):
+            # batch of events.
+            for event in message_data:
+                self._receive_event(event)
+        else:
+            self._receive_event(message_data)
+
+    def _receive_event(self, event):
+        type = event.pop("type").lower()
+        self.process(type, create_event(type, event))
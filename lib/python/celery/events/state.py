@@ -1,47 +1,90 @@
 import time
-import heapq
+
+from collections import deque
 
 from carrot.utils import partition
 
 from celery import states
-from celery.datastructures import AttributeDict, LocalCache
+from celery.datastructures import LocalCache
 from celery.utils import kwdict
 
 HEARTBEAT_EXPIRE = 150 # 2 minutes, 30 seconds
+HEARTBEAT_BUFFER = 15  # number of heartbeats to keep for each worker.
+
+
+class Element(object):
+    """Base class for types.
 
+    Fields are stored in slots to keep the records compact, fields
+    not listed in :attr:`_fields` are kept in a dictionary created
+    on demand.
 
-class Element(AttributeDict):
-    """Base class for types."""
-    visited = False
+    """
+    __slots__ = ("_extra", )
+
+    # ``(name, default)`` pairs for the fields stored in slots.
+    _fields = ()
 
     def __init__(self, **fields):
-        dict.__init__(self, fields)
+        self._extra = None
+        for key, default in self._fields:
+            setattr(self, key, default)
+        Element.update(self, fields)
+
+    def __getattr__(self, key):
+        extra = self._extra
+        if extra is not None and key in extra:
+            return extra[key]
+        raise AttributeError("'%s' object has no attribute '%s'" % (
+                self.__class__.__name__, key))
+
+    def update(self, d, **extra):
+        """Update fields from a dictionary and/or keyword arguments."""
+        for fields in (d, extra):
+            for key, value in fields.items():
+                try:
+                    setattr(self, key, value)
+                except AttributeError:
+                    if self._extra is None:
+                        self._extra = {}
+                    self._extra[key] = value
+
+    def __repr__(self):
+        return "<%s: %r>" % (self.__class__.__name__, dict(
+                    (key, getattr(self, key)) for key, _ in self._fields))
 
 
 class Worker(Element):
     """Worker State."""
+    __slots__ = ("hostname", "heartbeats", "visited")
+    _fields = (("hostname", None),
+               ("visited", False))
 
     def __init__(self, **fields):
         super(Worker, self).__init__(**fields)
-        self.heartbeats = []
+        self.heartbeats = deque(maxlen=HEARTBEAT_BUFFER)
 
     def on_online(self, timestamp=None, **kwargs):
         self._heartpush(timestamp)
 
     def on_offline(self, **kwargs):
-        self.heartbeats = []
+        self.heartbeats.clear()
 
     def on_heartbeat(self, timestamp=None, **kwargs):
         self._heartpush(timestamp)
 
     def _heartpush(self, timestamp):
         if timestamp:
-            heapq.heappush(self.heartbeats, timestamp)
+            heartbeats = self.heartbeats
+            if heartbeats and timestamp < heartbeats[-1]:
+                # keep the latest heartbeat last.
+                timestamp, heartbeats[-1] = heartbeats[-1], timestamp
+            heartbeats.append(timestamp)
 
     @property
     def alive(self):
-        return (self.heartbeats and
-                time.time() < self.heartbeats[-1] + HEARTBEAT_EXPIRE)
+        return bool(self.heartbeats and
+                    time.time() < self.heartbeats[-1] + HEARTBEAT_EXPIRE)
 
 
 class Task(Element):
@@ -50,24 +93,27 @@ class Task(Element):
                     "result", "eta", "runtime",
                     "exception")
 
-    _defaults = dict(uuid=None,
-                     name=None,
-                     state=states.PENDING,
-                     received=False,
-                     started=False,
-                     succeeded=False,
-                     failed=False,
-                     retried=False,
-                     revoked=False,
-                     args=None,
-                     kwargs=None,
-                     eta=None,
-                     retries=None,
-                     worker=None,
-                     timestamp=None)
-
-    def __init__(self, **fields):
-        super(Task, self).__init__(**dict(self._defaults, **fields))
+    _fields = (("uuid", None),
+               ("name", None),
+               ("state", states.PENDING),
+               ("received", False),
+               ("started", False),
+               ("succeeded", False),
+               ("failed", False),
+               ("retried", False),
+               ("revoked", False),
+               ("args", None),
+               ("kwargs", None),
+               ("eta", None),
+               ("retries", None),
+               ("worker", None),
+               ("timestamp", None),
+               ("result", None),
+               ("runtime", None),
+               ("exception", None),
+               ("traceback", None),
+               ("visited", False))
+    __slots__ = tuple(key for key, _ in _fields)
 
     def info(self, fields=None, extra=[]):
         if fields is None:
@@ -118,7 +164,14 @@ class Task(Element):
 
 
 class State(object):
-    """Represents a snapshot of a clusters state."""
+    """Represents a snapshot of a clusters state.
+
+    Tasks are indexed by type, worker and state, so the ``tasks_by_*``
+    queries only touch the tasks returned.  The indexes are updated when
+    events are processed, and tasks are ordered by the time their last
+    event was received.
+
+    """
     event_count = 0
     task_count = 0
 
@@ -130,6 +183,21 @@ class State(object):
         self.group_handlers = {"worker": self.worker_event,
                                "task": self.task_event}
 
+        # The indexes are deques of ``(seq, uuid)`` entries, where
+        # ``seq`` is the sequence number of the event that put it there.
+        # Entries are only valid if ``seq`` is the sequence number of the
+        # tasks last event, the rest are skipped and eventually compacted.
+        self._seq = 0
+        self._task_seq = {}
+        self._task_keys = {}
+        self._tasks_by_time = deque()
+        self._tasks_by_type = {}
+        self._tasks_by_worker = {}
+        self._tasks_by_state = {}
+        self._indexes = ((self._tasks_by_type, {}),
+                         (self._tasks_by_worker, {}),
+                         (self._tasks_by_state, {}))
+
     def get_or_create_worker(self, hostname, **kwargs):
         """Get or create worker by hostname."""
         try:
@@ -142,13 +210,69 @@ class State(object):
 
     def get_or_create_task(self, uuid, **kwargs):
         """Get or create task by uuid."""
+        task = self._get_or_create_task(uuid, **kwargs)
+        self._index_task(task)
+        return task
+
+    def _get_or_create_task(self, uuid, **kwargs):
         try:
             task = self.tasks[uuid]
             task.update(kwargs)
         except KeyError:
-            task = self.tasks[uuid] = Task(uuid=uuid, **kwargs)
+            tasks = self.tasks
+            while len(tasks) >= tasks.limit:
+                self._unindex_task(tasks.popitem(last=False)[0])
+            task = tasks[uuid] = Task(uuid=uuid, **kwargs)
         return task
 
+    def _index_task(self, task):
+        """Move task to the front of the indexes, moving it to other
+        keys if the type, worker or state has changed."""
+        uuid = task.uuid
+        keys = (task.name, task.worker and task.worker.hostname, task.state)
+        old_keys = self._task_keys.get(uuid)
+        self._task_keys[uuid] = keys
+        self._seq += 1
+        seq = self._task_seq[uuid] = self._seq
+        entry = (seq, uuid)
+
+        self._tasks_by_time.append(entry)
+        self._maybe_compact(self._tasks_by_time, len(self.tasks))
+
+        for i, (index, counts) in enumerate(self._indexes):
+            key = keys[i]
+            if old_keys is None or old_keys[i] != key:
+                counts[key] = counts.get(key, 0) + 1
+                if old_keys is not None:
+                    self._decref(index, counts, old_keys[i])
+            try:
+                entries = index[key]
+            except KeyError:
+                entries = index[key] = deque()
+            entries.append(entry)
+            self._maybe_compact(entries, counts[key])
+
+    def _unindex_task(self, uuid):
+        self._task_seq.pop(uuid, None)
+        keys = self._task_keys.pop(uuid, None)
+        if keys is not None:
+            for i, (index, counts) in enumerate(self._indexes):
+                self._decref(index, counts, keys[i])
+
+    def _decref(self, index, counts, key):
+        counts[key] -= 1
+        if not counts[key]:
+            del(counts[key])
+            del(index[key])
+
+    def _maybe_compact(self, entries, live):
+        if len(entries) > live * 2 + 100:
+            task_seq = self._task_seq
+            valid = [(seq, uuid) for seq, uuid in entries
+                        if task_seq.get(uuid) == seq]
+            entries.clear()
+            entries.extend(valid)
+
     def worker_event(self, type, fields):
         """Process worker event."""
         hostname = fields.pop("hostname")
@@ -162,13 +286,14 @@ class State(object):
         uuid = fields.pop("uuid")
         hostname = fields.pop("hostname")
         worker = self.get_or_create_worker(hostname)
-        task = self.get_or_create_task(uuid)
+        task = self._get_or_create_task(uuid)
         handler = getattr(task, "on_%s" % type)
         if type == "received":
             self.task_count += 1
         if handler:
             handler(**fields)
         task.worker = worker
+        self._index_task(task)
 
     def event(self, event):
         """Process event."""
@@ -179,41 +304,59 @@ class State(object):
         if self.event_callback:
             self.event_callback(self, event)
 
-    def tasks_by_timestamp(self):
+    def _latest(self, entries, limit=None):
+        """Get the ``limit`` most recent tasks in an index."""
+        items = []
+        if not entries:
+            return items
+        task_seq = self._task_seq
+        tasks = self.tasks
+        for seq, uuid in reversed(entries):
+            if limit is not None and len(items) >= limit:
+                break
+            if task_seq.get(uuid) == seq:
+                items.append((uuid, tasks[uuid]))
+        return items
+
+    def tasks_by_timestamp(self, limit=None):
         """Get tasks by timestamp.
 
-        Returns a list of ``(uuid, task)`` tuples.
+        Returns a list of ``(uuid, task)`` tuples, most
+        recent first.
 
         """
-        return self._sort_tasks_by_time(self.tasks.items())
+        return self._latest(self._tasks_by_time, limit)
 
-    def _sort_tasks_by_time(self, tasks):
-        """Sort task items by time."""
-        return sorted(tasks, key=lambda t: t[1].timestamp, reverse=True)
-
-    def tasks_by_type(self, name):
+    def tasks_by_type(self, name, limit=None):
         """Get all tasks by type.
 
-        Returns a list of ``(uuid, task)`` tuples.
+        Returns a list of ``(uuid, task)`` tuples, most
+        recent first.
 
         """
-        return self._sort_tasks_by_time([(uuid, task)
-                for uuid, task in self.tasks.items()
-                    if task.name == name])
+        return self._latest(self._tasks_by_type.get(name), limit)
 
-    def tasks_by_worker(self, hostname):
+    def tasks_by_worker(self, hostname, limit=None):
         """Get all tasks by worker.
 
-        Returns a list of ``(uuid, task)`` tuples.
+        Returns a list of ``(uuid, task)`` tuples, most
+        recent first.
+
+        """
+        return self._latest(self._tasks_by_worker.get(hostname), limit)
+
+    def tasks_by_state(self, state, limit=None):
+        """Get all tasks by state.
+
+        Returns a list of ``(uuid, task)`` tuples, most
+        recent first.
 
         """
-        return self._sort_tasks_by_time([(uuid, task)
-                for uuid, task in self.tasks.items()
-                    if task.worker.hostname == hostname])
+        return self._latest(self._tasks_by_state.get(state), limit)
 
     def task_types(self):
         """Returns a list of all seen task types."""
-        return list(set(task.name for task in self.tasks.values()))
+        return self._tasks_by_type.keys()
 
     def alive_workers(self):
         """Returns a list of (seemingly) alive workers."""
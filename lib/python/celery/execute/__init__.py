@@ -1,7 +1,8 @@
 from celery import conf
+from celery.backends import default_backend
 from celery.datastructures import ExceptionInfo
 from celery.execute.trace import TaskTrace
-from celery.messaging import with_connection
+from celery.messaging import broker_pool, with_pooled_connection
 from celery.messaging import TaskPublisher
 from celery.registry import tasks
 from celery.result import AsyncResult, EagerResult
@@ -13,8 +14,37 @@ extract_exec_options = mattrgetter("queue", "routing_key", "exchange",
                                    "priority", "serializer",
                                    "delivery_mode")
 
+_router = None
+_router_config = None
 
-@with_connection
+
+def default_router():
+    """Get the :class:`~celery.routes.Router` used when no router
+    is passed to :func:`apply_async`.
+
+    The router, and so its route cache, is kept for the lifetime of the
+    process, and is recreated if the ``CELERY_ROUTES``,
+    ``CELERY_QUEUES`` or ``CELERY_CREATE_MISSING_QUEUES`` settings
+    change.
+
+    """
+    global _router, _router_config
+    queues = conf.QUEUES
+    config = _router_config
+    if config is None or conf.ROUTES is not config[0] \
+            or len(conf.ROUTES) != config[1] \
+            or conf.CREATE_MISSING_QUEUES != config[2] \
+            or queues != config[3]:
+        _router = Router(conf.ROUTES, conf.get_queues(),
+                         conf.CREATE_MISSING_QUEUES)
+        _router_config = (conf.ROUTES, len(conf.ROUTES),
+                          conf.CREATE_MISSING_QUEUES,
+                          dict((name, dict(options))
+                                for name, options in queues.items()))
+    return _router
+
+
+@with_pooled_connection
 def apply_async(task, args=None, kwargs=None, countdown=None, eta=None,
         task_id=None, publisher=None, connection=None, connect_timeout=None,
         router=None, **options):
@@ -39,7 +69,8 @@ def apply_async(task, args=None, kwargs=None, countdown=None, eta=None,
 
     :keyword connection: Re-use existing broker connection instead
       of establishing a new one. The ``connect_timeout`` argument is
-      not respected if this is set.
+      not respected if this is set. If not set, a connection is acquired
+      from :data:`celery.messaging.broker_pool`.
 
     :keyword connect_timeout: The timeout in seconds, before we give up
       on establishing a connection to the AMQP server.
@@ -79,31 +110,49 @@ def apply_async(task, args=None, kwargs=None, countdown=None, eta=None,
     replaced by a local :func:`apply` call instead.
 
     """
-    router = router or Router(conf.ROUTES, conf.get_queues(),
-                              conf.CREATE_MISSING_QUEUES)
+    router = router or default_router()
 
     if conf.ALWAYS_EAGER:
         return apply(task, args, kwargs, task_id=task_id)
 
     task = tasks[task.name] # get instance from registry
 
-    options = dict(extract_exec_options(task), **options)
-    options = router.route(options, task.name, args, kwargs)
+    options = route_task(task, args, kwargs, router, **options)
     exchange = options.get("exchange")
     exchange_type = options.get("exchange_type")
 
-    publish = publisher or task.get_publisher(connection, exchange=exchange,
-                                              exchange_type=exchange_type)
+    publish = publisher
+    if publish is None:
+        key = (getattr(task.get_publisher, "im_func", None),
+               exchange, exchange_type, task.routing_key)
+        create = lambda: task.get_publisher(connection, exchange=exchange,
+                                            exchange_type=exchange_type)
+        publish, release = broker_pool.acquire_publisher(connection,
+                                                         key, create)
     try:
         task_id = publish.delay_task(task.name, args, kwargs, task_id=task_id,
                                      countdown=countdown, eta=eta, **options)
     finally:
-        publisher or publish.close()
+        publisher or release()
 
     return task.AsyncResult(task_id)
 
 
-@with_connection
+def route_task(task, args, kwargs, router, **options):
+    """Get the execution options for a task, with the routing
+    options from ``router`` applied.
+
+    If the result backend of the task wants results sent to a reply
+    queue, the ``reply_to`` option is set too.
+
+    """
+    options = dict(extract_exec_options(task), **options)
+    if not task.ignore_result:
+        options.setdefault("reply_to", task.backend.reply_to)
+    return router.route(options, task.name, args, kwargs)
+
+
+@with_pooled_connection
 def send_task(name, args=None, kwargs=None, countdown=None, eta=None,
         task_id=None, publisher=None, connection=None, connect_timeout=None,
         result_cls=AsyncResult, **options):
@@ -119,14 +168,19 @@ def send_task(name, args=None, kwargs=None, countdown=None, eta=None,
     """
     exchange = options.get("exchange")
     exchange_type = options.get("exchange_type")
-
-    publish = publisher or TaskPublisher(connection, exchange=exchange,
-                                         exchange_type=exchange_type)
+    options.setdefault("reply_to", default_backend.reply_to)
+
+    publish = publisher
+    if publish is None:
+        create = lambda: TaskPublisher(connection, exchange=exchange,
+                                       exchange_type=exchange_type)
+        publish, release = broker_pool.acquire_publisher(connection,
+                (TaskPublisher, exchange, exchange_type, None), create)
     try:
         task_id = publish.delay_task(name, args, kwargs, task_id=task_id,
                                      countdown=countdown, eta=eta, **options)
     finally:
-        publisher or publish.close()
+        publisher or release()
 
     return result_cls(task_id)
 
@@ -3,11 +3,15 @@
 Sending and Receiving Messages
 
 """
+import os
+import time
+import select
 import socket
+import threading
 from datetime import datetime, timedelta
 from itertools import count
 
-from carrot.connection import BrokerConnection
+from carrot.connection import BrokerConnection, AMQPConnectionException
 from carrot.messaging import Publisher, Consumer, ConsumerSet as _ConsumerSet
 
 from celery import conf
@@ -54,7 +58,44 @@ class TaskPublisher(Publisher):
     def delay_task(self, task_name, task_args=None, task_kwargs=None,
             countdown=None, eta=None, task_id=None, taskset_id=None, **kwargs):
         """Delay task for execution by the celery nodes."""
+        message_data = self._task_message(task_name, task_args, task_kwargs,
+                                          countdown, eta, task_id, taskset_id,
+                                          **kwargs)
+        self.send(message_data, **extract_msg_options(kwargs))
+        signals.task_sent.send(sender=task_name, **message_data)
+
+        return message_data["id"]
+
+    def delay_task_many(self, tasks, channels=1):
+        """Delay many tasks at once.
+
+        All of the messages are serialized up front, and then
+        sent to the broker in bulk.
+
+        :param tasks: List of ``(task_name, task_args, task_kwargs,
+            options)`` tuples, where ``options`` is a dictionary of the
+            keyword arguments supported by :meth:`delay_task`.
+
+        :keyword channels: Number of channels to distribute the messages
+            over.
+
+        Returns the list of task ids.
 
+        """
+        messages = [(self._task_message(task_name, task_args, task_kwargs,
+                                        **options),
+                     extract_msg_options(options))
+                        for task_name, task_args, task_kwargs, options
+                            in tasks]
+        self.send_many(messages, channels=channels)
+
+        for message_data, _ in messages:
+            signals.task_sent.send(sender=message_data["task"],
+                                   **message_data)
+        return [message_data["id"] for message_data, _ in messages]
+
+    def _task_message(self, task_name, task_args=None, task_kwargs=None,
+            countdown=None, eta=None, task_id=None, taskset_id=None, **kwargs):
         task_id = task_id or gen_unique_id()
         task_args = task_args or []
         task_kwargs = task_kwargs or {}
@@ -77,11 +118,10 @@ class TaskPublisher(Publisher):
 
         if taskset_id:
             message_data["taskset"] = taskset_id
-
-        self.send(message_data, **extract_msg_options(kwargs))
-        signals.task_sent.send(sender=task_name, **message_data)
-
-        return task_id
+        reply_to = kwargs.get("reply_to")
+        if reply_to:
+            message_data["reply_to"] = reply_to
+        return message_data
 
 
 class ConsumerSet(_ConsumerSet):
@@ -252,6 +292,256 @@ def with_connection(fun):
     return _inner
 
 
+def with_pooled_connection(fun):
+    """Like :func:`with_connection`, but the default connection is
+    acquired from the process-wide :data:`broker_pool`, and released back
+    to it when the function returns.
+
+    If the function raises an exception the connection is discarded
+    instead, as it may have been left in an unusable state.
+
+    If a ``publisher`` keyword argument is passed, its connection is used
+    and the pool is not touched.
+
+    """
+    unpooled = with_connection(fun)
+
+    @wraps(fun)
+    def _inner(*args, **kwargs):
+        if kwargs.get("publisher") and not kwargs.get("connection"):
+            kwargs["connection"] = kwargs["publisher"].connection
+        if kwargs.get("connection") or not broker_pool.limit:
+            return unpooled(*args, **kwargs)
+
+        timeout = kwargs.get("connect_timeout", conf.BROKER_CONNECTION_TIMEOUT)
+        kwargs["connection"] = conn = broker_pool.acquire(
+                                            connect_timeout=timeout)
+        try:
+            retval = fun(*args, **kwargs)
+        except:
+            broker_pool.discard(conn)
+            raise
+        broker_pool.release(conn)
+        return retval
+
+    return _inner
+
+
+def connection_is_usable(connection):
+    """Check that a :class:`~carrot.connection.BrokerConnection`
+    kept idle can still be used.
+
+    A connection that has been closed is not usable, and neither is
+    an AMQP connection with data waiting on its socket: an idle
+    publishing connection doesn't expect anything from the broker, so
+    this is either end-of-file or the broker closing the connection.
+
+    """
+    if connection._closed:
+        return False
+    conn = connection._connection
+    if conn is None:
+        # Not connected yet, will connect on first use.
+        return True
+    if not hasattr(conn, "transport"):
+        return True
+    if conn.transport is None:
+        return False
+    sock = getattr(conn.transport, "sock", None)
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (select.error, socket.error, ValueError):
+        return False
+    return not readable
+
+
+#: Errors raised when closing a connection the broker has closed.
+CLOSE_ERRORS = (socket.error, IOError, AMQPConnectionException)
+
+
+class BrokerPool(object):
+    """Process-wide pool of broker connections, and of the
+    task publishers opened on them.
+
+    :keyword limit: Maximum number of idle connections kept in the pool.
+        Connections released when the pool is full are closed.
+        Defaults to the ``BROKER_POOL_LIMIT`` setting, a false value
+        disables the pool.
+
+        This does not limit the number of connections in use: a new
+        connection is always established when there are no idle ones,
+        so a process can have as many connections open as it has
+        threads sending tasks at the same time.
+
+    :keyword expires: Number of seconds a connection can be idle in the
+        pool before it is closed. Defaults to the ``BROKER_POOL_EXPIRES``
+        setting.
+
+    :keyword health_check: Function called with an idle connection before
+        it is reused, returning :const:`False` if the connection should be
+        closed instead. Defaults to :func:`connection_is_usable`.
+
+    The pool is fork-aware: a child process never reuses the connections
+    of its parent, but starts with an empty pool.
+
+    .. attribute:: hits
+
+        Number of times a connection was reused from the pool.
+
+    .. attribute:: misses
+
+        Number of times a new connection had to be established.
+
+    """
+    def __init__(self, limit=None, expires=None, health_check=None):
+        if limit is None:
+            limit = conf.BROKER_POOL_LIMIT
+        if expires is None:
+            expires = conf.BROKER_POOL_EXPIRES
+        self.limit = limit
+        self.expires = expires
+        self.health_check = health_check or connection_is_usable
+        self.mutex = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []     # (released_at, connection), most recent last.
+        self.hits = 0
+        self.misses = 0
+
+    def _check_pid(self):
+        if os.getpid() != self._pid:
+            # The sockets are shared with the parent process, so
+            # closing them here would close the parent's connections.
+            self._reset()
+
+    def acquire(self, connect_timeout=None):
+        """Get a connection from the pool, or establish a new one
+        if there are no usable idle connections."""
+        self.mutex.acquire()
+        try:
+            self._check_pid()
+            expired = self._pop_expired(time.time())
+            connection = None
+            while self._idle:
+                _, candidate = self._idle.pop()
+                if self.health_check(candidate):
+                    connection = candidate
+                    break
+                expired.append(candidate)
+            if connection is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        finally:
+            self.mutex.release()
+
+        self._close_all(expired)
+        if connection is None:
+            connection = establish_connection(connect_timeout=connect_timeout)
+            connection._pool_pid = self._pid
+            connection._pool_publishers = {}
+        return connection
+
+    def release(self, connection):
+        """Return a connection acquired with :meth:`acquire`
+        to the pool."""
+        self.mutex.acquire()
+        try:
+            self._check_pid()
+            if getattr(connection, "_pool_pid", None) != self._pid:
+                # Acquired before a fork, belongs to the parent.
+                return
+            expired = self._pop_expired(time.time())
+            if len(self._idle) < self.limit:
+                self._idle.append((time.time(), connection))
+            else:
+                expired.append(connection)
+        finally:
+            self.mutex.release()
+        self._close_all(expired)
+
+    def discard(self, connection):
+        """Close a connection acquired with :meth:`acquire`
+        instead of returning it to the pool."""
+        if getattr(connection, "_pool_pid", None) == os.getpid():
+            self._close_all([connection])
+
+    def acquire_publisher(self, connection, key, create):
+        """Get a publisher for ``connection``.
+
+        If the connection belongs to the pool, the publisher (and so its
+        channel) is created once using ``create`` and then cached on the
+        connection under ``key``, and the returned release function
+        does nothing. Otherwise a new publisher is created and the
+        release function closes it.
+
+        Returns a ``(publisher, release)`` tuple.
+
+        """
+        publishers = getattr(connection, "_pool_publishers", None)
+        if publishers is None:
+            publisher = create()
+            return publisher, publisher.close
+        publisher = publishers.get(key)
+        if publisher is None:
+            publisher = publishers[key] = create()
+        return publisher, noop
+
+    def clear(self):
+        """Close all idle connections in the pool."""
+        self.mutex.acquire()
+        try:
+            self._check_pid()
+            idle, self._idle = self._idle, []
+        finally:
+            self.mutex.release()
+        self._close_all([connection for _, connection in idle])
+
+    def _pop_expired(self, now):
+        if not self.expires:
+            return []
+        idle = self._idle
+        cutoff = now - self.expires
+        for i, (released_at, _) in enumerate(idle):
+            if released_at > cutoff:
+                break
+        else:
+            i = len(idle)
+        expired, self._idle = idle[:i], idle[i:]
+        return [connection for _, connection in expired]
+
+    def _close_all(self, connections):
+        # The connections may have been closed by the broker already,
+        # so errors closing them are ignored.
+        for connection in connections:
+            publishers = getattr(connection, "_pool_publishers", None) or {}
+            for publisher in publishers.values():
+                try:
+                    publisher.close()
+                except CLOSE_ERRORS:
+                    pass
+            publishers.clear()
+            try:
+                connection.close()
+            except CLOSE_ERRORS:
+                pass
+
+    def __len__(self):
+        return len(self._idle)
+
+    @property
+    def stats(self):
+        """Dictionary with the pool counters."""
+        return {"hits": self.hits, "misses": self.misses,
+                "idle": len(self._idle)}
+
+broker_pool = BrokerPool()
+
+
 def get_consumer_set(connection, queues=None, **options):
     """Get the :class:`carrot.messaging.ConsumerSet`` for a queue
     configuration.
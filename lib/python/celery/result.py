@@ -2,7 +2,6 @@ from __future__ import generators
 
 import time
 
-from copy import copy
 from itertools import imap
 
 from celery import states
@@ -148,6 +147,15 @@ class BaseAsyncResult(object):
         return self.backend.get_status(self.task_id)
 
 
+def _reads_backend(result):
+    """Returns ``True`` if the status and result of ``result``
+    is read from its backend, so it can be fetched in bulk."""
+    cls = result.__class__
+    return getattr(result, "backend", None) is not None and \
+            cls.status is BaseAsyncResult.status and \
+            cls.result is BaseAsyncResult.result
+
+
 class AsyncResult(BaseAsyncResult):
     """Pending task result using the default backend.
 
@@ -259,29 +267,88 @@ class TaskSetResult(object):
         """``iter(res)`` -> ``res.iterate()``."""
         return self.iterate()
 
-    def iterate(self):
+    def _iter_ready(self, timeout=None, **options):
+        """Yields ``(task_id, status, result)`` tuples for the subtasks
+        as they become ready.
+
+        Subtasks sharing a backend are waited for using a single call
+        to the backends :meth:`~celery.backends.base.BaseBackend.get_many`,
+        so the status of all the pending subtasks is fetched in one
+        request, or pushed to us by backends supporting it.
+
+        Results overriding :attr:`~BaseAsyncResult.status` or
+        :attr:`~BaseAsyncResult.result` (like :class:`EagerResult`)
+        are polled one by one using those attributes instead.
+
+        """
+        time_start = time.time()
+        by_backend = {}
+        backends = []
+        custom = []
+        for subtask in self.subtasks:
+            if not _reads_backend(subtask):
+                custom.append(subtask)
+                continue
+            backend = subtask.backend
+            if id(backend) not in by_backend:
+                by_backend[id(backend)] = []
+                backends.append(backend)
+            by_backend[id(backend)].append(subtask.task_id)
+
+        for ready in self._poll_subtasks(custom, time_start, timeout,
+                                         **options):
+            yield ready
+
+        for backend in backends:
+            remaining = None
+            if timeout is not None:
+                remaining = max(time_start + timeout - time.time(), 0)
+            for task_id, meta in backend.get_many(by_backend[id(backend)],
+                                                  timeout=remaining,
+                                                  **options):
+                result = meta["result"]
+                if meta["status"] in backend.EXCEPTION_STATES:
+                    result = backend.exception_to_python(result)
+                yield task_id, meta["status"], result
+
+    def _poll_subtasks(self, subtasks, time_start, timeout=None,
+            interval=0.1, max_interval=2.0, backoff=2):
+        """Yields ``(task_id, status, result)`` tuples for the subtasks
+        as they become ready, checking every subtask in turn."""
+        pending = list(subtasks)
+        while pending:
+            for subtask in list(pending):
+                if subtask.ready():
+                    pending.remove(subtask)
+                    yield subtask.task_id, subtask.status, subtask.result
+            if not pending:
+                break
+            if timeout is not None:
+                remaining = time_start + timeout - time.time()
+                if remaining <= 0:
+                    raise TimeoutError("The operation timed out.")
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(interval * backoff, max_interval)
+
+    def iterate(self, timeout=None, **options):
         """Iterate over the return values of the tasks as they finish
         one by one.
 
+        :keyword timeout: The time in seconds, how long
+            it will wait for results, before the operation times out.
+
+        See :meth:`join` for the polling options supported.
+
         :raises: The exception if any of the tasks raised an exception.
 
         """
-        pending = list(self.subtasks)
-        results = dict((subtask.task_id, copy(subtask))
-                            for subtask in self.subtasks)
-        while pending:
-            for task_id in pending:
-                result = results[task_id]
-                if result.status == states.SUCCESS:
-                    try:
-                        pending.remove(task_id)
-                    except ValueError:
-                        pass
-                    yield result.result
-                elif result.status in states.PROPAGATE_STATES:
-                    raise result.result
-
-    def join(self, timeout=None):
+        for task_id, status, result in self._iter_ready(timeout, **options):
+            if status in states.PROPAGATE_STATES:
+                raise result
+            yield result
+
+    def join(self, timeout=None, callback=None, **options):
         """Gather the results for all of the tasks in the taskset,
         and return a list with them ordered by the order of which they
         were called.
@@ -289,6 +356,21 @@ class TaskSetResult(object):
         :keyword timeout: The time in seconds, how long
             it will wait for results, before the operation times out.
 
+        :keyword callback: Optional callback called with
+            ``(task_id, result)`` for every result as soon as it arrives.
+
+        :keyword interval: Time in seconds to wait between polling
+            the result backend. Default is 0.1 seconds.
+
+        :keyword max_interval: Maximum time in seconds to wait between
+            polling the result backend. Default is 2 seconds.
+
+        :keyword backoff: Factor to multiply the polling interval by
+            after every round. Default is 2.
+
+        The polling options are ignored by backends pushing results to
+        the client (like the AMQP backend).
+
         :raises celery.exceptions.TimeoutError: if ``timeout`` is not ``None``
             and the operation takes longer than ``timeout`` seconds.
 
@@ -298,28 +380,21 @@ class TaskSetResult(object):
         :returns: list of return values for all tasks in the taskset.
 
         """
-
-        time_start = time.time()
-
-        def on_timeout():
-            raise TimeoutError("The operation timed out.")
+        positions = {}
+        for position, subtask in enumerate(self.subtasks):
+            positions.setdefault(subtask.task_id, []).append(position)
 
         results = PositionQueue(length=self.total)
-
-        while True:
-            for position, pending_result in enumerate(self.subtasks):
-                if pending_result.status == states.SUCCESS:
-                    results[position] = pending_result.result
-                elif pending_result.status in states.PROPAGATE_STATES:
-                    raise pending_result.result
-            if results.full():
-                # Make list copy, so the returned type is not a position
-                # queue.
-                return list(results)
-            else:
-                if timeout is not None and \
-                        time.time() >= time_start + timeout:
-                    on_timeout()
+        for task_id, status, result in self._iter_ready(timeout, **options):
+            if status in states.PROPAGATE_STATES:
+                raise result
+            for position in positions[task_id]:
+                results[position] = result
+            if callback is not None:
+                callback(task_id, result)
+
+        # Make list copy, so the returned type is not a position queue.
+        return list(results)
 
     def save(self, backend=default_backend):
         """Save taskset result for later retrieval using :meth:`restore`.
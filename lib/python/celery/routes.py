@@ -1,12 +1,20 @@
 from celery.exceptions import QueueNotFound
-from celery.utils import instantiate, firstmethod, mpromise
+from celery.utils import instantiate, firstmethod, mpromise, promise
 
 _first_route = firstmethod("route_for_task")
 
+# Cached for task names not routed by any of the static routers.
+_NOT_STATIC = object()
+
 
 class MapRoute(object):
     """Makes a router out of a :class:`dict`."""
 
+    #: The route returned for a task depends only on the task name.
+    #: Routers setting this are consulted once per task name by
+    #: :class:`Router`, and their answer is cached.
+    static = True
+
     def __init__(self, map):
         self.map = map
 
@@ -17,6 +25,18 @@ class MapRoute(object):
 
 
 class Router(object):
+    """Routes tasks to queues.
+
+    The leading routers in ``routes`` that are declared static (see
+    :attr:`MapRoute.static`) are only consulted the first time a task
+    name is routed; the expanded route is then cached by task name.
+    Consecutive :class:`MapRoute` instances among them are merged into
+    a single dictionary lookup.
+
+    The cache assumes ``queues`` does not change, apart from queues
+    added by :meth:`add_queue`.
+
+    """
 
     def __init__(self, routes=None, queues=None, create_missing=False):
         if queues is None:
@@ -26,6 +46,24 @@ class Router(object):
         self.queues = queues
         self.routes = routes
         self.create_missing = create_missing
+        self._static, self._dynamic = self._compile(routes)
+        self._route_cache = {}
+        self._queue_cache = {}
+
+    def _compile(self, routes):
+        static = []
+        for i, route in enumerate(routes):
+            if isinstance(route, promise) or \
+                    not getattr(route, "static", False):
+                return static, list(routes[i:])
+            if static and isinstance(route, MapRoute) \
+                    and isinstance(static[-1], MapRoute):
+                merged = dict(route.map)
+                merged.update(static[-1].map) # the first route wins.
+                static[-1] = MapRoute(merged)
+            else:
+                static.append(route)
+        return static, []
 
     def add_queue(self, queue):
         q = self.queues[queue] = {"binding_key": queue,
@@ -38,12 +76,30 @@ class Router(object):
         # Expand "queue" keys in options.
         options = self.expand_destination(options)
         if self.routes:
-            route = self.lookup_route(task, args, kwargs)
+            route = self._lookup_expanded(task, args, kwargs)
             if route:
-                # Also expand "queue" keys in route.
-                return dict(options, **self.expand_destination(route))
+                return dict(options, **route)
         return options
 
+    def _lookup_expanded(self, task, args, kwargs):
+        """Look up the route for a task, with "queue" keys expanded."""
+        try:
+            route = self._route_cache[task]
+        except KeyError:
+            route = self._route_cache[task] = self._lookup_static(task,
+                                                                  args, kwargs)
+        if route is not _NOT_STATIC:
+            return route
+
+        route = _first_route(self._dynamic, task, args, kwargs)
+        return route and self.expand_destination(route)
+
+    def _lookup_static(self, task, args, kwargs):
+        route = _first_route(self._static, task, args, kwargs)
+        if route is None and self._dynamic:
+            return _NOT_STATIC
+        return route and self.expand_destination(route)
+
     def expand_destination(self, route):
         # The route can simply be a queue name,
         # this is convenient for direct exchanges.
@@ -55,19 +111,27 @@ class Router(object):
             queue = route.pop("queue", None)
 
         if queue:
-            try:
-                dest = dict(self.queues[queue])
-            except KeyError:
-                if self.create_missing:
-                    dest = self.add_queue(queue)
-                else:
-                    raise QueueNotFound(
-                        "Queue '%s' is not defined in CELERY_QUEUES" % queue)
-            dest.setdefault("routing_key", dest.get("binding_key"))
-            return dict(dest, **route)
+            return dict(self._expand_queue(queue), **route)
 
         return route
 
+    def _expand_queue(self, queue):
+        try:
+            return self._queue_cache[queue]
+        except KeyError:
+            pass
+        try:
+            dest = dict(self.queues[queue])
+        except KeyError:
+            if self.create_missing:
+                dest = dict(self.add_queue(queue))
+            else:
+                raise QueueNotFound(
+                    "Queue '%s' is not defined in CELERY_QUEUES" % queue)
+        dest.setdefault("routing_key", dest.get("binding_key"))
+        self._queue_cache[queue] = dest
+        return dest
+
     def lookup_route(self, task, args=None, kwargs=None):
         return _first_route(self.routes, task, args, kwargs)
 
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from pyparsing import (Word, Literal, ZeroOrMore, Optional,
                        Group, StringEnd, alphas)
 
@@ -210,17 +210,50 @@ class crontab(schedule):
         self.day_of_week = self._expand_cronspec(day_of_week, 7)
         self.nowfun = nowfun
 
+    def next_run_at(self, after):
+        """Returns the start of the first minute after the minute of
+        ``after`` that the crontab triggers in, or :const:`None` if the
+        crontab never triggers."""
+        start = after.replace(second=0, microsecond=0) + \
+                    timedelta(minutes=1)
+        hours, minutes = sorted(self.hour), sorted(self.minute)
+        for days in xrange(8):
+            day = start + timedelta(days=days)
+            if day.isoweekday() % 7 not in self.day_of_week:
+                continue
+            for hour in hours:
+                if not days and hour < start.hour:
+                    continue
+                for minute in minutes:
+                    if not days and hour == start.hour and \
+                            minute < start.minute:
+                        continue
+                    return day.replace(hour=hour, minute=minute)
+
     def remaining_estimate(self, last_run_at):
-        # remaining_estimate controls the frequency of scheduler
-        # ticks. The scheduler needs to wake up every second in this case.
-        return 1
+        """Returns when the periodic task should run next as a timedelta,
+        or :const:`None` if it never runs.
 
-    def is_due(self, last_run_at):
+        This is negative if the task should have run in the current
+        minute, but has not yet.  Runs missed in earlier minutes are
+        skipped, like with :manpage:`cron`.
+
+        """
         now = self.nowfun()
-        last = now - last_run_at
-        due, when = False, 1
-        if last.days > 0 or last.seconds > 60:
-            due = (now.isoweekday() % 7 in self.day_of_week and
-                   now.hour in self.hour and
-                   now.minute in self.minute)
-        return due, when
+        next_run_at = self.next_run_at(max(last_run_at,
+                                           now - timedelta(minutes=1)))
+        if next_run_at is not None:
+            return next_run_at - now
+
+    def is_due(self, last_run_at):
+        """Returns tuple of two items ``(is_due, next_time_to_run)``,
+        where next time to run is the exact number of seconds until the
+        crontab triggers again, or :const:`None` if it never triggers."""
+        rem_delta = self.remaining_estimate(last_run_at)
+        if rem_delta is None:
+            return False, None
+        rem = timedelta_seconds(rem_delta)
+        if rem == 0:
+            now = self.nowfun()
+            return True, timedelta_seconds(self.next_run_at(now) - now)
+        return False, rem
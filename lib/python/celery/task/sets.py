@@ -5,7 +5,8 @@ from UserList import UserList
 from celery import conf
 from celery import registry
 from celery.datastructures import AttributeDict
-from celery.messaging import with_connection
+from celery.execute import default_router, route_task
+from celery.messaging import broker_pool, with_pooled_connection
 from celery.messaging import TaskPublisher
 from celery.result import TaskSetResult
 from celery.utils import gen_unique_id
@@ -144,13 +145,20 @@ class TaskSet(UserList):
         self.data = list(tasks)
         self.total = len(self.tasks)
 
-    @with_connection
+    @with_pooled_connection
     def apply_async(self, connection=None,
-            connect_timeout=conf.BROKER_CONNECTION_TIMEOUT):
+            connect_timeout=conf.BROKER_CONNECTION_TIMEOUT, bulk=False,
+            channels=1):
         """Run all tasks in the taskset.
 
         Returns a :class:`celery.result.TaskSetResult` instance.
 
+        :keyword bulk: If enabled, the messages for all of the subtasks are
+            serialized up front and then sent to the broker in bulk,
+            instead of applying the subtasks one by one.
+        :keyword channels: Number of channels to distribute the messages
+            over when ``bulk`` is enabled.
+
         Example
 
             >>> ts = TaskSet(tasks=(
@@ -180,16 +188,34 @@ class TaskSet(UserList):
             return self.apply()
 
         taskset_id = gen_unique_id()
-        publisher = TaskPublisher(connection=connection)
+        publisher, release = broker_pool.acquire_publisher(connection,
+                (TaskPublisher, None, None, None),
+                lambda: TaskPublisher(connection=connection))
         try:
-            results = [task.apply_async(taskset_id=taskset_id,
-                                        publisher=publisher)
-                            for task in self.tasks]
+            if bulk:
+                results = self._apply_bulk(taskset_id, publisher, channels)
+            else:
+                results = [task.apply_async(taskset_id=taskset_id,
+                                            publisher=publisher)
+                                for task in self.tasks]
         finally:
-            publisher.close()
+            release()
 
         return TaskSetResult(taskset_id, results)
 
+    def _apply_bulk(self, taskset_id, publisher, channels=1):
+        router = default_router()
+        task_types = [task.get_type() for task in self.tasks]
+        requests = []
+        for task_type, task in zip(task_types, self.tasks):
+            options = dict(task.options, taskset_id=taskset_id)
+            requests.append((task_type.name, task.args, task.kwargs,
+                             route_task(task_type, task.args, task.kwargs,
+                                        router, **options)))
+        task_ids = publisher.delay_task_many(requests, channels=channels)
+        return [task_type.AsyncResult(task_id)
+                    for task_type, task_id in zip(task_types, task_ids)]
+
     def apply(self):
         """Applies the taskset locally."""
         taskset_id = gen_unique_id()
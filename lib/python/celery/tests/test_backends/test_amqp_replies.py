@@ -0,0 +1,312 @@
+import socket
+import threading
+import time
+import unittest2 as unittest
+
+from celery import conf
+from celery import states
+from celery.backends import amqp
+from celery.backends.amqp import AMQPBackend, ReplyDemultiplexer
+from celery.exceptions import TimeoutError, TaskRevokedError
+from celery.task.base import Task
+from celery.utils import gen_unique_id
+from celery.worker.job import TaskRequest
+from celery.worker.state import revoked
+
+
+class MockConsumer(object):
+    exchange = "celeryresults"
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class MockConnection(object):
+
+    def __init__(self):
+        self.replies = []
+        self.mutex = threading.Lock()
+        self.drains = 0
+
+    def reply(self, task_id, status=states.SUCCESS, result=None):
+        self.mutex.acquire()
+        try:
+            self.replies.append({"task_id": task_id, "status": status,
+                                 "result": result, "traceback": None})
+        finally:
+            self.mutex.release()
+
+    def drain_events(self, timeout=None):
+        self.drains += 1
+        deadline = timeout is not None and time.time() + timeout
+        while True:
+            self.mutex.acquire()
+            try:
+                if self.replies:
+                    meta = self.replies.pop(0)
+                    break
+            finally:
+                self.mutex.release()
+            if deadline and time.time() > deadline:
+                raise socket.timeout()
+            time.sleep(0.001)
+        self.demux._on_reply(meta, None)
+
+    def close(self):
+        pass
+
+
+class MockAMQPConnection(object):
+
+    class MockTransport(object):
+
+        def __init__(self, sock):
+            self.sock = sock
+
+    def __init__(self, sock):
+        self.transport = self.MockTransport(sock)
+        self.channels = {}
+
+
+class MockDemultiplexer(ReplyDemultiplexer):
+
+    def create_consumer(self):
+        self.connection.demux = self
+        return MockConsumer()
+
+
+class MockPublisher(object):
+    exchange = "celeryresults"
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message_data, routing_key=None):
+        self.sent.append((message_data, routing_key))
+
+
+class ReplyTask(Task):
+    name = "c.unittest.test_amqp_replies.ReplyTask"
+
+    def run(self):
+        pass
+
+
+def create_backend():
+    backend = AMQPBackend(serializer="pickle", persistent=False,
+                          reply_queue=True)
+    backend._replies = MockDemultiplexer(backend, MockConnection())
+    return backend
+
+
+class TestReplyDemultiplexer(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = create_backend()
+        self.replies = self.backend._replies
+        self.connection = self.replies.connection
+
+    def test_reply_to(self):
+        self.assertTrue(self.replies.queue.startswith("celeryreply."))
+        self.assertEqual(self.backend.reply_to,
+                         {"exchange": "celeryresults",
+                          "routing_key": self.replies.queue})
+        self.assertIsNone(AMQPBackend(reply_queue=False).reply_to)
+
+    def test_wait(self):
+        a, b = gen_unique_id(), gen_unique_id()
+        self.connection.reply(b, result=2)
+        self.connection.reply(a, status=states.STARTED)
+        self.connection.reply(a, result=1)
+        self.assertEqual(self.replies.wait(a)["result"], 1)
+        drains = self.connection.drains
+        self.assertEqual(self.replies.wait(b)["result"], 2)
+        self.assertEqual(self.connection.drains, drains)
+
+    def test_wait_timeout(self):
+        self.assertRaises(socket.timeout, self.replies.wait,
+                          gen_unique_id(), timeout=0.05)
+        self.assertRaises(TimeoutError, self.backend.wait_for,
+                          gen_unique_id(), timeout=0.05)
+
+    def test_concurrent_waits(self):
+        task_ids = [gen_unique_id() for i in range(5)]
+        results = {}
+
+        def wait(task_id):
+            results[task_id] = self.replies.wait(task_id,
+                                                 timeout=5)["result"]
+
+        threads = [threading.Thread(target=wait, args=(task_id, ))
+                        for task_id in task_ids]
+        for thread in threads:
+            thread.start()
+        for i, task_id in enumerate(reversed(task_ids)):
+            time.sleep(0.01)
+            self.connection.reply(task_id, result=i)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, dict((task_id, i)
+                            for i, task_id in enumerate(reversed(task_ids))))
+
+    def test_get_many(self):
+        task_ids = [gen_unique_id() for i in range(3)]
+        for task_id in task_ids:
+            self.connection.reply(task_id, result=task_id)
+        self.assertEqual(dict(self.backend.get_many(task_ids, timeout=1)),
+                         dict((task_id, self.backend._cache[task_id])
+                                for task_id in task_ids))
+
+    def test_get_task_meta(self):
+        task_id = gen_unique_id()
+        self.assertEqual(self.backend.get_status(task_id), states.PENDING)
+        self.connection.reply(task_id, result=42)
+        self.assertEqual(self.backend.get_status(task_id), states.SUCCESS)
+        self.assertEqual(self.backend.get_result(task_id), 42)
+
+    def test_get_task_meta_many(self):
+        task_ids = [gen_unique_id() for i in range(3)]
+        self.connection.reply(task_ids[0], result=0)
+        self.connection.reply(task_ids[1], status=states.STARTED)
+        self.backend.poll = None # must not declare queues for tasks
+        metas = self.backend.get_task_meta_many(task_ids)
+        self.assertListEqual([metas[task_id]["status"]
+                                for task_id in task_ids],
+                             [states.SUCCESS, states.STARTED, states.PENDING])
+        self.assertEqual(metas[task_ids[0]]["result"], 0)
+        self.assertIn(task_ids[0], self.backend._cache)
+        self.assertNotIn(task_ids[0], self.replies.pending)
+        self.assertIn(task_ids[1], self.replies.pending)
+
+    def test_pending_not_evicted(self):
+        self.backend._cache.limit = 2
+        task_id = gen_unique_id()
+        self.connection.reply(task_id, result=42)
+        for i in range(5):
+            self.connection.reply(gen_unique_id(), result=i)
+        self.replies.collect()
+        self.assertEqual(len(self.replies.pending), 6)
+        self.assertEqual(self.replies.wait(task_id, timeout=1)["result"], 42)
+        self.assertNotIn(task_id, self.replies.pending)
+        self.assertEqual(self.backend.get_result(task_id), 42)
+
+    def test_pending_limit(self):
+        self.replies.pending_limit = 3
+        waited, started, done = [gen_unique_id() for i in range(3)]
+        self.connection.reply(waited, result=1)
+        self.connection.reply(started, status=states.STARTED)
+        self.connection.reply(done, result=2)
+        self.replies._add_waiters([waited])
+        try:
+            for i in range(2):
+                self.connection.reply(gen_unique_id(), result=i)
+            self.replies.collect()
+            self.assertEqual(len(self.replies.pending), 3)
+            # the reply waited for is kept, unready states go first.
+            self.assertIn(waited, self.replies.pending)
+            self.assertNotIn(started, self.replies.pending)
+            self.assertNotIn(done, self.replies.pending)
+        finally:
+            self.replies._remove_waiters([waited])
+        self.assertFalse(self.replies._waiters)
+        self.assertEqual(self.replies.wait(waited, timeout=1)["result"], 1)
+
+    def test_waiters_removed(self):
+        task_ids = [gen_unique_id() for i in range(2)]
+        self.assertRaises(socket.timeout, list,
+                          self.replies.wait_many(task_ids, timeout=0.05))
+        self.assertRaises(socket.timeout, self.replies.wait,
+                          task_ids[0], timeout=0.05)
+        self.assertFalse(self.replies._waiters)
+
+    def test_collect_does_not_wait(self):
+        socks = socket.socketpair()
+        try:
+            self.connection.connection = MockAMQPConnection(socks[0])
+            time_start = time.time()
+            self.replies.collect()
+            self.assertLess(time.time() - time_start,
+                            self.replies.poll_timeout)
+            self.assertEqual(self.connection.drains, 0)
+
+            task_id = gen_unique_id()
+            socks[1].send("x")
+            self.connection.reply(task_id, result=1)
+            self.replies.collect()
+            self.assertIn(task_id, self.replies.pending)
+        finally:
+            for sock in socks:
+                sock.close()
+
+    def test_replies_created_once(self):
+        backend = AMQPBackend(reply_queue=True)
+        created = []
+
+        def create(*args):
+            time.sleep(0.05)
+            created.append(MockDemultiplexer(backend, MockConnection()))
+            return created[-1]
+
+        prev = amqp.ReplyDemultiplexer
+        prev_establish = amqp.establish_connection
+        amqp.ReplyDemultiplexer = create
+        amqp.establish_connection = lambda: None
+        try:
+            threads = [threading.Thread(target=lambda: backend.replies)
+                            for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+        finally:
+            amqp.ReplyDemultiplexer = prev
+            amqp.establish_connection = prev_establish
+        self.assertEqual(len(created), 1)
+        self.assertIs(backend._replies, created[0])
+
+    def test_reply_queue_setting(self):
+        prev = conf.RESULT_REPLY_QUEUE
+        conf.RESULT_REPLY_QUEUE = True
+        try:
+            backend = AMQPBackend()
+            self.assertTrue(backend.reply_queue)
+            # disabled by celeryd and celerybeat at startup.
+            conf.RESULT_REPLY_QUEUE = False
+            self.assertFalse(backend.reply_queue)
+            self.assertIsNone(backend.reply_to)
+        finally:
+            conf.RESULT_REPLY_QUEUE = prev
+
+    def test_store_result_with_reply_to(self):
+        publisher = self.backend._reply_publisher = MockPublisher()
+        task_id = gen_unique_id()
+        for i in range(2):
+            self.backend.mark_as_done(task_id, i,
+                                      reply_to=self.backend.reply_to)
+        self.assertIs(self.backend._reply_publisher, publisher)
+        self.assertEqual([(meta["result"], routing_key)
+                            for meta, routing_key in publisher.sent],
+                         [(0, self.replies.queue), (1, self.replies.queue)])
+
+    def test_close(self):
+        self.backend.close()
+        self.assertTrue(self.replies.consumer.closed)
+        self.assertIsNone(self.backend._replies)
+
+    def test_revoke(self):
+        publisher = self.backend._reply_publisher = MockPublisher()
+        ReplyTask.backend = self.backend
+        try:
+            tw = TaskRequest(ReplyTask.name, gen_unique_id(), [], {},
+                    delivery_info={"reply_to": self.backend.reply_to})
+            revoked.add(tw.task_id)
+            self.assertTrue(tw.revoked())
+        finally:
+            del(ReplyTask.backend)
+        meta, routing_key = publisher.sent[0]
+        self.assertEqual(routing_key, self.replies.queue)
+        self.assertEqual(meta["status"], states.REVOKED)
+        self.connection.replies.append(meta)
+        self.assertRaises(TaskRevokedError, self.backend.wait_for,
+                          tw.task_id, timeout=1)
@@ -10,6 +10,7 @@ from celery.serialization import get_pickleable_exception as gpe
 from celery import states
 from celery.backends.base import BaseBackend, KeyValueStoreBackend
 from celery.backends.base import BaseDictBackend
+from celery.exceptions import TimeoutError
 from celery.utils import gen_unique_id
 
 
@@ -116,6 +117,53 @@ class KVBackend(KeyValueStoreBackend):
         self.db[key] = value
 
 
+class MultiGetKVBackend(KVBackend):
+
+    def __init__(self, *args, **kwargs):
+        super(MultiGetKVBackend, self).__init__(*args, **kwargs)
+        self.mget_calls = []
+
+    def mget(self, keys):
+        self.mget_calls.append(len(keys))
+        return [self.db.get(key) for key in keys]
+
+
+class test_KeyValueStoreBackend_get_many(unittest.TestCase):
+
+    def test_get_task_meta_many(self):
+        b = MultiGetKVBackend()
+        b.mark_as_done("done", 42)
+        b.mark_as_failure("failed", KeyError("foo"))
+        b.mark_as_retry("retry", KeyError("bar"))
+
+        ids = ["done", "failed", "retry", "pending"]
+        metas = b.get_task_meta_many(ids)
+        self.assertEqual(b.mget_calls, [4])
+        self.assertEqual(metas["done"]["result"], 42)
+        self.assertEqual(metas["failed"]["status"], states.FAILURE)
+        self.assertEqual(metas["retry"]["status"], states.RETRY)
+        self.assertEqual(metas["pending"]["status"], states.PENDING)
+
+        # ready states are cached locally.
+        b.get_task_meta_many(ids)
+        self.assertEqual(b.mget_calls, [4, 2])
+
+    def test_get_many(self):
+        b = MultiGetKVBackend()
+        b.mark_as_done("done", 42)
+        self.assertListEqual(list(b.get_many(["done"])),
+                             [("done", b.get_task_meta("done"))])
+        self.assertRaises(TimeoutError, list,
+                          b.get_many(["done", "pending"], timeout=0.01))
+
+    def test_wait_for(self):
+        b = MultiGetKVBackend()
+        b.mark_as_done("done", 42)
+        self.assertEqual(b.wait_for("done"), 42)
+        self.assertRaises(TimeoutError, b.wait_for, "pending",
+                          timeout=0.05, interval=0.01)
+
+
 class DictBackend(BaseDictBackend):
 
     def _save_taskset(self, taskset_id, result):
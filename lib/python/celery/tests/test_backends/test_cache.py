@@ -53,6 +53,21 @@ class test_CacheBackend(unittest.TestCase):
         self.assertEqual(tb.get_status(tid3), states.FAILURE)
         self.assertIsInstance(tb.get_result(tid3), KeyError)
 
+    def test_get_many(self):
+        tb = CacheBackend(backend="memory://")
+
+        tids = [gen_unique_id() for i in xrange(10)]
+        for i, tid in enumerate(tids):
+            tb.mark_as_done(tid, i)
+        pending = gen_unique_id()
+
+        metas = tb.get_task_meta_many(tids + [pending])
+        self.assertEqual(metas[pending]["status"], states.PENDING)
+        self.assertListEqual([metas[tid]["result"] for tid in tids],
+                             range(10))
+        self.assertDictEqual(dict(tb.get_many(tids)),
+                             dict((tid, metas[tid]) for tid in tids))
+
     def test_process_cleanup(self):
         tb = CacheBackend(backend="memory://")
         tb.process_cleanup()
@@ -1,3 +1,4 @@
+import time
 import unittest2 as unittest
 
 from datetime import datetime
@@ -8,7 +9,16 @@ from celery import conf
 from celery import states
 from celery.db.models import Task, TaskSet
 from celery.utils import gen_unique_id
-from celery.backends.database import DatabaseBackend
+from celery.backends.database import DatabaseBackend, ResultFlusher
+
+
+class MockLogger(object):
+
+    def __init__(self):
+        self.errors = []
+
+    def error(self, msg):
+        self.errors.append(msg)
 
 
 class SomeClass(object):
@@ -30,6 +40,17 @@ class test_DatabaseBackend(unittest.TestCase):
         tb = DatabaseBackend()
         self.assertEqual(tb.get_status("xxx-does-not-exist"), states.PENDING)
 
+    def test_missing_task_id_is_not_created(self):
+        tb = DatabaseBackend()
+        tid = gen_unique_id()
+        self.assertEqual(tb.get_status(tid), states.PENDING)
+        s = tb.ResultSession()
+        try:
+            self.assertEqual(
+                s.query(Task).filter(Task.task_id == tid).count(), 0)
+        finally:
+            s.close()
+
     def test_mark_as_done(self):
         tb = DatabaseBackend()
 
@@ -42,6 +63,21 @@ class test_DatabaseBackend(unittest.TestCase):
         self.assertEqual(tb.get_status(tid), states.SUCCESS)
         self.assertEqual(tb.get_result(tid), 42)
 
+    def test_get_task_meta_many(self):
+        tb = DatabaseBackend()
+        tb.max_query_ids = 3
+
+        tids = [gen_unique_id() for i in xrange(10)]
+        for i, tid in enumerate(tids):
+            tb.mark_as_done(tid, i)
+        pending = gen_unique_id()
+
+        metas = tb.get_task_meta_many(tids + [pending])
+        self.assertEqual(metas[pending]["status"], states.PENDING)
+        self.assertListEqual([metas[tid]["result"] for tid in tids],
+                             range(10))
+        self.assertEqual(tb.get_status(pending), states.PENDING)
+
     def test_is_pickled(self):
         tb = DatabaseBackend()
 
@@ -131,3 +167,154 @@ class test_DatabaseBackend(unittest.TestCase):
 
     def test_TaskSet__repr__(self):
         self.assertIn("foo", repr(TaskSet("foo", None)))
+
+
+class test_DatabaseBackend_write_behind(unittest.TestCase):
+
+    def setUp(self):
+        self.tb = DatabaseBackend(write_behind=True, flush_interval=1000,
+                                  flush_size=5)
+
+    def tearDown(self):
+        if self.tb._flusher is not None:
+            self.tb._flusher.stop()
+
+    def stored(self, task_id):
+        s = self.tb.ResultSession()
+        try:
+            task = s.query(Task).filter(Task.task_id == task_id).first()
+            return task and task.to_dict()
+        finally:
+            s.close()
+
+    def test_buffered_until_flush(self):
+        tid = gen_unique_id()
+        self.tb.mark_as_started(tid)
+        self.assertEqual(self.tb.get_status(tid), states.STARTED)
+        self.assertIsNone(self.stored(tid))
+
+        self.tb.flush()
+        self.assertEqual(self.stored(tid)["status"], states.STARTED)
+
+        self.tb.mark_as_done(tid, 42)
+        self.assertEqual(self.tb.get_task_meta_many([tid])[tid]["result"],
+                         42)
+        self.tb.flush()
+        self.assertEqual(self.stored(tid)["status"], states.SUCCESS)
+        self.assertEqual(self.stored(tid)["result"], 42)
+
+    def wait_flushed(self, timeout=5):
+        time_start = time.time()
+        while self.tb._buffer and time.time() - time_start < timeout:
+            time.sleep(0.01)
+
+    def test_flush_size(self):
+        tids = [gen_unique_id() for i in xrange(5)]
+        for i, tid in enumerate(tids):
+            self.tb.mark_as_done(tid, i)
+        self.wait_flushed()
+        self.assertFalse(self.tb._buffer)
+        self.assertListEqual([self.stored(tid)["result"] for tid in tids],
+                             range(5))
+
+    def test_flush_size_errors_not_raised(self):
+
+        def _write_many(metas):
+            raise KeyError("foo")
+        self.tb._write_many = _write_many
+        self.tb._start_flusher()
+        self.tb._flusher.logger = MockLogger()
+
+        tids = [gen_unique_id() for i in xrange(6)]
+        for i, tid in enumerate(tids):
+            self.tb.mark_as_done(tid, i)
+        logger = self.tb._flusher.logger
+        time_start = time.time()
+        while not logger.errors and time.time() - time_start < 5:
+            time.sleep(0.01)
+        self.assertIn("KeyError", logger.errors[0])
+        self.tb._flusher.stop()
+        self.tb._flusher.join()
+        self.assertEqual(len(self.tb._buffer), 6)
+
+        del(self.tb._write_many)
+        self.tb.flush()
+        self.assertFalse(self.tb._buffer)
+
+    def test_buffer_limit(self):
+        tb = DatabaseBackend(write_behind=True, flush_interval=1000,
+                             flush_size=1000, buffer_limit=2)
+        tids = [gen_unique_id() for i in xrange(3)]
+        try:
+            for i, tid in enumerate(tids):
+                tb.mark_as_done(tid, i)
+            self.assertItemsEqual(tb._buffer.keys(), tids[:2])
+            self.assertEqual(self.stored(tids[2])["result"], 2)
+            self.assertIsNone(self.stored(tids[0]))
+
+            # results already buffered are replaced.
+            tb.mark_as_done(tids[0], 10)
+            self.assertEqual(tb._buffer[tids[0]]["result"], 10)
+            tb.flush()
+            self.assertEqual(self.stored(tids[0])["result"], 10)
+        finally:
+            tb._flusher.stop()
+
+    def test_flush_error_keeps_results(self):
+        tid = gen_unique_id()
+        self.tb.mark_as_done(tid, 42)
+
+        def _write_many(metas):
+            raise KeyError("foo")
+        self.tb._write_many = _write_many
+
+        self.assertRaises(KeyError, self.tb.flush)
+        self.assertIn(tid, self.tb._buffer)
+        self.assertEqual(self.tb.get_result(tid), 42)
+
+        del(self.tb._write_many)
+        self.tb.flush()
+        self.assertEqual(self.stored(tid)["result"], 42)
+
+    def test_flusher_logs_errors(self):
+        tid = gen_unique_id()
+        self.tb.mark_as_done(tid, 42)
+
+        def _write_many(metas):
+            raise KeyError("foo")
+        self.tb._write_many = _write_many
+
+        logger = MockLogger()
+        flusher = ResultFlusher(self.tb, logger=logger)
+        flusher.flush()
+        self.assertEqual(len(logger.errors), 1)
+        self.assertIn("KeyError", logger.errors[0])
+        self.assertIn("Traceback", logger.errors[0])
+        self.assertIn(tid, self.tb._buffer)
+
+        del(self.tb._write_many)
+        self.tb.flush()
+        self.assertFalse(self.tb._buffer)
+
+    def test_stop_flusher_logs_errors(self):
+        tid = gen_unique_id()
+        self.tb.mark_as_done(tid, 42)
+
+        def _write_many(metas):
+            raise KeyError("foo")
+        self.tb._write_many = _write_many
+
+        logger = MockLogger()
+        self.tb._flusher.stop()
+        self.tb._flusher.join()
+        self.tb._flusher = ResultFlusher(self.tb, interval=60, logger=logger)
+        self.tb._flusher.start()
+        self.tb._stop_flusher()
+        self.assertFalse(self.tb._flusher.isAlive())
+        self.assertTrue(logger.errors)
+        self.assertIn("KeyError", logger.errors[-1])
+        self.assertIn(tid, self.tb._buffer)
+
+        del(self.tb._write_many)
+        self.tb.flush()
+        self.assertFalse(self.tb._buffer)
@@ -1,4 +1,9 @@
+import os
+import time
+import shelve
+import shutil
 import logging
+import tempfile
 import unittest2 as unittest
 from datetime import datetime, timedelta
 
@@ -82,6 +87,33 @@ class AdditionalTask(PeriodicTask):
         raise Exception("FoozBaaz")
 
 
+class HourlyPeriodicTask(PeriodicTask):
+    run_every = timedelta(hours=1)
+    relative = True
+    connections = []
+
+    @classmethod
+    def apply_async(self, *args, **kwargs):
+        self.connections.append(kwargs.get("connection"))
+        return AsyncResult(gen_unique_id())
+
+
+class MockConnection(object):
+    _closed = False
+    _connection = None
+
+
+class CountingScheduler(beat.Scheduler):
+
+    def __init__(self, *args, **kwargs):
+        self.checked = []
+        beat.Scheduler.__init__(self, *args, **kwargs)
+
+    def is_due(self, entry):
+        self.checked.append(entry.name)
+        return beat.Scheduler.is_due(self, entry)
+
+
 class TestScheduleEntry(unittest.TestCase):
 
     def test_constructor(self):
@@ -171,6 +203,186 @@ class TestScheduler(unittest.TestCase):
                             self.scheduler.max_interval)
 
 
+class TestHeapScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = TaskRegistry()
+        self.registry.register(HourlyPeriodicTask)
+        HourlyPeriodicTask.connections = []
+        self.scheduler = CountingScheduler(self.registry, max_interval=300,
+                                           logger=log.get_default_logger())
+
+    def test_only_due_entries_are_checked(self):
+        name = HourlyPeriodicTask.name
+        self.assertEqual(self.scheduler.tick(), 300)
+        self.assertEqual(self.scheduler.checked, [name])
+        when, _ = self.scheduler._heap[0]
+        self.assertAlmostEqual(when - time.time(), 3600, delta=5)
+
+        self.assertEqual(self.scheduler.tick(), 300)
+        self.assertEqual(self.scheduler.checked, [name])
+
+        self.scheduler._heap[0] = (0, name)
+        self.scheduler.tick()
+        self.assertEqual(self.scheduler.checked, [name, name])
+
+    def test_is_due_override_rechecked_within_max_interval(self):
+        self.registry.register(PendingPeriodicTask)
+        self.scheduler.schedule_registry()
+        self.scheduler.max_interval = 50
+        self.assertEqual(self.scheduler.tick(), 50)
+        heap = dict((name, when) for when, name in self.scheduler._heap)
+        now = time.time()
+        self.assertLessEqual(heap[PendingPeriodicTask.name] - now, 50)
+        self.assertGreater(heap[HourlyPeriodicTask.name] - now, 3000)
+
+    def test_removed_entries_are_dropped(self):
+        self.scheduler.tick()
+        self.scheduler.schedule.pop(HourlyPeriodicTask.name)
+        self.scheduler._heap[0] = (0, HourlyPeriodicTask.name)
+        self.assertEqual(self.scheduler.tick(), 300)
+        self.assertFalse(self.scheduler._heap)
+        self.assertFalse(self.scheduler._scheduled)
+
+    def test_entry_added_after_removal_is_scheduled(self):
+        self.scheduler.tick()
+        self.scheduler.schedule.pop(HourlyPeriodicTask.name)
+        self.registry.register(PendingPeriodicTask)
+        name = PendingPeriodicTask.name
+        self.scheduler[name] = beat.ScheduleEntry(name)
+        self.scheduler.checked = []
+        self.scheduler.tick()
+        self.assertEqual(self.scheduler.checked, [PendingPeriodicTask.name])
+        self.assertIn(PendingPeriodicTask.name, self.scheduler._scheduled)
+
+    def test_unchanged_schedule_is_not_compared(self):
+        self.scheduler.tick()
+        self.scheduler._scheduled.clear()
+        self.scheduler.tick()
+        self.assertFalse(self.scheduler._scheduled)
+
+    def test_connection_is_reused(self):
+        name = HourlyPeriodicTask.name
+        connection = self.scheduler._connection = MockConnection()
+        past = datetime.now() - timedelta(hours=2)
+        for i in range(2):
+            self.scheduler.schedule[name] = beat.ScheduleEntry(name, past)
+            self.scheduler._heap[:] = [(0, name)]
+            self.scheduler.tick()
+        self.assertEqual(HourlyPeriodicTask.connections,
+                         [connection, connection])
+
+        connection._closed = True
+        self.scheduler.close()
+        self.assertIsNone(self.scheduler._connection)
+
+
+class TestPersistentSchedule(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "celerybeat-schedule")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open(self):
+        return beat.PersistentSchedule(self.filename)
+
+    def test_reopen(self):
+        last_run_at = datetime(2010, 5, 10, 10, 30, 15, 123456)
+        s = self.open()
+        s["foo"] = beat.ScheduleEntry("foo", last_run_at, 3)
+        s["bar"] = beat.ScheduleEntry("bar")
+        s["bar"] = s["bar"].next()
+        s.setdefault("baz", beat.ScheduleEntry("baz"))
+        s.pop("baz")
+        s.close()
+
+        s = self.open()
+        self.assertItemsEqual(s.keys(), ["foo", "bar"])
+        self.assertEqual(s["foo"].last_run_at, last_run_at)
+        self.assertEqual(s["foo"].total_run_count, 3)
+        self.assertEqual(s["bar"].total_run_count, 1)
+        self.assertNotIn("baz", s)
+        self.assertRaises(KeyError, s.__getitem__, "baz")
+        s.close()
+
+    def test_torn_record_is_discarded(self):
+        s = self.open()
+        s["foo"] = beat.ScheduleEntry("foo", None, 1)
+        s.close()
+        size = os.path.getsize(self.filename)
+        fh = open(self.filename, "ab")
+        fh.write("2 734000 0 fo")
+        fh.close()
+
+        s = self.open()
+        self.assertEqual(s["foo"].total_run_count, 1)
+        self.assertEqual(os.path.getsize(self.filename), size)
+        s["foo"] = s["foo"].next()
+        s.close()
+        self.assertEqual(self.open()["foo"].total_run_count, 2)
+
+    def test_compaction(self):
+        s = self.open()
+        s.compact_min = 10
+        s["foo"] = beat.ScheduleEntry("foo")
+        s["bar"] = beat.ScheduleEntry("bar")
+        for i in range(100):
+            s["foo"] = s["foo"].next()
+        self.assertLessEqual(s._log_size, 10)
+        s.close()
+        self.assertLessEqual(len(open(self.filename).readlines()), 11)
+        self.assertEqual(self.open()["foo"].total_run_count, 100)
+
+    def test_convert_shelve(self):
+        old = shelve.open(self.filename)
+        old["foo"] = beat.ScheduleEntry("foo", None, 7)
+        old.close()
+
+        s = self.open()
+        self.assertEqual(s["foo"].total_run_count, 7)
+        s.close()
+        self.assertTrue(open(self.filename).read().startswith(
+                            beat.SCHEDULE_MAGIC))
+
+    def test_version(self):
+        s = self.open()
+        s["foo"] = beat.ScheduleEntry("foo")
+        s["foo"] = s["foo"].next()
+        self.assertEqual(s.version, 1)
+        s.pop("foo")
+        self.assertEqual(s.version, 2)
+        s.close()
+
+    def test_scheduler_finds_entries_added_directly(self):
+        registry = TaskRegistry()
+        registry.register(HourlyPeriodicTask)
+        s = self.open()
+        scheduler = CountingScheduler(registry, schedule=s,
+                                      logger=log.get_default_logger())
+        scheduler.tick()
+        registry.register(PendingPeriodicTask)
+        s.pop(HourlyPeriodicTask.name)
+        s[PendingPeriodicTask.name] = beat.ScheduleEntry(
+                                        PendingPeriodicTask.name)
+        scheduler.checked = []
+        scheduler.tick()
+        self.assertEqual(scheduler.checked, [PendingPeriodicTask.name])
+        s.close()
+
+    def test_scheduler_syncs_after_sending(self):
+        registry = TaskRegistry()
+        registry.register(DuePeriodicTask)
+        schedule = MockShelve()
+        scheduler = beat.Scheduler(registry, schedule=schedule,
+                                   logger=log.get_default_logger())
+        scheduler._connection = MockConnection()
+        scheduler.tick()
+        self.assertTrue(schedule.synced)
+
+
 class TestClockService(unittest.TestCase):
 
     def test_start(self):
@@ -2,6 +2,7 @@ from __future__ import generators
 
 import sys
 import time
+import threading
 import unittest2 as unittest
 
 from itertools import chain, izip
@@ -125,6 +126,7 @@ class TaskD(Task):
 
 
 class test_TaskBucket(unittest.TestCase):
+    Bucket = buckets.TaskBucket
 
     def setUp(self):
         self.registry = TaskRegistry()
@@ -134,13 +136,13 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_get_nowait(self):
-        x = buckets.TaskBucket(task_registry=self.registry)
+        x = self.Bucket(task_registry=self.registry)
         self.assertRaises(buckets.QueueEmpty, x.get_nowait)
 
     @skip_if_disabled
     def test_refresh(self):
         reg = {}
-        x = buckets.TaskBucket(task_registry=reg)
+        x = self.Bucket(task_registry=reg)
         reg["foo"] = "something"
         x.refresh()
         self.assertIn("foo", x.buckets)
@@ -148,7 +150,7 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test__get_queue_for_type(self):
-        x = buckets.TaskBucket(task_registry={})
+        x = self.Bucket(task_registry={})
         x.buckets["foo"] = buckets.TokenBucketQueue(fill_rate=1)
         self.assertIs(x._get_queue_for_type("foo"), x.buckets["foo"].queue)
         x.buckets["bar"] = buckets.FastQueue()
@@ -156,7 +158,7 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_update_bucket_for_type(self):
-        bucket = buckets.TaskBucket(task_registry=self.registry)
+        bucket = self.Bucket(task_registry=self.registry)
         b = bucket._get_queue_for_type(TaskC.name)
         self.assertIs(bucket.update_bucket_for_type(TaskC.name).queue, b)
         self.assertIs(bucket.buckets[TaskC.name].queue, b)
@@ -164,7 +166,7 @@ class test_TaskBucket(unittest.TestCase):
     @skip_if_disabled
     def test_auto_add_on_missing_put(self):
         reg = {}
-        b = buckets.TaskBucket(task_registry=reg)
+        b = self.Bucket(task_registry=reg)
         reg["nonexisting.task"] = "foo"
 
         b.put(MockJob(gen_unique_id(), "nonexisting.task", (), {}))
@@ -172,7 +174,7 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_auto_add_on_missing(self):
-        b = buckets.TaskBucket(task_registry=self.registry)
+        b = self.Bucket(task_registry=self.registry)
         for task_cls in self.task_classes:
             self.assertIn(task_cls.name, b.buckets.keys())
         self.registry.register(TaskD)
@@ -182,7 +184,7 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_has_rate_limits(self):
-        b = buckets.TaskBucket(task_registry=self.registry)
+        b = self.Bucket(task_registry=self.registry)
         self.assertEqual(b.buckets[TaskA.name].fill_rate, 10)
         self.assertIsInstance(b.buckets[TaskB.name], buckets.Queue)
         self.assertEqual(b.buckets[TaskC.name].fill_rate, 1)
@@ -195,20 +197,20 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_on_empty_buckets__get_raises_empty(self):
-        b = buckets.TaskBucket(task_registry=self.registry)
+        b = self.Bucket(task_registry=self.registry)
         self.assertRaises(buckets.QueueEmpty, b.get)
         self.assertEqual(b.qsize(), 0)
 
     @skip_if_disabled
     def test_put__get(self):
-        b = buckets.TaskBucket(task_registry=self.registry)
+        b = self.Bucket(task_registry=self.registry)
         job = MockJob(gen_unique_id(), TaskA.name, ["theqbf"], {"foo": "bar"})
         b.put(job)
         self.assertEqual(b.get(), job)
 
     @skip_if_disabled
     def test_fill_rate(self):
-        b = buckets.TaskBucket(task_registry=self.registry)
+        b = self.Bucket(task_registry=self.registry)
 
         cjob = lambda i: MockJob(gen_unique_id(), TaskA.name, [i], {})
         jobs = [cjob(i) for i in xrange(20)]
@@ -225,7 +227,7 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test__very_busy_queue_doesnt_block_others(self):
-        b = buckets.TaskBucket(task_registry=self.registry)
+        b = self.Bucket(task_registry=self.registry)
 
         cjob = lambda i, t: MockJob(gen_unique_id(), t.name, [i], {})
         ajobs = [cjob(i, TaskA) for i in xrange(10)]
@@ -244,7 +246,7 @@ class test_TaskBucket(unittest.TestCase):
     def test_thorough__multiple_types(self):
         self.registry.register(TaskD)
         try:
-            b = buckets.TaskBucket(task_registry=self.registry)
+            b = self.Bucket(task_registry=self.registry)
 
             cjob = lambda i, t: MockJob(gen_unique_id(), t.name, [i], {})
 
@@ -266,7 +268,7 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_empty(self):
-        x = buckets.TaskBucket(task_registry=self.registry)
+        x = self.Bucket(task_registry=self.registry)
         self.assertTrue(x.empty())
         x.put(MockJob(gen_unique_id(), TaskC.name, [], {}))
         self.assertFalse(x.empty())
@@ -275,13 +277,100 @@ class test_TaskBucket(unittest.TestCase):
 
     @skip_if_disabled
     def test_items(self):
-        x = buckets.TaskBucket(task_registry=self.registry)
+        x = self.Bucket(task_registry=self.registry)
         x.buckets[TaskA.name].put(1)
         x.buckets[TaskB.name].put(2)
         x.buckets[TaskC.name].put(3)
         self.assertItemsEqual(x.items, [1, 2, 3])
 
 
+class test_EventTaskBucket(test_TaskBucket):
+    Bucket = buckets.EventTaskBucket
+
+    @skip_if_disabled
+    def test_get_nowait(self):
+        x = self.Bucket(task_registry=self.registry)
+        self.assertRaises(buckets.QueueEmpty, x.get_nowait)
+
+    @skip_if_disabled
+    def test_on_empty_buckets__get_raises_empty(self):
+        b = self.Bucket(task_registry=self.registry)
+        self.assertRaises(buckets.QueueEmpty, b.get, timeout=0.1)
+        self.assertEqual(b.qsize(), 0)
+
+    @skip_if_disabled
+    def test_put__get(self):
+        b = self.Bucket(task_registry=self.registry)
+        job = MockJob(gen_unique_id(), TaskA.name, ["theqbf"], {"foo": "bar"})
+        b.put(job)
+        self.assertEqual(b.get(), job)
+        self.assertFalse(b._scheduled)
+
+    @skip_if_disabled
+    def test_round_robin(self):
+        b = self.Bucket(task_registry=self.registry)
+        cjob = lambda i, t: MockJob(gen_unique_id(), t.name, [i], {})
+        bjobs = [cjob(i, TaskB) for i in xrange(10)]
+        map(b.put, bjobs)
+        other = cjob(0, TaskA)
+        b.put(other)
+        self.assertEqual(b.get(), bjobs[0])
+        self.assertEqual(b.get(), other)
+        self.assertListEqual([b.get() for i in xrange(9)], bjobs[1:])
+
+    @skip_if_disabled
+    def test_rate_limited_does_not_block_others(self):
+        b = self.Bucket(task_registry=self.registry)
+        cjob = lambda i, t: MockJob(gen_unique_id(), t.name, [i], {})
+        cjobs = [cjob(i, TaskC) for i in xrange(2)]
+        map(b.put, cjobs)
+        self.assertEqual(b.get(), cjobs[0])
+        self.assertRaises(buckets.QueueEmpty, b.get_nowait)
+        self.assertTrue(b._timers)
+        bjob = cjob(0, TaskB)
+        b.put(bjob)
+        self.assertEqual(b.get(), bjob)
+        self.assertEqual(b.get(timeout=2), cjobs[1])
+        self.assertFalse(b._timers)
+
+    @skip_if_disabled
+    def test_put_wakes_up_get(self):
+        b = self.Bucket(task_registry=self.registry)
+        job = MockJob(gen_unique_id(), TaskB.name, [], {})
+        timer = threading.Timer(0.1, b.put, (job, ))
+        timer.start()
+        try:
+            time_start = time.time()
+            self.assertEqual(b.get(timeout=5), job)
+            self.assertLess(time.time() - time_start, 1)
+        finally:
+            timer.cancel()
+
+    @skip_if_disabled
+    def test_refresh_reschedules_timers(self):
+        b = self.Bucket(task_registry=self.registry)
+        b.put(MockJob(gen_unique_id(), TaskC.name, [], {}))
+        b.put(MockJob(gen_unique_id(), TaskC.name, [], {}))
+        b.get()
+        self.assertRaises(buckets.QueueEmpty, b.get_nowait)
+        TaskC.rate_limit = None
+        try:
+            b.refresh()
+            self.assertFalse(b._timers)
+            self.assertTrue(b.get_nowait())
+        finally:
+            TaskC.rate_limit = "1/s"
+
+    @skip_if_disabled
+    def test_clear(self):
+        b = self.Bucket(task_registry=self.registry)
+        b.put(MockJob(gen_unique_id(), TaskB.name, [], {}))
+        b.clear()
+        self.assertFalse(b._ready)
+        self.assertFalse(b._scheduled)
+        self.assertRaises(buckets.QueueEmpty, b.get_nowait)
+
+
 class test_FastQueue(unittest.TestCase):
 
     def test_can_consume(self):
@@ -21,6 +21,7 @@ class MockPool(object):
 
     def __init__(self, *args, **kwargs):
         self.started = True
+        self.kwargs = kwargs
         self._state = mp.RUN
 
     def close(self):
@@ -60,6 +61,12 @@ class test_TaskPool(unittest.TestCase):
         pool.terminate()
         self.assertTrue(_pool.terminated)
 
+    def test_batch_size(self):
+        pool = TaskPool(10, batch_size=16, max_latency=0.5)
+        pool.start()
+        self.assertEqual(pool._pool.kwargs["batch_size"], 16)
+        self.assertEqual(pool._pool.kwargs["max_latency"], 0.5)
+
     def test_on_ready_exception(self):
 
         scratch = [None]
@@ -1,5 +1,7 @@
 import sys
+import pickle
 import unittest2 as unittest
+from collections import deque
 from Queue import Queue
 
 from celery.datastructures import PositionQueue, ExceptionInfo, LocalCache
@@ -129,6 +131,76 @@ class test_LimitedSet(unittest.TestCase):
         map(s.add, items)
         self.assertIn("LimitedSet(", repr(s))
 
+    def test_add_existing_moves_to_end(self):
+        s = LimitedSet(maxlen=2)
+        s.add("foo")
+        s.add("bar")
+        s.add("foo")
+        s.add("baz")
+        self.assertIn("foo", s)
+        self.assertNotIn("bar", s)
+        self.assertListEqual([value for value, _ in s.chronologically],
+                             ["foo", "baz"])
+
+    def test_expires(self):
+        s = LimitedSet(maxlen=2, expires=3600)
+        map(s.add, ["foo", "bar", "baz"])
+        # Not expired yet, so can exceed maxlen.
+        self.assertEqual(len(s), 3)
+        s._order = deque((value, when - 7200) for value, when in s._order)
+        s._data = dict(s._order)
+        s.add("xuzzy")
+        self.assertListEqual([value for value, _ in s.chronologically],
+                             ["baz", "xuzzy"])
+
+    def test_pop_value(self):
+        s = LimitedSet(maxlen=2)
+        s.add("foo")
+        s.add("bar")
+        s.pop_value("foo")
+        self.assertNotIn("foo", s)
+        self.assertEqual(s.first[0], "bar")
+        s.pop_value("bar")
+        self.assertRaises(IndexError, lambda: s.first)
+
+    def test_compact(self):
+        s = LimitedSet()
+        for i in xrange(1000):
+            s.add("foo")
+        self.assertEqual(len(s), 1)
+        self.assertLess(len(s._order), 200)
+
+    def test_update(self):
+        s = LimitedSet(maxlen=10)
+        s.update(["foo%d" % i for i in xrange(20)])
+        self.assertEqual(len(s), 10)
+        self.assertNotIn("foo9", s)
+        self.assertIn("foo10", s)
+
+        s2 = LimitedSet(maxlen=10)
+        s2.update({"bar": 2.0, "baz": 1.0})
+        s2.update(s)
+        self.assertEqual(len(s2), 10)
+        self.assertNotIn("bar", s2)
+        s2.update({"baz": 3.0})
+        self.assertNotIn("baz", s2)
+
+    def test_update_merges_older(self):
+        s = LimitedSet()
+        s.update({"foo": 10.0, "bar": 30.0})
+        s.update({"baz": 20.0, "foo": 5.0})
+        self.assertListEqual(s.chronologically,
+                             [("foo", 10.0), ("baz", 20.0), ("bar", 30.0)])
+
+    def test_pickle(self):
+        s = LimitedSet(maxlen=10, expires=60)
+        map(s.add, ["foo", "bar", "baz"])
+        s2 = pickle.loads(pickle.dumps(s, protocol=2))
+        self.assertEqual(s2.maxlen, 10)
+        self.assertEqual(s2.expires, 60)
+        self.assertListEqual(s2.chronologically, s.chronologically)
+        self.assertIn("bar", s2)
+
 
 class test_LocalCache(unittest.TestCase):
 
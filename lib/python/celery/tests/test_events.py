@@ -1,3 +1,4 @@
+import time
 import unittest2 as unittest
 
 from celery import events
@@ -40,6 +41,69 @@ class TestEventDispatcher(unittest.TestCase):
         self.assertTrue(publisher.has_event("World War II"))
 
 
+class TestBatchingEventDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = MockPublisher()
+        self.eventer = events.EventDispatcher(object(), enabled=False,
+                                              batch_size=3, max_latency=60)
+        self.eventer.publisher = self.publisher
+        self.eventer.enabled = True
+
+    def test_send_batches(self):
+        for i in xrange(7):
+            self.eventer.send("task-received", i=i)
+        self.assertFalse(self.publisher.sent)
+        self.eventer.send_pending()
+        self.assertListEqual([len(batch) for batch in self.publisher.sent],
+                             [3, 3, 1])
+        self.assertListEqual([event["i"] for batch in self.publisher.sent
+                                            for event in batch],
+                             range(7))
+
+    def test_buffer_is_bounded(self):
+        eventer = events.EventDispatcher(object(), enabled=False,
+                                         batch_size=3, buffer_size=5)
+        eventer.publisher = self.publisher
+        eventer.enabled = True
+        for i in xrange(10):
+            eventer.send("task-received", i=i)
+        eventer.send_pending()
+        self.assertListEqual([event["i"] for batch in self.publisher.sent
+                                            for event in batch],
+                             range(5, 10))
+
+    def test_send_error_goes_to_outbound_buffer(self):
+
+        class FailingPublisher(MockPublisher):
+
+            def send(self, msg, *args, **kwargs):
+                raise KeyError("foo")
+
+        self.eventer.publisher = FailingPublisher()
+        self.eventer.send("task-received")
+        self.eventer.send("task-started")
+        self.eventer.send_pending()
+        self.assertEqual(len(self.eventer._outbound_buffer), 2)
+
+        self.eventer.publisher = self.publisher
+        self.eventer.flush()
+        self.assertTrue(self.publisher.has_event("task-started"))
+
+    def test_flushed_by_thread(self):
+        self.eventer.max_latency = 0.01
+        self.eventer._start_flusher()
+        try:
+            self.eventer.send("task-received")
+            for i in xrange(100):
+                if self.publisher.sent:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(len(self.publisher.sent), 1)
+        finally:
+            self.eventer.close()
+
+
 class TestEventReceiver(unittest.TestCase):
 
     def test_process(self):
@@ -56,6 +120,15 @@ class TestEventReceiver(unittest.TestCase):
         r._receive(message, object())
         self.assertTrue(got_event[0])
 
+    def test_process_batch(self):
+        got_events = []
+
+        r = events.EventReceiver(object(), handlers={
+                                    "world-war": got_events.append})
+        r._receive([{"type": "world-war", "n": 1},
+                    {"type": "world-war", "n": 2}], object())
+        self.assertListEqual([event["n"] for event in got_events], [1, 2])
+
     def test_catch_all_event(self):
 
         message = {"type": "world-war"}
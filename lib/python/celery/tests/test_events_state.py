@@ -5,7 +5,8 @@ from itertools import count
 
 from celery import states
 from celery.events import Event
-from celery.events.state import State, HEARTBEAT_EXPIRE
+from celery.events.state import State, Task, Worker
+from celery.events.state import HEARTBEAT_EXPIRE, HEARTBEAT_BUFFER
 from celery.utils import gen_unique_id
 
 
@@ -78,6 +79,39 @@ class ev_snapshot(replay):
                       uuid=gen_unique_id(), hostname=worker))
 
 
+class test_Worker(unittest.TestCase):
+
+    def test_heartbeats_bounded(self):
+        worker = Worker(hostname="utest1")
+        now = time.time()
+        for i in xrange(HEARTBEAT_BUFFER * 2):
+            worker.on_heartbeat(timestamp=now + i)
+        self.assertEqual(len(worker.heartbeats), HEARTBEAT_BUFFER)
+        self.assertEqual(worker.heartbeats[-1], now + HEARTBEAT_BUFFER * 2 - 1)
+
+        # out of order heartbeat does not replace the latest.
+        worker.on_heartbeat(timestamp=now)
+        self.assertEqual(worker.heartbeats[-1], now + HEARTBEAT_BUFFER * 2 - 1)
+        self.assertTrue(worker.alive)
+
+
+class test_Task(unittest.TestCase):
+
+    def test_fields(self):
+        task = Task(uuid="id1", name="task1", foo="bar")
+        self.assertEqual(task.name, "task1")
+        self.assertEqual(task.foo, "bar")
+        self.assertIsNone(task.result)
+        self.assertRaises(AttributeError, getattr, task, "baz")
+        self.assertFalse(hasattr(task, "__dict__"))
+
+        task.update({"result": "4"}, baz=1)
+        self.assertEqual(task.baz, 1)
+        self.assertDictEqual(task.info(fields=["result", "baz", "eta"]),
+                             {"result": "4", "baz": 1})
+        self.assertIn("task1", repr(task))
+
+
 class test_State(unittest.TestCase):
 
     def test_worker_online_offline(self):
@@ -174,3 +208,42 @@ class test_State(unittest.TestCase):
         r.play()
         self.assertEqual(len(r.state.tasks_by_worker("utest1")), 10)
         self.assertEqual(len(r.state.tasks_by_worker("utest2")), 10)
+
+    def test_tasks_by_state(self):
+        r = ev_task_states(State())
+        r.next()
+        self.assertEqual(len(r.state.tasks_by_state("RECEIVED")), 1)
+        r.next()
+        self.assertFalse(r.state.tasks_by_state("RECEIVED"))
+        self.assertListEqual(r.state.tasks_by_state(states.STARTED),
+                             [(r.uuid, r.state.tasks[r.uuid])])
+
+    def test_tasks_limit_and_order(self):
+        r = ev_snapshot(State())
+        r.play()
+        latest = r.state.tasks_by_timestamp(limit=3)
+        self.assertEqual(len(latest), 3)
+        self.assertEqual(latest[0][0], r.events[-1]["uuid"])
+        self.assertEqual(len(r.state.tasks_by_type("task1", limit=4)), 4)
+
+        # an event moves the task to the front.
+        uuid = r.events[3]["uuid"]
+        r.state.event(Event("task-started", uuid=uuid, hostname="utest1"))
+        self.assertEqual(r.state.tasks_by_timestamp(limit=1)[0][0], uuid)
+        self.assertEqual(r.state.tasks_by_worker("utest1", limit=1)[0][0],
+                         uuid)
+
+    def test_task_types(self):
+        r = ev_snapshot(State())
+        r.play()
+        self.assertItemsEqual(r.state.task_types(), ["task1", "task2"])
+
+    def test_indexes_follow_eviction(self):
+        r = ev_snapshot(State(max_tasks_in_memory=5))
+        r.play()
+        self.assertEqual(len(r.state.tasks), 5)
+        self.assertEqual(len(r.state.tasks_by_timestamp()), 5)
+        self.assertEqual(len(r.state.tasks_by_type("task1")) +
+                         len(r.state.tasks_by_type("task2")), 5)
+        self.assertEqual(len(r.state.tasks_by_worker("utest1")) +
+                         len(r.state.tasks_by_worker("utest2")), 5)
@@ -1,6 +1,9 @@
 import unittest2 as unittest
 
+from celery import messaging
 from celery.messaging import MSG_OPTIONS, extract_msg_options
+from celery.messaging import BrokerPool, connection_is_usable
+from celery.messaging import with_pooled_connection
 
 
 class TestMsgOptions(unittest.TestCase):
@@ -13,3 +16,150 @@ class TestMsgOptions(unittest.TestCase):
         result = extract_msg_options(testing)
         self.assertEqual(result["mandatory"], True)
         self.assertEqual(result["routing_key"], "foo.xuzzy")
+
+
+class MockConnection(object):
+    _closed = None
+    _connection = None
+
+    def close(self):
+        self._closed = True
+
+
+class MockPublisher(object):
+    closed = False
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def close(self):
+        self.closed = True
+
+
+class MockDeadPublisher(MockPublisher):
+
+    def close(self):
+        raise IOError("Socket closed")
+
+
+class TestBrokerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.prev_establish = messaging.establish_connection
+        messaging.establish_connection = lambda **kwargs: MockConnection()
+
+    def tearDown(self):
+        messaging.establish_connection = self.prev_establish
+
+    def test_reuses_released_connections(self):
+        pool = BrokerPool(limit=2, expires=None)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats, {"hits": 1, "misses": 2, "idle": 0})
+
+    def test_limit(self):
+        pool = BrokerPool(limit=1, expires=None)
+        c1, c2 = pool.acquire(), pool.acquire()
+        pool.release(c1)
+        pool.release(c2)
+        self.assertEqual(len(pool), 1)
+        self.assertFalse(c1._closed)
+        self.assertTrue(c2._closed)
+
+    def test_expires(self):
+        pool = BrokerPool(limit=10, expires=60)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool._idle[0] = (pool._idle[0][0] - 120, conn)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn._closed)
+        self.assertEqual(pool.misses, 2)
+
+    def test_health_check(self):
+        pool = BrokerPool(limit=10, expires=None,
+                          health_check=lambda conn: False)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn._closed)
+
+    def test_dead_idle_connection(self):
+        pool = BrokerPool(limit=10, expires=None,
+                          health_check=lambda conn: False)
+        conn = pool.acquire()
+        pool.acquire_publisher(conn, "foo", lambda: MockDeadPublisher(conn))
+        publisher, _ = pool.acquire_publisher(conn, "bar",
+                                              lambda: MockPublisher(conn))
+        pool.release(conn)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(publisher.closed)
+        self.assertTrue(conn._closed)
+        self.assertFalse(conn._pool_publishers)
+        self.assertEqual(pool.misses, 2)
+
+    def test_discard_dead_connection(self):
+        pool = BrokerPool(limit=10, expires=None)
+        conn = pool.acquire()
+        conn.close = MockDeadPublisher(conn).close
+        pool.discard(conn)
+
+    def test_connection_is_usable(self):
+        conn = MockConnection()
+        self.assertTrue(connection_is_usable(conn))
+        conn.close()
+        self.assertFalse(connection_is_usable(conn))
+
+    def test_fork_aware(self):
+        pool = BrokerPool(limit=10, expires=None)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool._pid = -1 # pretend we're the child of a fork.
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertFalse(conn._closed)
+        self.assertEqual(pool.stats, {"hits": 0, "misses": 1, "idle": 0})
+
+    def test_acquire_publisher(self):
+        pool = BrokerPool(limit=10, expires=None)
+        conn = pool.acquire()
+        p1, release = pool.acquire_publisher(conn, "foo",
+                                             lambda: MockPublisher(conn))
+        release()
+        self.assertFalse(p1.closed)
+        p2, _ = pool.acquire_publisher(conn, "foo", lambda: MockPublisher(conn))
+        self.assertIs(p1, p2)
+        pool.discard(conn)
+        self.assertTrue(p1.closed)
+        self.assertTrue(conn._closed)
+
+    def test_acquire_publisher_unpooled_connection(self):
+        pool = BrokerPool(limit=10, expires=None)
+        conn = MockConnection()
+        publisher, release = pool.acquire_publisher(conn, "foo",
+                                        lambda: MockPublisher(conn))
+        release()
+        self.assertTrue(publisher.closed)
+
+    def test_with_pooled_connection(self):
+        prev_pool, messaging.broker_pool = messaging.broker_pool, \
+                BrokerPool(limit=10, expires=None)
+        try:
+            pool = messaging.broker_pool
+
+            @with_pooled_connection
+            def fun(connection=None, fail=False):
+                if fail:
+                    raise KeyError("foo")
+                return connection
+
+            conn = fun()
+            self.assertIs(fun(), conn)
+            self.assertIs(fun(connection=MockConnection()).__class__,
+                          MockConnection)
+            self.assertRaises(KeyError, fun, fail=True)
+            self.assertTrue(conn._closed)
+            self.assertEqual(len(pool), 0)
+            self.assertEqual(pool.hits, 2)
+        finally:
+            messaging.broker_pool = prev_pool
@@ -1,11 +1,25 @@
+import os
 import sys
 import time
+import Queue
+import shutil
+import tempfile
 import logging
+import threading
 import itertools
 import unittest2 as unittest
 
 from celery.concurrency.processes import TaskPool
+from celery.concurrency.processes.pool import BatchBuffer, BatchRecord
+from celery.concurrency.processes.pool import BatchFlusher, Pool
+from celery.concurrency.processes.pool import BatchTaskHandler
+from celery.concurrency.processes.pool import dumps_message, loads_message
+from celery.concurrency.processes.pool import lost_results, lost_tasks
+from celery.concurrency.processes.pool import TimeoutHandler, TERMINATE
+from celery.concurrency.processes.pool import ApplyResult, set_worker_lost
+from celery.serialization import pickle
 from celery.datastructures import ExceptionInfo
+from celery.exceptions import TimeLimitExceeded, WorkerLostError
 
 
 def do_something(i):
@@ -16,6 +30,11 @@ def long_something():
     time.sleep(1)
 
 
+def exit_something():
+    time.sleep(0.2)
+    os._exit(1)
+
+
 def raise_something(i):
     try:
         raise KeyError("FOO EXCEPTION")
@@ -73,3 +92,334 @@ class TestTaskPool(unittest.TestCase):
         self.assertDictContainsSubset({"ret_value": 900},
                                        scratchpad.get(3))
         p.stop()
+
+
+class test_BatchBuffer(unittest.TestCase):
+
+    def test_flush(self):
+        sent = []
+        buffer = BatchBuffer(sent.append)
+        buffer.flush()
+        self.assertListEqual(sent, [])
+        buffer.append(1)
+        buffer.append(2)
+        buffer.flush(added_before=buffer.first_added - 1)
+        self.assertListEqual(sent, [])
+        buffer.flush(added_before=buffer.first_added)
+        self.assertListEqual(sent, [[1, 2]])
+        buffer.append(3)
+        buffer.flush()
+        self.assertListEqual(sent, [[1, 2], [3]])
+
+
+class test_BatchFlusher(unittest.TestCase):
+
+    def test_flushes_after_max_latency(self):
+        sent = []
+        wakeup = threading.Condition(threading.Lock())
+        buffers = BatchBuffer(sent.append, wakeup), \
+                  BatchBuffer(sent.append, wakeup)
+        flusher = BatchFlusher(buffers, 0.05, wakeup)
+        flusher.start()
+        time.sleep(0.1)
+        self.assertTrue(flusher.is_alive())
+        self.assertListEqual(sent, [])
+        buffers[0].append(1)
+        buffers[1].append(2)
+        time.sleep(0.02)
+        self.assertListEqual(sent, [])
+        for i in range(100):
+            if len(sent) == 2:
+                break
+            time.sleep(0.01)
+        self.assertListEqual(sent, [[1], [2]])
+
+
+class test_BatchRecord(unittest.TestCase):
+
+    def test_completed(self):
+        record = BatchRecord()
+        record.add([(1, None), (2, None)])
+        record.started(1, None)
+        record.completed(1, None)
+        record.completed(1, None)
+        self.assertEqual(record.lost(2, None), ([], [(2, None)]))
+        self.assertEqual(record.lost(2, None), ([], []))
+        self.assertFalse(record._tasks)
+        self.assertFalse(record._started)
+
+    def test_lost(self):
+        record = BatchRecord()
+        record.add([(1, None), (2, None), (3, None)])
+        record.add([(4, None)])
+        record.started(1, None)
+        record.completed(1, None)
+        record.started(2, None)
+        self.assertEqual(record.lost(2, None), ([(2, None)], [(3, None)]))
+        self.assertEqual(record.lost(4, None), ([], [(4, None)]))
+
+    def test_process_lost(self):
+        record = BatchRecord()
+        record.add([(1, None), (2, None), (3, None)])
+        record.add([(4, None), (5, None)])
+        record.started(1, None, pid=10)
+        record.completed(1, None)
+        record.started(2, None, pid=10)
+        record.started(4, None, pid=20)
+        self.assertEqual(record.process_lost(10), ([(2, None)], [(3, None)]))
+        self.assertEqual(record.process_lost(10), ([], []))
+        self.assertEqual(len(record._tasks), 2)
+
+
+class test_BatchPool(unittest.TestCase):
+
+    def test_worker_lost(self):
+        pool = Pool(1, batch_size=4)
+        try:
+            lost = pool.apply_async(exit_something)
+            resent = pool.apply_async(do_something, (4, ))
+            self.assertRaises(WorkerLostError, lost.get, timeout=10)
+            self.assertEqual(resent.get(timeout=10), 16)
+        finally:
+            pool.terminate()
+
+
+class test_BatchTaskHandler(unittest.TestCase):
+
+    def test_batches_spread_over_processes(self):
+        taskqueue = Queue.Queue()
+        sent = []
+        outqueue = Queue.Queue()
+        record = BatchRecord()
+        lengths = []
+        taskqueue.put(([(i, None) for i in range(10)], None))
+        taskqueue.put(([(10, None), (11, None)], lengths.append))
+        taskqueue.put(None)
+        handler = BatchTaskHandler(taskqueue, sent.append, outqueue,
+                                   [1, 2], batch_size=4, batches=record)
+        handler.run()
+        batches, sentinels = sent[:-2], sent[-2:]
+        self.assertListEqual(sentinels, [None, None])
+        # at most batch_size * processes tasks are taken at a time.
+        self.assertListEqual(map(len, batches), [4, 4, 2, 1, 1])
+        self.assertListEqual([task for batch in batches for task in batch],
+                             [(i, None) for i in range(12)])
+        self.assertListEqual(lengths, [2])
+        self.assertIsNone(outqueue.get_nowait())
+        self.assertEqual(len(record._tasks), 12)
+
+    def test_small_batches_when_few_tasks(self):
+        taskqueue = Queue.Queue()
+        sent = []
+        taskqueue.put(([(1, None), (2, None)], None))
+        taskqueue.put(None)
+        handler = BatchTaskHandler(taskqueue, sent.append, Queue.Queue(),
+                                   [1, 2], batch_size=100)
+        handler.run()
+        self.assertListEqual(sent, [[(1, None)], [(2, None)], None, None])
+
+
+class test_shared_messages(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_small(self):
+        message = (1, None, {"foo": "bar"})
+        data = dumps_message(message, 1024, self.dir)
+        self.assertEqual(data, pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+        self.assertFalse(os.listdir(self.dir))
+        self.assertTupleEqual(loads_message(data, lost_results), message)
+
+    def test_plain_pickle(self):
+        self.assertIsNone(loads_message(pickle.dumps(None), lost_results))
+
+    def test_large(self):
+        message = [(1, None, range(10000)), (2, 3, None)]
+        data = dumps_message(message, 1024, self.dir)
+        self.assertLess(len(data), 1024)
+        self.assertEqual(len(os.listdir(self.dir)), 1)
+        self.assertListEqual(loads_message(data, lost_results), message)
+        self.assertFalse(os.listdir(self.dir))
+
+    def remove_segments(self):
+        for name in os.listdir(self.dir):
+            os.unlink(os.path.join(self.dir, name))
+
+    def test_lost_result(self):
+        data = dumps_message((1, None, (True, range(10000))), 1024, self.dir)
+        self.remove_segments()
+        job, i, (success, exc) = loads_message(data, lost_results)
+        self.assertEqual((job, i, success), (1, None, False))
+        self.assertIsInstance(exc, OSError)
+
+    def test_lost_tasks(self):
+        data = dumps_message([(1, 0, do_something, range(10000), {}),
+                              (1, 1, do_something, (), {})], 1024, self.dir)
+        self.remove_segments()
+        tasks = loads_message(data, lost_tasks)
+        self.assertListEqual([task[:2] for task in tasks], [(1, 0), (1, 1)])
+        job, i, func, args, kwds = tasks[0]
+        self.assertRaises(OSError, func, *args, **kwds)
+
+
+class test_SharedPool(unittest.TestCase):
+
+    def test_apply(self):
+        for batch_size in None, 4:
+            pool = Pool(2, batch_size=batch_size, shared_threshold=1024)
+            try:
+                results = [pool.apply_async(len, (range(n), ))
+                                for n in (1, 10000)]
+                self.assertListEqual([result.get(timeout=10)
+                                        for result in results], [1, 10000])
+                self.assertListEqual(pool.apply_async(range, (10000, ))
+                                         .get(timeout=10), range(10000))
+                self.assertFalse(os.listdir(pool._shared_dir))
+            finally:
+                pool.terminate()
+
+
+class test_set_worker_lost(unittest.TestCase):
+
+    def create_result(self):
+        cache = {}
+        errors = []
+        result = ApplyResult(cache, None, error_callback=errors.append)
+        result._accepted = True
+        cache[result._job] = result
+        return cache, result, errors
+
+    def test_fails_job(self):
+        cache, result, errors = self.create_result()
+        set_worker_lost(cache, result._job, None)
+        self.assertTrue(result._ready)
+        self.assertIsInstance(errors[0], WorkerLostError)
+        self.assertNotIn(result._job, cache)
+
+    def test_result_already_set(self):
+        cache, result, errors = self.create_result()
+        # the result handler is setting the result at the same time.
+        cache2 = dict(cache)
+        result._set(None, (True, 42))
+        set_worker_lost(cache2, result._job, None)
+        self.assertEqual(result.get(), 42)
+        self.assertFalse(errors)
+
+    def test_removed_concurrently(self):
+        cache, result, errors = self.create_result()
+        cache2 = dict(cache)
+        del(cache[result._job])
+        set_worker_lost(cache2, result._job, None)
+        self.assertIsInstance(errors[0], WorkerLostError)
+
+        set_worker_lost(cache, result._job, None)
+        self.assertEqual(len(errors), 1)
+
+
+class MockJob(object):
+    _ready = False
+    _timeout_callback = None
+
+    def __init__(self, job, time_accepted, pid=None):
+        self._job = job
+        self._time_accepted = time_accepted
+        self._accept_pid = pid
+
+    def _set(self, i, obj):
+        self._ready = True
+        self.result = obj
+
+
+class MockProcess(object):
+    terminated = False
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def terminate(self):
+        self.terminated = True
+
+
+class RecordingTimeoutHandler(TimeoutHandler):
+
+    def __init__(self, *args, **kwargs):
+        self.fired = []
+        super(RecordingTimeoutHandler, self).__init__(*args, **kwargs)
+
+    def on_soft_timeout(self, job):
+        self.fired.append(("soft", job._job, time.time()))
+
+    def on_hard_timeout(self, job):
+        self.fired.append(("hard", job._job, time.time()))
+
+
+class test_TimeoutHandler(unittest.TestCase):
+
+    def run_handler(self, handler, jobs, duration):
+        handler.start()
+        try:
+            for job in jobs:
+                handler.cache[job._job] = job
+                handler.add(job._job, job._time_accepted)
+            time.sleep(duration)
+        finally:
+            handler.terminate()
+            handler.join(1)
+        self.assertFalse(handler.is_alive())
+
+    def test_soft_then_hard(self):
+        handler = RecordingTimeoutHandler([], {}, 0.2, 0.4)
+        now = time.time()
+        jobs = [MockJob(1, now + 0.1), MockJob(2, now)]
+        self.run_handler(handler, jobs, 0.7)
+
+        self.assertListEqual([(kind, job) for kind, job, _ in handler.fired],
+                             [("soft", 2), ("soft", 1),
+                              ("hard", 2), ("hard", 1)])
+        accepted = dict((job._job, job._time_accepted) for job in jobs)
+        for kind, job, fired_at in handler.fired:
+            deadline = accepted[job] + (kind == "soft" and 0.2 or 0.4)
+            self.assertAlmostEqual(fired_at, deadline, delta=0.05)
+
+    def test_terminate_before_wait(self):
+
+        class RacingTimeoutHandler(TimeoutHandler):
+
+            def _pop_expired(self, now):
+                # terminate() called between the state check of the
+                # loop and waiting for the mutex.
+                self._state = TERMINATE
+                return None, None
+
+        handler = RacingTimeoutHandler([], {}, None, 0.1)
+        handler.start()
+        handler.join(1)
+        self.assertFalse(handler.is_alive())
+
+    def test_skips_completed_and_resent_jobs(self):
+        handler = RecordingTimeoutHandler([], {}, None, 0.1)
+        now = time.time()
+        done, resent = MockJob(1, now), MockJob(2, now)
+        for job in done, resent:
+            handler.cache[job._job] = job
+            handler.add(job._job, now)
+        done._ready = True
+        resent._time_accepted = now + 10
+        self.run_handler(handler, [], 0.3)
+        self.assertListEqual(handler.fired, [])
+
+    def test_hard_timeout_terminates_process(self):
+        processes = [MockProcess(10), MockProcess(20)]
+        handler = TimeoutHandler(processes, {}, None, 0.1)
+        self.assertIs(handler.pids[20], processes[1])
+        job = MockJob(1, time.time(), pid=20)
+        lost = processes[1]
+        self.run_handler(handler, [job], 0.3)
+        self.assertTrue(lost.terminated)
+        self.assertIsInstance(job.result[1], TimeLimitExceeded)
+        self.assertNotIn(lost, processes)
+        self.assertNotIn(20, handler.pids)
@@ -1,12 +1,14 @@
 from __future__ import generators
 
+import time
 import unittest2 as unittest
 
 from celery import states
 from celery.utils import gen_unique_id
 from celery.utils.compat import all
-from celery.result import AsyncResult, TaskSetResult
+from celery.result import AsyncResult, EagerResult, TaskSetResult
 from celery.backends import default_backend
+from celery.backends.base import BaseDictBackend
 from celery.exceptions import TimeoutError
 from celery.task.base import Task
 
@@ -152,6 +154,32 @@ class MockAsyncResultSuccess(AsyncResult):
         return states.SUCCESS
 
 
+class MockBatchBackend(BaseDictBackend):
+
+    def __init__(self, *args, **kwargs):
+        super(MockBatchBackend, self).__init__(*args, **kwargs)
+        self.rounds = []
+
+    def get_task_meta_many(self, task_ids):
+        self.rounds.append(len(task_ids))
+        return dict((task_id, {"status": states.PENDING, "result": None})
+                        for task_id in task_ids)
+
+
+class MockDelayedBackend(BaseDictBackend):
+
+    def __init__(self, delay, *args, **kwargs):
+        super(MockDelayedBackend, self).__init__(*args, **kwargs)
+        self.ready_at = time.time() + delay
+
+    def get_task_meta_many(self, task_ids):
+        if time.time() < self.ready_at:
+            meta = {"status": states.PENDING, "result": None}
+        else:
+            meta = {"status": states.SUCCESS, "result": 42}
+        return dict((task_id, meta) for task_id in task_ids)
+
+
 class TestTaskSetResult(unittest.TestCase):
 
     def setUp(self):
@@ -175,6 +203,27 @@ class TestTaskSetResult(unittest.TestCase):
         self.assertEqual(it.next(), 42)
         self.assertEqual(it.next(), 42)
 
+    def test_iterate_raises_from_backend(self):
+        failed = mock_task("ts_failed", states.FAILURE, KeyError("baz"))
+        save_result(failed)
+        ts = TaskSetResult(gen_unique_id(), [AsyncResult(failed["id"])])
+        it = iter(ts)
+        self.assertRaises(KeyError, it.next)
+
+    def test_iterate_yields_from_backend(self):
+        tasks = [mock_task("ts_ok", states.SUCCESS, 42) for i in xrange(2)]
+        [save_result(task) for task in tasks]
+        ts = TaskSetResult(gen_unique_id(),
+                           [AsyncResult(task["id"]) for task in tasks])
+        it = iter(ts)
+        self.assertEqual(it.next(), 42)
+        self.assertEqual(it.next(), 42)
+
+    def test_iterate_eager(self):
+        ts = TaskSetResult(gen_unique_id(), [
+                    EagerResult(gen_unique_id(), 42, states.SUCCESS)])
+        self.assertListEqual(list(ts), [42])
+
     def test_join_timeout(self):
         ar = MockAsyncResultSuccess(gen_unique_id())
         ar2 = MockAsyncResultSuccess(gen_unique_id())
@@ -182,6 +231,27 @@ class TestTaskSetResult(unittest.TestCase):
         ts = TaskSetResult(gen_unique_id(), [ar, ar2, ar3])
         self.assertRaises(TimeoutError, ts.join, timeout=0.0000001)
 
+    def test_join_timeout_not_early(self):
+        # With the default backoff the next round would be
+        # after the timeout, yet the results are ready before it.
+        backend = MockDelayedBackend(0.9)
+        ts = TaskSetResult(gen_unique_id(),
+                           [AsyncResult(gen_unique_id(), backend=backend)])
+        self.assertListEqual(ts.join(timeout=1.2), [42])
+
+        backend = MockDelayedBackend(60)
+        ts = TaskSetResult(gen_unique_id(),
+                           [AsyncResult(gen_unique_id(), backend=backend)])
+        time_start = time.time()
+        self.assertRaises(TimeoutError, ts.join, timeout=0.5)
+        self.assertGreaterEqual(time.time() - time_start, 0.5)
+
+    def test_join_custom_results(self):
+        ar = MockAsyncResultSuccess(gen_unique_id())
+        ar2 = MockAsyncResultSuccess(gen_unique_id())
+        ts = TaskSetResult(gen_unique_id(), [ar, ar2])
+        self.assertListEqual(ts.join(timeout=1), [42, 42])
+
     def test_itersubtasks(self):
 
         it = self.ts.itersubtasks()
@@ -200,6 +270,25 @@ class TestTaskSetResult(unittest.TestCase):
         joined = self.ts.join()
         self.assertListEqual(joined, list(xrange(self.size)))
 
+    def test_join_callback(self):
+        received = {}
+
+        def callback(task_id, result):
+            received[task_id] = result
+
+        self.ts.join(callback=callback)
+        self.assertDictEqual(received, dict((subtask.task_id, i)
+                                for i, subtask in enumerate(self.ts.subtasks)))
+
+    def test_join_fetches_in_batch(self):
+        backend = MockBatchBackend()
+        ts = TaskSetResult(gen_unique_id(),
+                           [AsyncResult(gen_unique_id(), backend=backend)
+                                for i in xrange(self.size)])
+        self.assertRaises(TimeoutError, ts.join, timeout=0.3, interval=0.1)
+        self.assertEqual(backend.rounds, [self.size] * len(backend.rounds))
+        self.assertLess(len(backend.rounds), 4)
+
     def test_successful(self):
         self.assertTrue(self.ts.successful())
 
@@ -258,6 +347,12 @@ class TestFailedTaskSetResult(TestTaskSetResult):
     def test_join(self):
         self.assertRaises(KeyError, self.ts.join)
 
+    def test_join_callback(self):
+        received = []
+        self.assertRaises(KeyError, self.ts.join,
+                          callback=lambda *args: received.append(args))
+        self.assertLess(len(received), self.size)
+
     def test_successful(self):
         self.assertFalse(self.ts.successful())
 
@@ -87,6 +87,76 @@ class test_lookup_route(unittest.TestCase):
         self.assertEqual(router.route({}, "celery.poza"), {})
 
 
+class CountingRoute(routes.MapRoute):
+
+    def __init__(self, map, static=True):
+        super(CountingRoute, self).__init__(map)
+        self.static = static
+        self.calls = 0
+
+    def route_for_task(self, task, *args, **kwargs):
+        self.calls += 1
+        return super(CountingRoute, self).route_for_task(task)
+
+
+class test_route_cache(unittest.TestCase):
+
+    @with_queues(foo=a_queue, bar=b_queue)
+    def test_static_route_cached(self):
+        route = CountingRoute({"celery.ping": {"queue": "foo"}})
+        router = routes.Router([route], conf.QUEUES)
+        for i in range(3):
+            self.assertDictContainsSubset(a_queue,
+                    router.route({}, "celery.ping"))
+            self.assertEqual(router.route({}, "celery.poza"), {})
+        self.assertEqual(route.calls, 2)
+
+    @with_queues(foo=a_queue, bar=b_queue)
+    def test_dynamic_route_not_cached(self):
+        static = CountingRoute({"celery.ping": {"queue": "foo"}})
+        dynamic = CountingRoute({"celery.poza": {"queue": "bar"}},
+                                static=False)
+        router = routes.Router([static, dynamic], conf.QUEUES)
+        for i in range(3):
+            self.assertDictContainsSubset(a_queue,
+                    router.route({}, "celery.ping"))
+            self.assertDictContainsSubset(b_queue,
+                    router.route({}, "celery.poza"))
+        self.assertEqual(static.calls, 2)
+        self.assertEqual(dynamic.calls, 3)
+
+    def test_map_routes_merged(self):
+        R = routes.prepare(({"celery.ping": "foo"},
+                            {"celery.ping": "bar", "celery.poza": "bar"}))
+        router = routes.Router(R)
+        self.assertEqual(len(router._static), 1)
+        self.assertEqual(router._static[0].map,
+                         {"celery.ping": "foo", "celery.poza": "bar"})
+
+    @with_queues(foo=a_queue, bar=b_queue)
+    def test_cached_route_not_modified(self):
+        router = routes.Router(routes.prepare({
+                                    "celery.ping": {"queue": "foo"}}),
+                               conf.QUEUES)
+        router.route({}, "celery.ping")["exchange"] = "changed"
+        self.assertEqual(router.route({}, "celery.ping")["exchange"],
+                         a_queue["exchange"])
+
+    def test_default_router(self):
+        from celery.execute import default_router
+        router = default_router()
+        self.assertIs(default_router(), router)
+
+        @with_queues(foo=a_queue)
+        def with_changed_queues():
+            changed = default_router()
+            self.assertIsNot(changed, router)
+            self.assertIn("foo", changed.queues)
+            conf.QUEUES["bar"] = b_queue
+            self.assertIn("bar", default_router().queues)
+        with_changed_queues()
+
+
 class test_prepare(unittest.TestCase):
 
     def test_prepare(self):
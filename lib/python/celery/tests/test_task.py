@@ -627,102 +627,142 @@ class test_crontab_is_due(unittest.TestCase):
         self.assertRaises(ValueError, crontab, day_of_week='7')
         self.assertRaises(ValueError, crontab, day_of_week='12')
 
+    @patch_crontab_nowfun(EveryMinutePeriodic, datetime(2010, 5, 10, 10, 30))
     def test_every_minute_execution_is_due(self):
-        last_ran = datetime.now() - timedelta(seconds=61)
+        last_ran = datetime(2010, 5, 10, 10, 28, 59)
         due, remaining = EveryMinutePeriodic().is_due(last_ran)
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 60)
 
+    @patch_crontab_nowfun(EveryMinutePeriodic,
+                          datetime(2010, 5, 10, 10, 30, 20))
+    def test_every_minute_execution_is_due_late(self):
+        last_ran = datetime(2010, 5, 10, 10, 29, 59)
+        due, remaining = EveryMinutePeriodic().is_due(last_ran)
+        self.assertTrue(due)
+        self.assertEquals(remaining, 40)
+
+    @patch_crontab_nowfun(EveryMinutePeriodic,
+                          datetime(2010, 5, 10, 10, 30, 40))
     def test_every_minute_execution_is_not_due(self):
-        last_ran = datetime.now() - timedelta(seconds=30)
+        last_ran = datetime(2010, 5, 10, 10, 30, 10)
         due, remaining = EveryMinutePeriodic().is_due(last_ran)
         self.assertFalse(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 20)
 
     # 29th of May 2010 is a saturday
     @patch_crontab_nowfun(HourlyPeriodic, datetime(2010, 5, 29, 10, 30))
     def test_execution_is_due_on_saturday(self):
-        last_ran = datetime.now() - timedelta(seconds=61)
-        due, remaining = EveryMinutePeriodic().is_due(last_ran)
+        last_ran = datetime(2010, 5, 28, 10, 30)
+        due, remaining = HourlyPeriodic().is_due(last_ran)
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 3600)
 
     # 30th of May 2010 is a sunday
     @patch_crontab_nowfun(HourlyPeriodic, datetime(2010, 5, 30, 10, 30))
     def test_execution_is_due_on_sunday(self):
-        last_ran = datetime.now() - timedelta(seconds=61)
-        due, remaining = EveryMinutePeriodic().is_due(last_ran)
+        last_ran = datetime(2010, 5, 29, 10, 30)
+        due, remaining = HourlyPeriodic().is_due(last_ran)
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 3600)
 
     # 31st of May 2010 is a monday
     @patch_crontab_nowfun(HourlyPeriodic, datetime(2010, 5, 31, 10, 30))
     def test_execution_is_due_on_monday(self):
-        last_ran = datetime.now() - timedelta(seconds=61)
-        due, remaining = EveryMinutePeriodic().is_due(last_ran)
+        last_ran = datetime(2010, 5, 30, 10, 30)
+        due, remaining = HourlyPeriodic().is_due(last_ran)
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 3600)
 
     @patch_crontab_nowfun(HourlyPeriodic, datetime(2010, 5, 10, 10, 30))
     def test_every_hour_execution_is_due(self):
         due, remaining = HourlyPeriodic().is_due(datetime(2010, 5, 10, 6, 30))
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 3600)
 
     @patch_crontab_nowfun(HourlyPeriodic, datetime(2010, 5, 10, 10, 29))
     def test_every_hour_execution_is_not_due(self):
         due, remaining = HourlyPeriodic().is_due(datetime(2010, 5, 10, 6, 30))
         self.assertFalse(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 60)
 
     @patch_crontab_nowfun(QuarterlyPeriodic, datetime(2010, 5, 10, 10, 15))
     def test_first_quarter_execution_is_due(self):
         due, remaining = QuarterlyPeriodic().is_due(
                             datetime(2010, 5, 10, 6, 30))
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 900)
 
     @patch_crontab_nowfun(QuarterlyPeriodic, datetime(2010, 5, 10, 10, 30))
     def test_second_quarter_execution_is_due(self):
         due, remaining = QuarterlyPeriodic().is_due(
                             datetime(2010, 5, 10, 6, 30))
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 900)
 
     @patch_crontab_nowfun(QuarterlyPeriodic, datetime(2010, 5, 10, 10, 14))
     def test_first_quarter_execution_is_not_due(self):
         due, remaining = QuarterlyPeriodic().is_due(
                             datetime(2010, 5, 10, 6, 30))
         self.assertFalse(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 60)
 
     @patch_crontab_nowfun(QuarterlyPeriodic, datetime(2010, 5, 10, 10, 29))
     def test_second_quarter_execution_is_not_due(self):
         due, remaining = QuarterlyPeriodic().is_due(
                             datetime(2010, 5, 10, 6, 30))
         self.assertFalse(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 60)
 
     @patch_crontab_nowfun(DailyPeriodic, datetime(2010, 5, 10, 7, 30))
     def test_daily_execution_is_due(self):
         due, remaining = DailyPeriodic().is_due(datetime(2010, 5, 9, 7, 30))
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 86400)
 
     @patch_crontab_nowfun(DailyPeriodic, datetime(2010, 5, 10, 10, 30))
     def test_daily_execution_is_not_due(self):
         due, remaining = DailyPeriodic().is_due(datetime(2010, 5, 10, 6, 29))
         self.assertFalse(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 75600)
 
     @patch_crontab_nowfun(WeeklyPeriodic, datetime(2010, 5, 6, 7, 30))
     def test_weekly_execution_is_due(self):
         due, remaining = WeeklyPeriodic().is_due(datetime(2010, 4, 30, 7, 30))
         self.assertTrue(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 604800)
 
     @patch_crontab_nowfun(WeeklyPeriodic, datetime(2010, 5, 7, 10, 30))
     def test_weekly_execution_is_not_due(self):
         due, remaining = WeeklyPeriodic().is_due(datetime(2010, 4, 30, 6, 29))
         self.assertFalse(due)
-        self.assertEquals(remaining, 1)
+        self.assertEquals(remaining, 507600)
+
+    def test_next_run_at(self):
+        hourly = crontab(minute=30)
+        self.assertEquals(hourly.next_run_at(datetime(2010, 5, 10, 10, 30)),
+                          datetime(2010, 5, 10, 11, 30))
+        self.assertEquals(hourly.next_run_at(datetime(2010, 5, 10, 23, 45)),
+                          datetime(2010, 5, 11, 0, 30))
+        quarterly = crontab(minute="*/15")
+        self.assertEquals(
+                quarterly.next_run_at(datetime(2010, 5, 31, 23, 59, 59)),
+                datetime(2010, 6, 1, 0, 0))
+        # 6th of May 2010 is a thursday
+        weekly = crontab(hour=7, minute=30, day_of_week="thursday")
+        self.assertEquals(weekly.next_run_at(datetime(2010, 5, 6, 7, 29)),
+                          datetime(2010, 5, 6, 7, 30))
+        self.assertEquals(weekly.next_run_at(datetime(2010, 5, 6, 7, 30)),
+                          datetime(2010, 5, 13, 7, 30))
+        self.assertEquals(
+                weekly.next_run_at(datetime(2010, 12, 31, 12, 0)),
+                datetime(2011, 1, 6, 7, 30))
+
+    @patch_crontab_nowfun(DailyPeriodic, datetime(2010, 5, 12, 7, 30))
+    def test_missed_runs_are_skipped(self):
+        due, remaining = DailyPeriodic().is_due(datetime(2010, 5, 9, 7, 30))
+        self.assertTrue(due)
+        self.assertEquals(remaining, 86400)
+        due, remaining = DailyPeriodic().is_due(datetime(2010, 5, 12, 7, 30))
+        self.assertFalse(due)
+        self.assertEquals(remaining, 86400)
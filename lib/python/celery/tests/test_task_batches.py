@@ -0,0 +1,212 @@
+import sys
+import time
+import warnings
+import unittest2 as unittest
+
+from celery import signals
+from celery.contrib import batches
+from celery.datastructures import ExceptionInfo
+from celery.registry import tasks
+from celery.utils import gen_unique_id
+from celery.worker import state
+from celery.worker.job import TaskRequest
+
+from celery.tests.compat import catch_warnings
+from celery.tests.utils import execute_context
+
+
+class Doubler(batches.Batches):
+    flush_every = 3
+    flush_interval = None
+    ignore_result = True
+
+    def run(self, requests):
+        return [request.args[0] * 2 for request in requests]
+
+
+class Raising(batches.Batches):
+    ignore_result = True
+
+    def run(self, requests):
+        raise KeyError("foo")
+
+
+class TooFewResults(batches.Batches):
+    ignore_result = True
+
+    def run(self, requests):
+        return [1]
+
+
+class Clicks(batches.Counter):
+    ignore_result = True
+    counts = []
+
+    def flush(self, buffer):
+        self.counts.append(len(buffer))
+
+
+class MockPool(object):
+
+    def __init__(self):
+        self.applied = []
+
+    def apply_async(self, target, args=None, **kwargs):
+        self.applied.append((target, args, kwargs))
+
+
+class Acks(object):
+
+    def __init__(self):
+        self.acked = []
+
+    def on_ack(self, task_id):
+        return lambda: self.acked.append(task_id)
+
+
+class MockListener(object):
+
+    def __init__(self, initial_prefetch_count, adaptive_prefetch=False):
+        self.initial_prefetch_count = initial_prefetch_count
+        self.adaptive_prefetch = adaptive_prefetch
+
+
+class MockWorker(object):
+
+    def __init__(self, *args, **kwargs):
+        self.listener = MockListener(*args, **kwargs)
+
+
+class TestBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = MockPool()
+        self.acks = Acks()
+        self.task = tasks[Doubler.name]
+        self.task.__init__()
+
+    def request(self, *args):
+        task_id = gen_unique_id()
+        return TaskRequest(self.task.name, task_id, args, {},
+                           on_ack=self.acks.on_ack(task_id))
+
+    def test_flush_every(self):
+        requests = [self.request(i) for i in range(4)]
+        for request in requests:
+            self.task.execute(request, self.pool, None, None)
+        self.assertEqual(len(self.pool.applied), 1)
+        target, args, _ = self.pool.applied[0]
+        self.assertIs(target, batches.execute_batch)
+        name, simple = args
+        self.assertEqual(name, self.task.name)
+        self.assertEqual([request.id for request in simple],
+                         [request.task_id for request in requests[:3]])
+        self.assertEqual(self.task._buffer, requests[3:])
+
+    def test_flush_interval(self):
+        self.task.flush_interval = 0.05
+        try:
+            self.task.execute(self.request(1), self.pool, None, None)
+            self.assertFalse(self.pool.applied)
+            for i in range(100):
+                if self.pool.applied:
+                    break
+                time.sleep(0.01)
+        finally:
+            del(self.task.flush_interval)
+        self.assertEqual(len(self.pool.applied), 1)
+        self.assertFalse(self.task._buffer)
+        self.assertIsNone(self.task._timer)
+
+    def test_acks_after_success(self):
+        requests = [self.request(i) for i in range(3)]
+        for request in requests:
+            self.task.execute(request, self.pool, None, None)
+        _, _, callbacks = self.pool.applied[0]
+        callbacks["accept_callback"]()
+        self.assertFalse(self.acks.acked)
+        callbacks["callbacks"][0]([0, 2, 4])
+        self.assertEqual(self.acks.acked,
+                         [request.task_id for request in requests])
+
+    def test_acks_after_failure(self):
+        requests = [self.request(i) for i in range(3)]
+        for request in requests:
+            self.task.execute(request, self.pool, None, None)
+        _, _, callbacks = self.pool.applied[0]
+        try:
+            raise KeyError("foo")
+        except KeyError:
+            einfo = ExceptionInfo(sys.exc_info())
+        callbacks["errbacks"][0](einfo)
+        self.assertEqual(len(self.acks.acked), 3)
+
+    def test_revoked_requests_are_skipped(self):
+        requests = [self.request(i) for i in range(2)]
+        for request in requests:
+            self.task.execute(request, self.pool, None, None)
+        state.revoked.add(requests[0].task_id)
+        self.task.flush_buffer()
+        _, (_, simple), _ = self.pool.applied[0]
+        self.assertEqual([request.id for request in simple],
+                         [requests[1].task_id])
+        self.assertEqual(self.acks.acked, [requests[0].task_id])
+
+    def test_flush_batches_on_shutdown(self):
+        self.task.execute(self.request(1), self.pool, None, None)
+        signals.worker_shutdown.send(sender=None)
+        self.assertEqual(len(self.pool.applied), 1)
+
+
+    def test_default_flush_interval(self):
+        self.assertLessEqual(batches.Batches.flush_interval, 1)
+
+
+class TestCheckPrefetch(unittest.TestCase):
+
+    def warned_tasks(self, worker):
+
+        def with_catch_warnings(log):
+            warnings.simplefilter("always")
+            signals.worker_init.send(sender=worker)
+            return [w.message.args[0] for w in log]
+
+        messages = execute_context(catch_warnings(record=True),
+                                   with_catch_warnings)
+        return [name for name in (Doubler.name, batches.ClickCounter.name)
+                    if [m for m in messages if " %s " % name in m]]
+
+    def test_prefetch_less_than_flush_every(self):
+        self.assertEqual(self.warned_tasks(MockWorker(4)),
+                         [batches.ClickCounter.name])
+
+    def test_prefetch_enough(self):
+        self.assertFalse(self.warned_tasks(MockWorker(1000)))
+
+    def test_adaptive_prefetch(self):
+        self.assertFalse(self.warned_tasks(MockWorker(4, True)))
+
+
+class TestExecuteBatch(unittest.TestCase):
+
+    def requests(self, n):
+        return [batches.SimpleRequest(gen_unique_id(), "x", (i, ), {})
+                    for i in range(n)]
+
+    def test_results(self):
+        self.assertEqual(batches.execute_batch(Doubler.name, self.requests(3)),
+                         [0, 2, 4])
+
+    def test_raising(self):
+        einfo = batches.execute_batch(Raising.name, self.requests(3))
+        self.assertIsInstance(einfo, ExceptionInfo)
+        self.assertIsInstance(einfo.exception, KeyError)
+
+    def test_wrong_number_of_results(self):
+        einfo = batches.execute_batch(TooFewResults.name, self.requests(3))
+        self.assertIsInstance(einfo.exception, ValueError)
+
+    def test_counter(self):
+        self.assertEqual(batches.execute_batch(Clicks.name, self.requests(3)),
+                         [None, None, None])
+        self.assertEqual(Clicks.counts, [3])
@@ -160,6 +160,26 @@ class test_TaskSet(unittest.TestCase):
         ts.apply_async()
         self.assertEqual(applied[0], 3)
 
+    def test_apply_async_bulk(self):
+        consumer = MockTask.get_consumer()
+        consumer.discard_all()
+        ts = TaskSet([MockTask.subtask((i, i), options={"countdown": 10})
+                        for i in (2, 4, 8)])
+        res = ts.apply_async(bulk=True)
+        try:
+            self.assertEqual(len(res.subtasks), 3)
+            for i, subtask_result in zip((2, 4, 8), res.subtasks):
+                message = consumer.fetch().payload
+                self.assertEqual(message["id"], subtask_result.task_id)
+                self.assertEqual(message["task"], MockTask.name)
+                self.assertEqual(message["taskset"], res.taskset_id)
+                self.assertListEqual(list(message["args"]), [i, i])
+                self.assertTrue(message["eta"])
+            self.assertIsNone(consumer.fetch())
+        finally:
+            consumer.discard_all()
+            consumer.close()
+
     def test_apply(self):
 
         applied = [0]
@@ -117,6 +117,28 @@ class test_utils(unittest.TestCase):
         self.assertIsNone(utils.first(predicate, xrange(10, 20)))
         self.assertEqual(iterations[0], 10)
 
+    def test_fun_takes_kwargs(self):
+
+        def foo(x, logfile=None, **kwargs):
+            pass
+
+        def bar(x, logfile=None):
+            pass
+
+        self.assertListEqual(utils.fun_takes_kwargs(foo, ["logfile", "x"]),
+                             ["logfile", "x"])
+        self.assertListEqual(utils.fun_takes_kwargs(bar, ["logfile", "y"]),
+                             ["logfile"])
+
+    def test_fun_takes_kwargs__uses_argspec(self):
+
+        class Fun(object):
+            # Not a function, so getargspec would raise TypeError.
+            argspec = (["logfile"], None, None, None)
+
+        self.assertListEqual(utils.fun_takes_kwargs(Fun(), ["logfile", "y"]),
+                             ["logfile"])
+
     def test_get_cls_by_name__instance_returns_instance(self):
         instance = object()
         self.assertIs(utils.get_cls_by_name(instance), instance)
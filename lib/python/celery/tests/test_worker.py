@@ -1,3 +1,4 @@
+import time
 import socket
 import unittest2 as unittest
 
@@ -14,9 +15,10 @@ from celery.decorators import periodic_task as periodic_task_dec
 from celery.serialization import pickle
 from celery.utils import gen_unique_id
 from celery.worker import WorkController
+from celery.worker import state
 from celery.worker.buckets import FastQueue
 from celery.worker.job import TaskRequest
-from celery.worker.listener import CarrotListener, QoS, RUN
+from celery.worker.listener import CarrotListener, QoS, AdaptiveQoS, RUN
 from celery.worker.scheduler import Scheduler
 
 from celery.tests.compat import catch_warnings
@@ -156,6 +158,109 @@ class test_QoS(unittest.TestCase):
         self.assertEqual(consumer.prefetch_count, 9)
 
 
+class test_AdaptiveQoS(unittest.TestCase):
+
+    class MockRequest(object):
+
+        def __init__(self, acks_late=False):
+            self.task = PlaceHolder()
+            self.task.acks_late = acks_late
+            self.task_name = "test_AdaptiveQoS"
+
+    def setUp(self):
+        self.consumer = test_QoS.MockConsumer()
+        self.active = []
+
+    def tearDown(self):
+        state.total_count.pop("test_AdaptiveQoS", None)
+        for request in self.active:
+            state.task_ready(request)
+
+    def create_qos(self, **kwargs):
+        return AdaptiveQoS(self.consumer, 8, get_logger(), 4, **kwargs)
+
+    def run_tasks(self, qos, accepted, active=(), elapsed=1.0):
+        # Simulate ``accepted`` tasks being accepted by the pool in the
+        # last ``elapsed`` seconds, with ``active`` still running.
+        state.total_count["test_AdaptiveQoS"] += accepted - len(active)
+        for request in active:
+            state.task_accepted(request)
+            self.active.append(request)
+        qos.last_adapted = time.time() - elapsed
+
+    def test_initial_value(self):
+        qos = self.create_qos()
+        qos.update()
+        self.assertEqual(self.consumer.prefetch_count, 8)
+        self.assertEqual(qos.info["prefetch_count"], 8)
+
+    def test_fast_tasks(self):
+        qos = self.create_qos(buffer_time=0.5)
+        self.run_tasks(qos, 100, [self.MockRequest()])
+        self.assertEqual(qos.next, 3 + 50)
+        self.assertAlmostEqual(qos.rate, 100, delta=1)
+        self.assertEqual(qos.utilization, 0.25)
+
+    def test_slow_tasks(self):
+        qos = self.create_qos()
+        self.run_tasks(qos, 1, [self.MockRequest(acks_late=True),
+                                self.MockRequest(), self.MockRequest(),
+                                self.MockRequest()])
+        # one message held by the late ack task, and one to run next.
+        self.assertEqual(qos.next, 2)
+        self.assertAlmostEqual(qos.info["task_latency"], 4, delta=0.1)
+
+    def test_max_value(self):
+        qos = self.create_qos(max_value=10)
+        self.run_tasks(qos, 100)
+        self.assertEqual(qos.next, 10)
+
+    def test_rate_is_smoothed(self):
+        qos = self.create_qos()
+        self.run_tasks(qos, 100)
+        qos.adapt()
+        self.run_tasks(qos, 0)
+        qos.adapt()
+        self.assertAlmostEqual(qos.rate, 50, delta=1)
+
+    def test_decrements_are_coalesced(self):
+        qos = self.create_qos(interval=60)
+        qos.update()
+        qos.increment()
+        self.assertEqual(qos.next, 8 + 1)
+        self.assertEqual(self.consumer.prefetch_count, 8 + 1)
+
+        self.run_tasks(qos, 0, elapsed=60)
+        self.assertEqual(qos.next, 4 + 1)
+        qos.update()
+        qos.decrement_eventually()
+        self.assertEqual(qos.next, 4 + 1)
+        self.assertEqual(self.consumer.prefetch_count, 4 + 1)
+
+    def test_eta_tasks_widen_window(self):
+        qos = self.create_qos(interval=60)
+        self.run_tasks(qos, 1, [self.MockRequest(), self.MockRequest(),
+                                self.MockRequest(), self.MockRequest()],
+                       elapsed=60)
+        qos.update()
+        self.assertEqual(self.consumer.prefetch_count, 1)
+
+        # The window fills up with ETA tasks before the next update,
+        # yet there must always be room for one more message.
+        for held in range(1, 4):
+            qos.increment()
+            self.assertEqual(self.consumer.prefetch_count, held + 1)
+
+    def test_eta_tasks_exceed_max_value(self):
+        qos = self.create_qos(interval=60, max_value=2)
+        self.run_tasks(qos, 0, elapsed=60)
+        qos.update()
+        self.assertEqual(self.consumer.prefetch_count, 2)
+        for held in range(1, 4):
+            qos.increment()
+        self.assertEqual(self.consumer.prefetch_count, 2 + 3)
+
+
 class test_CarrotListener(unittest.TestCase):
 
     def setUp(self):
@@ -396,6 +501,19 @@ class test_CarrotListener(unittest.TestCase):
         self.assertEqual(task.execute(), 2 * 4 * 8)
         self.assertRaises(Empty, self.ready_queue.get_nowait)
 
+    def test_adaptive_prefetch(self):
+        pool = PlaceHolder()
+        pool.limit = 3
+        l = CarrotListener(self.ready_queue, self.eta_schedule, self.logger,
+                           send_events=False, pool=pool,
+                           adaptive_prefetch=True)
+        qos = l._create_qos()
+        self.assertIsInstance(qos, AdaptiveQoS)
+        self.assertEqual(qos.concurrency, 3)
+
+        l.adaptive_prefetch = False
+        self.assertNotIsInstance(l._create_qos(), AdaptiveQoS)
+
     def test_start__consume_messages(self):
 
         class _QoS(object):
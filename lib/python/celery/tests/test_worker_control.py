@@ -1,4 +1,5 @@
 import socket
+import time
 import unittest2 as unittest
 
 from celery import conf
@@ -167,6 +168,19 @@ class test_ControlPanel(unittest.TestCase):
         self.panel.dispatch_from_message(m)
         self.assertIn(uuid, revoked)
 
+    def test_revoke_removes_from_schedule(self):
+        listener = Listener()
+        panel = self.create_panel(listener=listener)
+        uuid = gen_unique_id()
+        listener.eta_schedule.enter(TaskRequest(task_name=mytask.name,
+                                                task_id=uuid,
+                                                args=(), kwargs={}),
+                                    eta=time.time() + 100)
+        panel.dispatch_from_message({"command": "revoke",
+                                     "destination": hostname,
+                                     "task_id": uuid})
+        self.assertTrue(listener.eta_schedule.empty())
+
     def test_revoke(self):
         uuid = gen_unique_id()
         m = {"command": "revoke",
@@ -121,3 +121,21 @@ class TestScheduleController(unittest.TestCase):
                 self.assertEqual(slept[0], res)
         finally:
             time.sleep = old_sleep
+
+    def test_on_iteration_waits_on_schedule(self):
+
+        class MockSchedule(object):
+            waited = None
+
+            def __iter__(self):
+                return iter([3, None])
+
+            def wait(self, timeout):
+                self.waited = timeout
+
+        schedule = MockSchedule()
+        c = ScheduleController(schedule, precision=5)
+        c.on_iteration()
+        self.assertEqual(schedule.waited, 3)
+        c.on_iteration()
+        self.assertEqual(schedule.waited, 5)
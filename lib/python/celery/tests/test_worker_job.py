@@ -8,8 +8,10 @@ from StringIO import StringIO
 
 from carrot.backends.base import BaseMessage
 
+from celery import conf
 from celery import states
 from celery.backends import default_backend
+from celery.backends.base import BaseBackend
 from celery.datastructures import ExceptionInfo
 from celery.decorators import task as task_dec
 from celery.exceptions import RetryTaskError, NotRegistered
@@ -20,6 +22,8 @@ from celery.utils import gen_unique_id
 from celery.worker.job import WorkerTaskTrace, TaskRequest
 from celery.worker.job import execute_and_trace, AlreadyExecutedError
 from celery.worker.job import InvalidTaskError
+from celery.worker.job import ExecutionPlan, execution_plan
+from celery.registry import tasks
 from celery.worker.state import revoked
 
 from celery.tests.compat import catch_warnings
@@ -76,6 +80,86 @@ class test_RetryTaskError(unittest.TestCase):
         self.assertEqual(ret.exc, exc)
 
 
+class test_ExecutionPlan(unittest.TestCase):
+
+    def test_default_kwargs(self):
+        self.assertEqual(len(ExecutionPlan(mytask).default_kwargs), 7)
+        self.assertTupleEqual(ExecutionPlan(mytask_no_kwargs).default_kwargs,
+                              ())
+        self.assertTupleEqual(
+                ExecutionPlan(mytask_some_kwargs).default_kwargs,
+                ("logfile", ))
+
+    def test_flags(self):
+        plan = ExecutionPlan(tasks[MyTaskIgnoreResult.name])
+        self.assertTrue(plan.ignore_result)
+        self.assertFalse(plan.track_started)
+
+    def test_cached(self):
+        self.assertIs(execution_plan(mytask.name),
+                      execution_plan(mytask.name))
+
+    def test_follows_task_attributes(self):
+
+        class OtherBackend(BaseBackend):
+
+            def mark_as_done(self, task_id, result, **kwargs):
+                pass
+
+        task = tasks[MyTaskIgnoreResult.name]
+        plan = execution_plan(task.name)
+        self.assertTrue(plan.is_current())
+        backend = OtherBackend()
+        task.ignore_result = False
+        task.backend = backend
+        try:
+            self.assertFalse(plan.is_current())
+            new_plan = execution_plan(task.name)
+            self.assertIsNot(new_plan, plan)
+            self.assertFalse(new_plan.ignore_result)
+            self.assertTrue(new_plan.store_errors)
+            self.assertEqual(new_plan.mark_as_done, backend.mark_as_done)
+            self.assertFalse(new_plan.accepts_reply_to)
+        finally:
+            del(task.ignore_result)
+            del(task.backend)
+        plan = execution_plan(task.name)
+        self.assertTrue(plan.ignore_result)
+        self.assertIs(plan.mark_as_done.im_self, task.backend)
+
+    def test_follows_store_errors_setting(self):
+        task = tasks[MyTaskIgnoreResult.name]
+        plan = execution_plan(task.name)
+        prev = conf.STORE_ERRORS_EVEN_IF_IGNORED
+        conf.STORE_ERRORS_EVEN_IF_IGNORED = not prev
+        try:
+            self.assertFalse(plan.is_current())
+            self.assertEqual(execution_plan(task.name).store_errors,
+                             not prev)
+        finally:
+            conf.STORE_ERRORS_EVEN_IF_IGNORED = prev
+        self.assertEqual(execution_plan(task.name).store_errors, prev)
+
+    def test_invalidated_on_register(self):
+
+        class PlanTask(Task):
+            name = "celery.tests.test_worker_job.PlanTask"
+
+            def run(self, **kwargs):
+                pass
+
+        try:
+            plan = execution_plan(PlanTask.name)
+            self.assertIs(plan.task, tasks[PlanTask.name])
+            tasks.register(PlanTask)
+            new_plan = execution_plan(PlanTask.name)
+            self.assertIsNot(new_plan, plan)
+            self.assertIs(new_plan.task, tasks[PlanTask.name])
+        finally:
+            tasks.unregister(PlanTask)
+        self.assertRaises(NotRegistered, execution_plan, PlanTask.name)
+
+
 class test_WorkerTaskTrace(unittest.TestCase):
 
     def test_execute_jail_success(self):
@@ -352,6 +436,17 @@ class test_TaskRequest(unittest.TestCase):
         self.assertNotIsInstance(tw.kwargs.keys()[0], unicode)
         self.assertTrue(tw.logger)
 
+    def test_from_message_reply_to(self):
+        reply_to = {"exchange": "celeryresults", "routing_key": "celeryreply"}
+        body = {"task": mytask.name, "id": gen_unique_id(),
+                "args": [2], "kwargs": {}, "reply_to": reply_to}
+        m = BaseMessage(body=simplejson.dumps(body), backend="foo",
+                        content_type="application/json",
+                        content_encoding="utf-8")
+        tw = TaskRequest.from_message(m, m.decode())
+        self.assertEqual(tw.delivery_info["reply_to"], reply_to)
+        self.assertEqual(tw._get_tracer_kwargs(), {"reply_to": reply_to})
+
     def test_from_message_nonexistant_task(self):
         body = {"task": "cu.mytask.doesnotexist", "id": gen_unique_id(),
                 "args": [2], "kwargs": {u"æØåveéðƒeæ": "bar"}}
@@ -1,3 +1,8 @@
+import os
+import time
+import shelve
+import shutil
+import tempfile
 import unittest2 as unittest
 
 from celery.worker import state
@@ -10,3 +15,28 @@ class TestRevokeRegistry(unittest.TestCase):
         self.assertIn("foo", state.revoked)
         state.revoked.pop_value("foo")
         self.assertNotIn("foo", state.revoked)
+
+
+class TestPersistent(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "state.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_and_load(self):
+        state.revoked.add("persistent-foo")
+        p = state.Persistent(self.filename)
+        p.save()
+        state.revoked.pop_value("persistent-foo")
+        state.Persistent(self.filename)
+        self.assertIn("persistent-foo", state.revoked)
+
+    def test_load_dict(self):
+        db = shelve.open(self.filename)
+        db["revoked"] = {"persistent-bar": time.time()}
+        db.close()
+        state.Persistent(self.filename)
+        self.assertIn("persistent-bar", state.revoked)
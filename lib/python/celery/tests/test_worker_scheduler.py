@@ -1,5 +1,7 @@
 from __future__ import generators
 
+import time
+import threading
 import unittest2 as unittest
 
 from datetime import datetime, timedelta
@@ -10,11 +12,18 @@ from celery.worker.scheduler import Scheduler
 
 class MockItem(object):
 
-    def __init__(self, value, revoked=False):
+    def __init__(self, value, revoked=False, sched=None):
         self.task_id = value
         self.is_revoked = revoked
+        self.sched = sched
+        self.revoked_calls = 0
 
     def revoked(self):
+        if self.sched is not None:
+            # must not be called with the scheduler mutex held.
+            assert self.sched.mutex.acquire(False)
+            self.sched.mutex.release()
+        self.revoked_calls += 1
         return self.is_revoked
 
 
@@ -95,3 +104,72 @@ class test_Scheduler(unittest.TestCase):
         ready_queue = Queue()
         sched = Scheduler(ready_queue)
         self.assertIsNone(iter(sched).next())
+
+    def test_revoke(self):
+        ready_queue = Queue()
+        sched = Scheduler(ready_queue)
+        sched.enter(MockItem("foo"), eta=datetime.now(), callback=None)
+        sched.enter(MockItem("bar"), eta=datetime.now(), callback=None)
+        self.assertTrue(sched.revoke("foo"))
+        self.assertFalse(sched.revoke("foo"))
+        self.assertFalse(sched.revoke("baz"))
+        self.assertEqual(len(sched), 1)
+        self.assertListEqual([info["item"].task_id
+                                for info in sched.info()], ["bar"])
+        it = iter(sched)
+        self.assertIsNone(it.next())
+        self.assertEqual(ready_queue.get_nowait().task_id, "bar")
+        self.assertRaises(Empty, ready_queue.get_nowait)
+        self.assertTrue(sched.empty())
+
+    def test_revoke_compacts(self):
+        sched = Scheduler(Queue())
+        for i in xrange(10):
+            sched.enter(MockItem(i), eta=i + 1000, callback=None)
+        for i in xrange(5):
+            sched.revoke(i)
+        self.assertEqual(len(sched._queue), 10)
+        sched.revoke(5)
+        self.assertEqual(len(sched._queue), 4)
+        self.assertFalse(sched._cancelled)
+        self.assertEqual(min(sched._queue)[0], 1006)
+
+    def test_revoked_items_are_dropped(self):
+        sched = Scheduler(Queue())
+        items = [MockItem(i, revoked=True, sched=sched) for i in xrange(4)]
+        for i, item in enumerate(items):
+            sched.enter(item, eta=i, callback=None)
+        sched.enter(MockItem("bar", sched=sched), eta=time.time() + 1000,
+                    callback=None)
+        sched.revoke(0)
+        sched.revoke(1)
+        self.assertEqual([item.revoked_calls for item in items],
+                         [0, 0, 0, 0])
+        sched.revoke(2)                 # compacts
+        self.assertEqual([item.revoked_calls for item in items],
+                         [1, 1, 1, 0])
+        sched.revoke(3)
+        remaining = iter(sched).next()
+        self.assertTrue(remaining)
+        self.assertEqual(items[3].revoked_calls, 1)
+        self.assertEqual(len(sched), 1)
+
+    def test_enter_wakes_up_wait(self):
+        sched = Scheduler(Queue())
+        sched.enter(MockItem("foo"), eta=time.time() + 100, callback=None)
+        sched._wakeup.clear()
+        timer = threading.Timer(0.1, sched.enter, (MockItem("bar"), ))
+        timer.start()
+        try:
+            time_start = time.time()
+            sched.wait(10)
+            self.assertLess(time.time() - time_start, 5)
+        finally:
+            timer.cancel()
+
+    def test_enter_later_eta_does_not_wake_up(self):
+        sched = Scheduler(Queue())
+        sched.enter(MockItem("foo"), eta=time.time() + 100, callback=None)
+        sched._wakeup.clear()
+        sched.enter(MockItem("bar"), eta=time.time() + 200, callback=None)
+        self.assertFalse(sched._wakeup.isSet())
@@ -288,7 +288,9 @@ def fun_takes_kwargs(fun, kwlist=[]):
         ["logfile", "loglevel", "task_id"]
 
     """
-    argspec = getattr(fun, "argspec", getargspec(fun))
+    argspec = getattr(fun, "argspec", None)
+    if argspec is None:
+        argspec = getargspec(fun)
     args, _varargs, keywords, _defaults = argspec
     if keywords != None:
         return kwlist
@@ -17,7 +17,7 @@ from celery.beat import EmbeddedClockService
 from celery.utils import noop, instantiate
 
 from celery.worker import state
-from celery.worker.buckets import TaskBucket, FastQueue
+from celery.worker.buckets import FastQueue
 from celery.worker.scheduler import Scheduler
 
 RUN = 0x1
@@ -126,11 +126,15 @@ class WorkController(object):
             pool_cls=conf.CELERYD_POOL, listener_cls=conf.CELERYD_LISTENER,
             mediator_cls=conf.CELERYD_MEDIATOR,
             eta_scheduler_cls=conf.CELERYD_ETA_SCHEDULER,
+            task_bucket_cls=conf.CELERYD_TASK_BUCKET,
             schedule_filename=conf.CELERYBEAT_SCHEDULE_FILENAME,
             task_time_limit=conf.CELERYD_TASK_TIME_LIMIT,
             task_soft_time_limit=conf.CELERYD_TASK_SOFT_TIME_LIMIT,
             max_tasks_per_child=conf.CELERYD_MAX_TASKS_PER_CHILD,
             pool_putlocks=conf.CELERYD_POOL_PUTLOCKS,
+            pool_batch_size=conf.CELERYD_POOL_BATCH_SIZE,
+            pool_max_latency=conf.CELERYD_POOL_MAX_LATENCY,
+            pool_shared_threshold=conf.CELERYD_POOL_SHARED_THRESHOLD,
             db=conf.CELERYD_STATE_DB):
 
         # Options
@@ -146,6 +150,9 @@ class WorkController(object):
         self.task_soft_time_limit = task_soft_time_limit
         self.max_tasks_per_child = max_tasks_per_child
         self.pool_putlocks = pool_putlocks
+        self.pool_batch_size = pool_batch_size
+        self.pool_max_latency = pool_max_latency
+        self.pool_shared_threshold = pool_shared_threshold
         self.db = db
         self._finalize = Finalize(self, self.stop, exitpriority=1)
 
@@ -157,7 +164,8 @@ class WorkController(object):
         if conf.DISABLE_RATE_LIMITS:
             self.ready_queue = FastQueue()
         else:
-            self.ready_queue = TaskBucket(task_registry=registry.tasks)
+            self.ready_queue = instantiate(task_bucket_cls,
+                                          task_registry=registry.tasks)
         self.eta_schedule = Scheduler(self.ready_queue, logger=self.logger)
 
         self.logger.debug("Instantiating thread components...")
@@ -169,7 +177,10 @@ class WorkController(object):
                                 maxtasksperchild=self.max_tasks_per_child,
                                 timeout=self.task_time_limit,
                                 soft_timeout=self.task_soft_time_limit,
-                                putlocks=self.pool_putlocks)
+                                putlocks=self.pool_putlocks,
+                                batch_size=self.pool_batch_size,
+                                max_latency=self.pool_max_latency,
+                                shared_threshold=self.pool_shared_threshold)
         self.mediator = instantiate(mediator_cls, self.ready_queue,
                                     callback=self.process_task,
                                     logger=self.logger)
@@ -1,4 +1,6 @@
 import time
+import heapq
+import threading
 
 from collections import deque
 from Queue import Queue, Empty as QueueEmpty
@@ -184,6 +186,154 @@ class TaskBucket(object):
                                     for bucket in self.buckets.values()])))
 
 
+class EventTaskBucket(TaskBucket):
+    """A :class:`TaskBucket` that doesn't poll.
+
+    Instead of iterating over every bucket on each :meth:`get`, this keeps
+    track of which buckets have items ready:
+
+    * Buckets with items that can be consumed right away are kept in
+      a round-robin ready list, so a busy task type can't starve the
+      others.
+
+    * Rate limited buckets that are out of tokens are moved to a
+      min-heap keyed by the time the next token is expected, and are
+      moved back to the ready list when that time has come.
+
+    :meth:`get` blocks on a condition variable, and is woken up by
+    :meth:`put` or when the earliest rate limit timer expires, so the
+    cost of a dequeue doesn't depend on the number of task types.
+
+    """
+
+    def __init__(self, task_registry):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self._ready = deque()
+        self._timers = []
+        self._scheduled = set()
+        super(EventTaskBucket, self).__init__(task_registry)
+
+    def put(self, request):
+        """Put a :class:`~celery.worker.job.TaskRequest` into
+        the appropiate bucket."""
+        task_name = request.task_name
+        self.not_empty.acquire()
+        try:
+            if task_name not in self.buckets:
+                self.update_bucket_for_type(task_name)
+            self.buckets[task_name].put_nowait(request)
+            if task_name not in self._scheduled:
+                self._scheduled.add(task_name)
+                self._ready.append(task_name)
+                self.not_empty.notify()
+        finally:
+            self.not_empty.release()
+    put_nowait = put
+
+    def _move_expired_timers(self, now):
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            self._ready.append(heapq.heappop(timers)[1])
+
+    def _get(self):
+        # Returns ``(remaining_time, item)`` like :meth:`TaskBucket._get`,
+        # where ``remaining_time`` is ``None`` if there are no items at all.
+        # Must be called with the mutex held.
+        ready = self._ready
+        self._move_expired_timers(time.time())
+
+        while ready:
+            task_name = ready.popleft()
+            bucket = self.buckets.get(task_name)
+            try:
+                if bucket is None:
+                    raise QueueEmpty()
+                item = bucket.get_nowait()
+            except QueueEmpty:
+                self._scheduled.discard(task_name)
+                continue
+            except RateLimitExceeded:
+                heapq.heappush(self._timers,
+                               (time.time() + bucket.expected_time(),
+                                task_name))
+                continue
+
+            # Still has items, so it goes to the back of the line.
+            if bucket.empty():
+                self._scheduled.discard(task_name)
+            else:
+                ready.append(task_name)
+            return 0, item
+
+        if self._timers:
+            return max(self._timers[0][0] - time.time(), 0), None
+        return None, None
+
+    def get(self, block=True, timeout=None):
+        """Retrieve the next task from the first available bucket.
+
+        :keyword block: If false, raise :exc:`Queue.Empty` immediately
+            if no item is available.
+        :keyword timeout: Maximum time in seconds to block waiting for an
+            item.
+
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        self.not_empty.acquire()
+        try:
+            while True:
+                remaining_time, item = self._get()
+                if not remaining_time and item is not None:
+                    return item
+                if not block:
+                    raise QueueEmpty()
+                if timeout is not None:
+                    max_wait = deadline - time.time()
+                    if max_wait <= 0:
+                        raise QueueEmpty()
+                    if remaining_time is None:
+                        remaining_time = max_wait
+                    remaining_time = min(remaining_time, max_wait)
+                self.not_empty.wait(remaining_time)
+        finally:
+            self.not_empty.release()
+
+    def update_bucket_for_type(self, task_name):
+        # The mutex is not reentrant, and this is also called by :meth:`put`.
+        bucket = super(EventTaskBucket, self).update_bucket_for_type(
+                                                                task_name)
+        if not bucket.empty() and task_name not in self._scheduled:
+            self._scheduled.add(task_name)
+            self._ready.append(task_name)
+        return bucket
+
+    def refresh(self):
+        """Refresh rate limits for all task types in the registry."""
+        self.not_empty.acquire()
+        try:
+            # Buckets waiting for a token are rescheduled, as the rate
+            # limit may have changed.
+            self._ready.extend(name for _, name in self._timers)
+            self._timers = []
+            super(EventTaskBucket, self).refresh()
+            self.not_empty.notifyAll()
+        finally:
+            self.not_empty.release()
+
+    def clear(self):
+        self.not_empty.acquire()
+        try:
+            super(EventTaskBucket, self).clear()
+            self._ready.clear()
+            self._timers = []
+            self._scheduled.clear()
+        finally:
+            self.not_empty.release()
+
+
 class FastQueue(Queue):
     """:class:`Queue.Queue` supporting the interface of
     :class:`TokenBucketQueue`."""
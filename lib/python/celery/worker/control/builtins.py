@@ -16,6 +16,7 @@ TASK_INFO_FIELDS = ("exchange", "routing_key", "rate_limit")
 def revoke(panel, task_id, task_name=None, **kwargs):
     """Revoke task by task id."""
     revoked.add(task_id)
+    panel.listener.eta_schedule.revoke(task_id)
     backend = default_backend
     if task_name: # Use custom task backend (if any)
         try:
@@ -100,7 +101,7 @@ def rate_limit(panel, task_name, rate_limit, **kwargs):
 @Panel.register
 def dump_schedule(panel, safe=False, **kwargs):
     schedule = panel.listener.eta_schedule
-    if not schedule.queue:
+    if schedule.empty():
         panel.logger.info("--Empty schedule--")
         return []
 
@@ -108,11 +109,12 @@ def dump_schedule(panel, safe=False, **kwargs):
             datetime.fromtimestamp(item["eta"]),
             item["priority"],
             item["item"])
-    info = map(formatitem, enumerate(schedule.info()))
+    items = sorted(schedule.info(), key=lambda item: item["eta"])
+    info = map(formatitem, enumerate(items))
     panel.logger.info("* Dump of current schedule:\n%s" % (
                             "\n".join(info, )))
     scheduled_tasks = []
-    for item in schedule.info():
+    for item in items:
         scheduled_tasks.append({"eta": item["eta"],
                                 "priority": item["priority"],
                                 "request": item["item"].info(safe=safe)})
@@ -140,8 +142,10 @@ def dump_active(panel, safe=False, **kwargs):
 
 @Panel.register
 def stats(panel, **kwargs):
+    qos = getattr(panel.listener, "qos", None)
     return {"total": state.total_count,
-            "pool": panel.listener.pool.info}
+            "pool": panel.listener.pool.info,
+            "prefetch": qos and qos.info}
 
 
 @Panel.register
@@ -107,6 +107,7 @@ class ScheduleController(BackgroundThread):
             precision=None):
         super(ScheduleController, self).__init__()
         self.logger = logger or log.get_default_logger()
+        self.eta_schedule = eta_schedule
         self._scheduler = iter(eta_schedule)
         self.precision = precision or conf.CELERYD_ETA_SCHEDULER_PRECISION
         self.debug = log.SilenceRepeated(self.logger.debug, max_iterations=10)
@@ -116,4 +117,9 @@ class ScheduleController(BackgroundThread):
         delay = self._scheduler.next()
         self.debug("ScheduleController: Scheduler wake-up"
                 "ScheduleController: Next wake-up eta %s seconds..." % delay)
-        time.sleep(delay or self.precision)
+        # Schedules supporting it are woken up early when
+        # a new item with an earlier eta is entered.
+        wait = getattr(self.eta_schedule, "wait", None)
+        if wait is None:
+            return time.sleep(delay or self.precision)
+        wait(delay or self.precision)
@@ -36,6 +36,9 @@ celeryd at %%(hostname)s.
 
 WANTED_DELIVERY_INFO = ("exchange", "routing_key", "consumer_tag", )
 
+DEFAULT_KWARGS = ("logfile", "loglevel", "task_id", "task_name",
+                  "task_retries", "task_is_eager", "delivery_info")
+
 
 class InvalidTaskError(Exception):
     """The task has invalid data or is not properly constructed."""
@@ -46,6 +49,86 @@ class AlreadyExecutedError(Exception):
     world-wide state."""
 
 
+class ExecutionPlan(object):
+    """Everything about a task type the worker needs to execute a task,
+    worked out once for every task type instead of for every task.
+
+    :param task: The task instance.
+    :keyword loader: The loader, defaults to the current loader.
+
+    .. attribute:: default_kwargs
+
+        Names of the default keyword arguments the task accepts.
+
+    .. attribute:: store_errors
+
+        Should exceptions be stored in the result backend?
+
+    .. attribute:: accepts_reply_to
+
+        Can the backend send results to the reply queue of the client?
+
+    The ``ignore_result``, ``track_started`` and ``acks_late`` flags of
+    the task, its backend, and the backend methods used, are also kept
+    as attributes.  Use :meth:`is_current` to check if they are still
+    the ones of the task.
+
+    """
+
+    def __init__(self, task, loader=None):
+        self.task = task
+        self.loader = loader or current_loader()
+        self.default_kwargs = tuple(fun_takes_kwargs(task.run,
+                                                     DEFAULT_KWARGS))
+        self.ignore_result = task.ignore_result
+        self.track_started = task.track_started
+        self.acks_late = task.acks_late
+        self.store_errors_even_if_ignored = conf.STORE_ERRORS_EVEN_IF_IGNORED
+        self.store_errors = True
+        if self.ignore_result:
+            self.store_errors = self.store_errors_even_if_ignored
+
+        backend = self.backend = task.backend
+        self.accepts_reply_to = getattr(backend, "accepts_reply_to", False)
+        self.mark_as_started = backend.mark_as_started
+        self.mark_as_done = backend.mark_as_done
+        self.mark_as_retry = backend.mark_as_retry
+        self.mark_as_failure = backend.mark_as_failure
+        self.prepare_exception = backend.prepare_exception
+        self.process_cleanup = backend.process_cleanup
+
+    def is_current(self):
+        """Returns ``False`` if the backend or the flags of the task
+        have been changed since the plan was made."""
+        task = self.task
+        return (task.backend is self.backend and
+                task.ignore_result == self.ignore_result and
+                task.track_started == self.track_started and
+                task.acks_late == self.acks_late and
+                conf.STORE_ERRORS_EVEN_IF_IGNORED ==
+                    self.store_errors_even_if_ignored)
+
+
+_plans = {}
+
+
+def execution_plan(task_name):
+    """Get the :class:`ExecutionPlan` for a task type.
+
+    Plans are cached, and made again if a different task has been
+    registered with the same name since, or the backend or the flags of
+    the task have been changed.
+
+    :raises celery.exceptions.NotRegistered: if the task is not registered.
+
+    """
+    task = tasks[task_name]
+    plan = _plans.get(task_name)
+    if plan is None or plan.task is not task or not plan.is_current():
+        plan = _plans[task_name] = ExecutionPlan(task)
+    return plan
+
+
 class WorkerTaskTrace(TaskTrace):
     """Wraps the task in a jail, catches all exceptions, and
     saves the status and result of the task execution to the task
@@ -65,19 +148,34 @@ class WorkerTaskTrace(TaskTrace):
     :param task_id: The unique id of the task.
     :param args: List of positional args to pass on to the function.
     :param kwargs: Keyword arguments mapping to pass on to the function.
+    :keyword task: The task instance, defaults to the registered task.
+    :keyword loader: The loader, defaults to the current loader.
+    :keyword plan: The :class:`ExecutionPlan` to use, defaults to the
+        cached plan for the task.
+    :keyword reply_to: Reply queue of the client, see
+        :attr:`celery.backends.base.BaseBackend.reply_to`.
 
     :returns: the evaluated functions return value on success, or
         the exception instance on failure.
 
     """
 
-    def __init__(self, *args, **kwargs):
-        self.loader = kwargs.pop("loader", current_loader())
-        super(WorkerTaskTrace, self).__init__(*args, **kwargs)
-
-        self._store_errors = True
-        if self.task.ignore_result:
-            self._store_errors = conf.STORE_ERRORS_EVEN_IF_IGNORED
+    def __init__(self, task_name, task_id, args, kwargs, task=None,
+            loader=None, plan=None, reply_to=None):
+        if plan is None:
+            if task is None:
+                plan = execution_plan(task_name)
+            else:
+                plan = ExecutionPlan(task, loader)
+        self.plan = plan
+        self.loader = loader or plan.loader
+        super(WorkerTaskTrace, self).__init__(task_name, task_id,
+                                              args, kwargs, task=plan.task)
+
+        self._store_errors = plan.store_errors
+        self._store_opts = {}
+        if reply_to and plan.accepts_reply_to:
+            self._store_opts["reply_to"] = reply_to
         self.super = super(WorkerTaskTrace, self)
 
     def execute_safe(self, *args, **kwargs):
@@ -86,7 +184,7 @@ class WorkerTaskTrace(TaskTrace):
             return self.execute(*args, **kwargs)
         except Exception, exc:
             _type, _value, _tb = sys.exc_info()
-            _value = self.task.backend.prepare_exception(exc)
+            _value = self.plan.prepare_exception(exc)
             exc_info = ExceptionInfo((_type, _value, _tb))
             warnings.warn("Exception outside body: %s: %s\n%s" % tuple(
                 map(str, (exc.__class__, exc, exc_info.traceback))))
@@ -95,33 +193,35 @@ class WorkerTaskTrace(TaskTrace):
     def execute(self):
         """Execute, trace and store the result of the task."""
         self.loader.on_task_init(self.task_id, self.task)
-        if self.task.track_started:
-            self.task.backend.mark_as_started(self.task_id)
+        if self.plan.track_started:
+            self.plan.mark_as_started(self.task_id, **self._store_opts)
         try:
             return super(WorkerTaskTrace, self).execute()
         finally:
-            self.task.backend.process_cleanup()
+            self.plan.process_cleanup()
             self.loader.on_process_cleanup()
 
     def handle_success(self, retval, *args):
         """Handle successful execution."""
-        if not self.task.ignore_result:
-            self.task.backend.mark_as_done(self.task_id, retval)
+        if not self.plan.ignore_result:
+            self.plan.mark_as_done(self.task_id, retval, **self._store_opts)
         return self.super.handle_success(retval, *args)
 
     def handle_retry(self, exc, type_, tb, strtb):
         """Handle retry exception."""
         message, orig_exc = exc.args
         if self._store_errors:
-            self.task.backend.mark_as_retry(self.task_id, orig_exc, strtb)
+            self.plan.mark_as_retry(self.task_id, orig_exc, strtb,
+                                    **self._store_opts)
         self.super.handle_retry(exc, type_, tb, strtb)
 
     def handle_failure(self, exc, type_, tb, strtb):
         """Handle exception."""
         if self._store_errors:
-            exc = self.task.backend.mark_as_failure(self.task_id, exc, strtb)
+            exc = self.plan.mark_as_failure(self.task_id, exc, strtb,
+                                            **self._store_opts)
         else:
-            exc = self.task.backend.prepare_exception(exc)
+            exc = self.plan.prepare_exception(exc)
         return self.super.handle_failure(exc, type_, tb, strtb)
 
 
@@ -233,9 +333,23 @@ class TaskRequest(object):
             self.send_event("task-revoked", uuid=self.task_id)
             self.acknowledge()
             self._already_revoked = True
+            self._store_revoked()
             return True
         return False
 
+    def _store_revoked(self):
+        # The revoke command stores the REVOKED state in the queue of
+        # the task, which isn't read by a client waiting on its
+        # reply queue, so the worker holding the request replies too.
+        reply_to = self.delivery_info.get("reply_to")
+        backend = self.task.backend
+        if reply_to and getattr(backend, "accepts_reply_to", False):
+            try:
+                backend.mark_as_revoked(self.task_id, reply_to=reply_to)
+            except Exception, exc:
+                self.logger.error("Couldn't store revoked state for %s: %r" % (
+                    self.task_id, exc))
+
     @classmethod
     def from_message(cls, message, message_data, logger=None, eventer=None,
             hostname=None):
@@ -259,6 +373,10 @@ class TaskRequest(object):
                                 for key in WANTED_DELIVERY_INFO)
 
 
+        reply_to = message_data.get("reply_to")
+        if reply_to:
+            delivery_info["reply_to"] = reply_to
+
         if not hasattr(kwargs, "items"):
             raise InvalidTaskError("Task kwargs must be a dictionary.")
 
@@ -277,18 +395,17 @@ class TaskRequest(object):
 
         """
         kwargs = dict(self.kwargs)
-        default_kwargs = {"logfile": logfile,
-                          "loglevel": loglevel,
-                          "task_id": self.task_id,
-                          "task_name": self.task_name,
-                          "task_retries": self.retries,
-                          "task_is_eager": False,
-                          "delivery_info": self.delivery_info}
-        fun = self.task.run
-        supported_keys = fun_takes_kwargs(fun, default_kwargs)
-        extend_with = dict((key, val) for key, val in default_kwargs.items()
-                                if key in supported_keys)
-        kwargs.update(extend_with)
+        supported_keys = execution_plan(self.task_name).default_kwargs
+        if supported_keys:
+            default_kwargs = {"logfile": logfile,
+                              "loglevel": loglevel,
+                              "task_id": self.task_id,
+                              "task_name": self.task_name,
+                              "task_retries": self.retries,
+                              "task_is_eager": False,
+                              "delivery_info": self.delivery_info}
+            for key in supported_keys:
+                kwargs[key] = default_kwargs[key]
         return kwargs
 
     def _get_tracer_args(self, loglevel=None, logfile=None):
@@ -296,6 +413,12 @@ class TaskRequest(object):
         task_func_kwargs = self.extend_with_default_kwargs(loglevel, logfile)
         return self.task_name, self.task_id, self.args, task_func_kwargs
 
+    def _get_tracer_kwargs(self):
+        reply_to = self.delivery_info.get("reply_to")
+        if reply_to:
+            return {"reply_to": reply_to}
+        return {}
+
     def _set_executed_bit(self):
         """Set task as executed to make sure it's not executed again."""
         if self.executed:
@@ -321,7 +444,8 @@ class TaskRequest(object):
         if not self.task.acks_late:
             self.acknowledge()
 
-        tracer = WorkerTaskTrace(*self._get_tracer_args(loglevel, logfile))
+        tracer = WorkerTaskTrace(*self._get_tracer_args(loglevel, logfile),
+                                 **self._get_tracer_kwargs())
         retval = tracer.execute()
         self.acknowledge()
         return retval
@@ -348,6 +472,7 @@ class TaskRequest(object):
         args = self._get_tracer_args(loglevel, logfile)
         self.time_start = time.time()
         result = pool.apply_async(execute_and_trace, args=args,
+                    kwargs=self._get_tracer_kwargs(),
                     accept_callback=self.on_accepted,
                     timeout_callback=self.on_timeout,
                     callbacks=[self.on_success], errbacks=[self.on_failure])
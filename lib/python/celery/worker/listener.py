@@ -60,6 +60,14 @@ up and running.
   detects that the value has changed it will send out the actual
   QoS event to the broker.
 
+* If ``CELERYD_PREFETCH_ADAPTIVE`` is enabled the prefetch count
+  is instead sized from the rate tasks are processed and the number of
+  idle pool processes by :class:`AdaptiveQoS`, which also holds back
+  decrements of the prefetch count so at most one QoS event lowering
+  it is sent to the broker per ``CELERYD_PREFETCH_INTERVAL``.  Messages
+  reserved for ETA tasks still widen the window immediately, otherwise
+  the broker could stop delivering until an ETA is met.
+
 * Notice that when the connection is lost all internal queues are cleared
   because we can no longer ack the messages reserved in memory.
   Hoever, this is not dangerous as the broker will resend them
@@ -75,6 +83,8 @@ up and running.
 
 from __future__ import generators
 
+import math
+import time
 import socket
 import warnings
 
@@ -88,6 +98,7 @@ from celery.utils import noop, retry_over_time
 from celery.worker.job import TaskRequest, InvalidTaskError
 from celery.worker.control import ControlDispatch
 from celery.worker.heartbeat import Heart
+from celery.worker import state
 from celery.events import EventDispatcher
 from celery.messaging import establish_connection
 from celery.messaging import get_consumer_set, BroadcastConsumer
@@ -97,6 +108,9 @@ from celery.datastructures import SharedCounter
 RUN = 0x1
 CLOSE = 0x2
 
+#: Largest prefetch count that fits in the ``basic.qos`` method.
+PREFETCH_COUNT_MAX = 0xffff
+
 
 class QoS(object):
     """Quality of Service for Channel.
@@ -147,6 +161,123 @@ class QoS(object):
     def next(self):
         return int(self.value)
 
+    @property
+    def info(self):
+        return {"prefetch_count": self.prev}
+
+
+class AdaptiveQoS(QoS):
+    """Quality of Service sized from the observed task rate and
+    pool utilization.
+
+    At most once every ``interval`` seconds the prefetch count is set to
+    the number of messages needed to fill the idle pool processes, plus
+    the number of tasks the pool is expected to start in the next
+    ``buffer_time`` seconds.  The rate tasks are started at is measured
+    since the previous update; with all processes busy this is the
+    concurrency divided by the task latency.  Fast tasks thus get a deep
+    prefetch window that keeps the pool busy, while slow tasks get a
+    shallow one, leaving the messages in the queue for other workers.
+
+    Messages held by tasks waiting for their ETA and by running tasks
+    with late acknowledgement are added on top, as they still count
+    towards the prefetch limit.  A message reserved for an ETA task
+    widens the window right away, as the consumer loop may not wake up
+    again before the next message is delivered; only decreases are
+    held back until the next update.
+
+    :param consumer: A :class:`carrot.messaging.Consumer` instance.
+    :param initial_value: Prefetch count used until the first update.
+    :param logger: Logger used to log debug messages.
+    :param concurrency: Number of pool processes.
+    :keyword interval: Minimum number of seconds between updates.
+    :keyword buffer_time: Seconds worth of tasks to keep reserved.
+    :keyword max_value: Upper limit for the prefetch count.
+
+    """
+
+    #: Weight of the latest measurement in the moving average of the
+    #: task rate.
+    smoothing = 0.5
+
+    def __init__(self, consumer, initial_value, logger, concurrency,
+            interval=1.0, buffer_time=1.0, max_value=None):
+        # The shared counter only keeps track of messages reserved for
+        # ETA tasks.
+        super(AdaptiveQoS, self).__init__(consumer, 0, logger)
+        self.concurrency = max(concurrency, 1)
+        self.interval = interval
+        self.buffer_time = buffer_time
+        self.max_value = max_value or PREFETCH_COUNT_MAX
+        self.target = self.decision = max(initial_value, 1)
+        self.rate = None
+        self.utilization = 0.0
+        self.last_adapted = time.time()
+        self.accepted = self._total_accepted()
+
+    def _total_accepted(self):
+        return sum(state.total_count.values())
+
+    def increment(self):
+        """Reserve one more message, and widen the window now."""
+        self.value.increment()
+        self.decision = self._with_reserved(self.target)
+        return self.set(self.decision)
+
+    def decrement(self):
+        """Release a reserved message, at the next update."""
+        return self.value.decrement()
+
+    def adapt(self, now=None):
+        """Measure the task rate and pool utilization since the last
+        update, and decide on a new prefetch count."""
+        now = now or time.time()
+        accepted = self._total_accepted()
+        elapsed = max(now - self.last_adapted, 1e-3)
+        rate = (accepted - self.accepted) / elapsed
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate += self.smoothing * (rate - self.rate)
+        self.accepted = accepted
+        self.last_adapted = now
+
+        active = list(state.active_requests)
+        idle = max(self.concurrency - len(active), 0)
+        held = len([request for request in active
+                        if request.task.acks_late])
+        self.utilization = float(len(active)) / self.concurrency
+
+        target = idle + held + int(math.ceil(self.rate * self.buffer_time))
+        self.target = min(max(target, 1), self.max_value)
+        self.decision = self._with_reserved(self.target)
+        return self.decision
+
+    def _with_reserved(self, target):
+        # Messages reserved for ETA tasks are not limited by
+        # ``max_value``, as that would stall the consumer once enough
+        # of them are waiting.
+        return min(target + max(int(self.value), 0), PREFETCH_COUNT_MAX)
+
+    @property
+    def next(self):
+        if time.time() - self.last_adapted >= self.interval:
+            return self.adapt()
+        return self.decision
+
+    @property
+    def info(self):
+        latency = None
+        if self.rate:
+            latency = self.utilization * self.concurrency / self.rate
+        return {"prefetch_count": self.prev,
+                "adaptive": True,
+                "target": self.target,
+                "task_rate": self.rate,
+                "task_latency": latency,
+                "utilization": self.utilization,
+                "interval": self.interval}
+
 
 class CarrotListener(object):
     """Listen for messages received from the broker and
@@ -180,6 +311,12 @@ class CarrotListener(object):
 
         Initial QoS prefetch count for the task channel.
 
+    .. attribute:: adaptive_prefetch
+
+        Size the prefetch count from the task rate and pool utilization,
+        see :class:`AdaptiveQoS`.  Defaults to the
+        ``CELERYD_PREFETCH_ADAPTIVE`` setting.
+
     .. attribute:: control_dispatch
 
         Control command dispatcher.
@@ -203,7 +340,7 @@ class CarrotListener(object):
 
     def __init__(self, ready_queue, eta_schedule, logger,
             init_callback=noop, send_events=False, hostname=None,
-            initial_prefetch_count=2, pool=None):
+            initial_prefetch_count=2, pool=None, adaptive_prefetch=None):
         self.connection = None
         self.task_consumer = None
         self.ready_queue = ready_queue
@@ -213,6 +350,9 @@ class CarrotListener(object):
         self.logger = logger
         self.hostname = hostname or socket.gethostname()
         self.initial_prefetch_count = initial_prefetch_count
+        if adaptive_prefetch is None:
+            adaptive_prefetch = conf.CELERYD_PREFETCH_ADAPTIVE
+        self.adaptive_prefetch = adaptive_prefetch
         self.event_dispatcher = None
         self.heart = None
         self.pool = pool
@@ -379,8 +519,7 @@ class CarrotListener(object):
         self.logger.debug("CarrotListener: Connection Established.")
         self.task_consumer = get_consumer_set(connection=self.connection)
         # QoS: Reset prefetch window.
-        self.qos = QoS(self.task_consumer,
-                       self.initial_prefetch_count, self.logger)
+        self.qos = self._create_qos()
         self.qos.update() # enable prefetch_count QoS.
 
         self.task_consumer.on_decode_error = self.on_decode_error
@@ -413,6 +552,19 @@ class CarrotListener(object):
             self.task_consumer.add_consumer(self.broadcast_consumer)
             return self.task_consumer.iterconsume
 
+    def _create_qos(self):
+        if not self.adaptive_prefetch:
+            return QoS(self.task_consumer,
+                       self.initial_prefetch_count, self.logger)
+        concurrency = getattr(self.pool, "limit", None) or \
+                        self.initial_prefetch_count
+        return AdaptiveQoS(self.task_consumer,
+                           self.initial_prefetch_count, self.logger,
+                           concurrency,
+                           interval=conf.CELERYD_PREFETCH_INTERVAL,
+                           buffer_time=conf.CELERYD_PREFETCH_BUFFER_TIME,
+                           max_value=conf.CELERYD_PREFETCH_MAX)
+
     def _open_connection(self):
         """Retries connecting to the AMQP broker over time.
 
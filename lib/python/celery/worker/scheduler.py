@@ -2,6 +2,7 @@ from __future__ import generators
 
 import time
 import heapq
+import threading
 
 from datetime import datetime
 
@@ -17,6 +18,14 @@ class Scheduler(object):
     :keyword max_interval: Maximum sleep interval between iterations.
         Default is 2 seconds.
 
+    Threads waiting for the next item using :meth:`wait` are woken up
+    as soon as an item with an earlier eta is entered.
+
+    Items revoked by :meth:`revoke` are not removed from the heap right
+    away, but marked as cancelled and dropped when they reach the head
+    of the queue, or when the heap is compacted.  The ``revoked`` method
+    of a dropped item is called so the item can be acknowledged.
+
     """
 
     def __init__(self, ready_queue, logger=None,
@@ -24,7 +33,11 @@ class Scheduler(object):
         self.max_interval = float(max_interval)
         self.ready_queue = ready_queue
         self.logger = logger or log.get_default_logger()
+        self.mutex = threading.Lock()
+        self._wakeup = threading.Event()
         self._queue = []
+        self._index = {}
+        self._cancelled = set()
 
     def enter(self, item, eta=None, priority=0, callback=None):
         """Enter item into the scheduler.
@@ -46,53 +59,156 @@ class Scheduler(object):
                                   "Ignoring %s." % (eta, item))
                 return
         eta = eta or time.time()
-        heapq.heappush(self._queue, (eta, priority, item, callback))
+        event = [eta, priority, item, callback]
+
+        self.mutex.acquire()
+        try:
+            heapq.heappush(self._queue, event)
+            task_id = getattr(item, "task_id", None)
+            if task_id is not None:
+                self._index[task_id] = event
+            is_first = self._queue[0] is event
+        finally:
+            self.mutex.release()
+
+        if is_first:
+            self._wakeup.set()
+
+    def revoke(self, task_id):
+        """Remove the item with the given task id from the schedule.
+
+        Returns :const:`True` if the item was found.
+
+        """
+        dropped = []
+        self.mutex.acquire()
+        try:
+            event = self._index.pop(task_id, None)
+            if event is None:
+                return False
+            self._cancelled.add(id(event))
+            if len(self._cancelled) > len(self._queue) / 2:
+                dropped = self._compact()
+        finally:
+            self.mutex.release()
+        self._drop(dropped)
+        return True
+
+    def _compact(self):
+        """Remove cancelled events from the heap.
+
+        Returns the list of items removed.
+
+        """
+        cancelled = self._cancelled
+        queue, dropped = [], []
+        for event in self._queue:
+            if id(event) in cancelled:
+                dropped.append(event[2])
+            else:
+                queue.append(event)
+        heapq.heapify(queue)
+        self._queue = queue
+        self._cancelled = set()
+        return dropped
+
+    def _drop(self, items):
+        for item in items:
+            item.revoked()
+
+    def _forget(self, event):
+        task_id = getattr(event[2], "task_id", None)
+        if self._index.get(task_id) is event:
+            del self._index[task_id]
+
+    def _pop_ready(self, now):
+        """Pop the next item if its eta has been reached.
+
+        Returns a tuple of ``(remaining, event, dropped)`` where ``event``
+        is :const:`None` if no items are ready yet, ``remaining`` is the
+        time to wait for the next item, or :const:`None` if the schedule
+        is empty, and ``dropped`` is the list of cancelled items removed
+        from the head of the queue.
+
+        """
+        pop = heapq.heappop
+        dropped = []
+
+        self.mutex.acquire()
+        try:
+            queue = self._queue
+            cancelled = self._cancelled
+            while queue:
+                event = queue[0]
+                eta, priority, item, callback = event
+                if id(event) in cancelled:
+                    pop(queue)
+                    cancelled.discard(id(event))
+                    dropped.append(item)
+                    continue
+
+                if now < eta:
+                    return min(eta - now, self.max_interval), None, dropped
+                pop(queue)
+                self._forget(event)
+                return None, event, dropped
+            return None, None, dropped
+        finally:
+            self.mutex.release()
 
     def __iter__(self):
         """The iterator yields the time to sleep for between runs."""
 
         # localize variable access
         nowfun = time.time
-        pop = heapq.heappop
         ready_queue = self.ready_queue
 
         while 1:
-            if self._queue:
-                eta, priority, item, callback = verify = self._queue[0]
-                now = nowfun()
-
-                if item.revoked():
-                    event = pop(self._queue)
-                    if event is not verify:
-                        heapq.heappush(self._queue, event)
-                    continue
-
-                if now < eta:
-                    yield min(eta - now, self.max_interval)
-                else:
-                    event = pop(self._queue)
-
-                    if event is verify:
-                        ready_queue.put(item)
-                        if callback is not None:
-                            callback()
-                        continue
-                    else:
-                        heapq.heappush(self._queue, event)
-            yield None
+            remaining, event, dropped = self._pop_ready(nowfun())
+            self._drop(dropped)
+            if event is None:
+                yield remaining
+                continue
+
+            eta, priority, item, callback = event
+            if item.revoked():
+                continue
+            ready_queue.put(item)
+            if callback is not None:
+                callback()
+
+    def wait(self, timeout):
+        """Sleep for ``timeout`` seconds, or until an item with an
+        earlier eta is entered into the schedule."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
 
     def empty(self):
         """Is the schedule empty?"""
-        return not self._queue
+        return len(self._queue) <= len(self._cancelled)
+
+    def __len__(self):
+        return len(self._queue) - len(self._cancelled)
 
     def clear(self):
-        self._queue = []
+        self.mutex.acquire()
+        try:
+            self._queue = []
+            self._index.clear()
+            self._cancelled = set()
+        finally:
+            self.mutex.release()
 
     def info(self):
-        return ({"eta": eta, "priority": priority, "item": item}
-                    for eta, priority, item, _ in self.queue)
+        """Information about the items in the schedule, in no
+        particular order."""
+        cancelled = self._cancelled
+        return ({"eta": event[0], "priority": event[1], "item": event[2]}
+                    for event in self._queue
+                        if id(event) not in cancelled)
 
     @property
     def queue(self):
-        events = list(self._queue)
-        return map(heapq.heappop, [events]*len(events))
+        """List of events currently in the schedule, in heap order."""
+        cancelled = self._cancelled
+        return [event for event in self._queue if id(event) not in cancelled]
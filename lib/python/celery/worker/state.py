@@ -59,17 +59,16 @@ class Persistent(object):
         self.close()
 
     def merge(self, d):
+        # Older versions stored the revoked set as a dict.
         revoked.update(d.get("revoked") or {})
         return d
 
     def sync(self, d):
-        prev = d.get("revoked") or {}
-        prev.update(revoked.as_dict())
-        d["revoked"] = prev
+        d["revoked"] = revoked
         return d
 
     def open(self):
-        return shelve.open(self.filename)
+        return shelve.open(self.filename, protocol=2)
 
     def close(self):
         if self._open:
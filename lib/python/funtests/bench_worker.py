@@ -0,0 +1,75 @@
+"""Measure the overhead of executing a no-op task in the worker.
+
+Usage::
+
+    $ python -m funtests.bench_worker [iterations] [runs]
+
+Prints the best time per task out of ``runs`` runs for making the
+:class:`~celery.worker.job.TaskRequest` and the tracer arguments from a
+message, and for :func:`~celery.worker.job.execute_and_trace` as called
+in the pool processes.  No broker is needed.
+
+"""
+import os
+import sys
+import time
+
+# Use the unit test configuration, nothing is sent to the broker.
+os.environ["CELERY_CONFIG_MODULE"] = "celery.tests.config"
+
+from carrot.backends.base import BaseMessage
+
+from celery.decorators import task
+from celery.log import setup_logger
+from celery.serialization import pickle
+from celery.utils import gen_unique_id
+from celery.worker.job import TaskRequest, execute_and_trace
+
+
+@task(ignore_result=True)
+def noop():
+    pass
+
+
+def create_message():
+    body = pickle.dumps({"task": noop.name, "id": gen_unique_id(),
+                         "args": [], "kwargs": {}})
+    return BaseMessage(None, body=body,
+                       content_type="application/x-python-serialize",
+                       content_encoding="binary")
+
+
+def bench_request(iterations, logger):
+    message = create_message()
+    message_data = message.decode()
+    time_start = time.time()
+    for i in xrange(iterations):
+        request = TaskRequest.from_message(message, message_data,
+                                           logger=logger)
+        request._get_tracer_args()
+        request._get_tracer_kwargs()
+    return time.time() - time_start
+
+
+def bench_execute(iterations, logger):
+    message = create_message()
+    request = TaskRequest.from_message(message, message.decode(),
+                                       logger=logger)
+    args = request._get_tracer_args()
+    kwargs = request._get_tracer_kwargs()
+    time_start = time.time()
+    for i in xrange(iterations):
+        execute_and_trace(*args, **kwargs)
+    return time.time() - time_start
+
+
+def main(iterations=50000, runs=3):
+    logger = setup_logger(loglevel="ERROR")
+    for name, bench in (("TaskRequest + tracer args", bench_request),
+                        ("execute_and_trace", bench_execute)):
+        best = min(bench(iterations, logger) for i in xrange(runs))
+        print("%-28s %.1fus" % (name + ":", best / iterations * 1e6))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))